@@ -0,0 +1,111 @@
+"""
+Async LLM client - satu connection pool httpx untuk seluruh proses
+"""
+
+import logging
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+import config
+
+logger = logging.getLogger('DiscordAI')
+
+# Process-wide singletons, created lazily on first use
+_http_client = None
+_llm_client = None
+
+# Exception types of the supported SDKs (groq is optional)
+_CONNECTION_ERRORS = [openai.APIConnectionError]
+_STATUS_ERRORS = [openai.APIStatusError]
+try:
+    import groq
+    _CONNECTION_ERRORS.append(groq.APIConnectionError)
+    _STATUS_ERRORS.append(groq.APIStatusError)
+except ImportError:
+    pass
+_CONNECTION_ERRORS = tuple(_CONNECTION_ERRORS)
+_STATUS_ERRORS = tuple(_STATUS_ERRORS)
+
+
+def http2_available() -> bool:
+    """Check if the optional h2 package is installed"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client(max_connections: int = None, max_keepalive: int = None,
+                       keepalive_expiry: float = None, http2: bool = None) -> httpx.AsyncClient:
+    """Create a tuned httpx connection pool"""
+    if http2 is None:
+        http2 = config.HTTP_HTTP2
+    if http2 and not http2_available():
+        logger.warning("⚠️ HTTP/2 requested but 'h2' is not installed, falling back to HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=max_connections or config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=max_keepalive or config.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=keepalive_expiry or config.HTTP_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Check if an upstream error is transient (timeout, 408/409/429, 5xx)"""
+    if isinstance(error, _CONNECTION_ERRORS):
+        return True
+    if isinstance(error, _STATUS_ERRORS):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def create_llm_client(http_client: httpx.AsyncClient, api_key: str = None,
+                      base_url: str = None, backend: str = None):
+    """Create an async chat completions client on top of a shared pool"""
+    # Retries are done by the upstream scheduler, which knows the quota
+    api_key = api_key or config.GROQ_API_KEY
+    base_url = base_url or config.GROQ_BASE_URL
+    backend = backend or config.LLM_BACKEND
+
+    if backend == 'groq':
+        from groq import AsyncGroq
+
+        # AsyncGroq adds the /openai/v1 prefix to its own paths
+        suffix = '/openai/v1'
+        if base_url.endswith(suffix):
+            base_url = base_url[:-len(suffix)]
+        return AsyncGroq(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP connection pool"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+
+def get_llm_client():
+    """Get the shared async LLM client"""
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = create_llm_client(get_http_client())
+        logger.info(f"🔌 LLM client ready ({config.LLM_BACKEND}, "
+                    f"max_connections={config.HTTP_MAX_CONNECTIONS})")
+    return _llm_client
+
+
+async def close_clients():
+    """Close the shared LLM client and its connection pool"""
+    global _http_client, _llm_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _llm_client = None
@@ -0,0 +1,117 @@
+"""
+Micro-batching - pertanyaan yang antri di satu channel dijawab dengan satu call AI
+"""
+
+import asyncio
+import re
+from collections import Counter
+
+BATCH_INSTRUCTIONS = (
+    "Several people asked the questions below at the same time. Answer each one "
+    "separately, in the language it was asked in. Start every answer on a new line "
+    "with the marker of its question (for example [[1]]) and write nothing before "
+    "the first marker."
+)
+
+_MARKER = re.compile(r'^[ \t]*\[\[(\d+)\]\][ \t]*', re.MULTILINE)
+
+
+class BatchAbandoned(Exception):
+    """The batch did not answer this question; it has to be asked on its own"""
+
+
+def build_batch_messages(context: list, questions: list) -> list:
+    """One completion request for several questions sharing the channel context"""
+    numbered = "\n\n".join(f"[[{i}]] {question}" for i, question in enumerate(questions, 1))
+    return context + [{"role": "user", "content": f"{BATCH_INSTRUCTIONS}\n\n{numbered}"}]
+
+
+def split_batch_answer(text: str, count: int) -> list:
+    """Per-question answers from a batched completion, None where one is missing"""
+    answers = [None] * count
+    matches = list(_MARKER.finditer(text))
+    for match, following in zip(matches, matches[1:] + [None]):
+        index = int(match.group(1)) - 1
+        end = following.start() if following is not None else len(text)
+        answer = text[match.end():end].strip()
+        if 0 <= index < count and answers[index] is None and answer:
+            answers[index] = answer
+    return answers
+
+
+class QuestionBatch:
+    """Waiting requests taken over by the request holding the channel"""
+
+    def __init__(self):
+        self.requests = []
+        self._results = {}    # request -> future with its answer
+        self.dropped = set()  # cancelled (deleted/edited) while in the batch
+
+    def __len__(self) -> int:
+        return len(self.requests)
+
+    def add(self, requests: list):
+        loop = asyncio.get_running_loop()
+        for request in requests:
+            self.requests.append(request)
+            self._results[request] = loop.create_future()
+
+    def active(self, request) -> bool:
+        return request not in self.dropped
+
+    def abandon(self, request):
+        """The request gave up (deleted, edited or out of time): skip its reply"""
+        self.dropped.add(request)
+
+    async def wait(self, request) -> str:
+        """Answer of one request, once the batch holder sent its reply"""
+        try:
+            return await self._results[request]
+        except asyncio.CancelledError:
+            self.abandon(request)
+            raise
+
+    def resolve(self, request, answer: str):
+        future = self._results[request]
+        if not future.done():
+            future.set_result(answer)
+
+    def fail(self, request, error: BaseException = None):
+        future = self._results[request]
+        if not future.done():
+            future.set_exception(error or BatchAbandoned())
+
+    def fail_all(self):
+        for request in self.requests:
+            self.fail(request)
+
+
+class BatchStats:
+    """Batch sizes and the upstream calls/prompt tokens batching saved"""
+
+    def __init__(self):
+        self.sizes = Counter()
+        self.batches = 0
+        self.questions = 0
+        self.calls_saved = 0
+        self.tokens_saved = 0
+        self.fallbacks = 0    # questions a batch could not answer
+
+    def record(self, size: int, answered: int, separate_tokens: int, batch_tokens: int):
+        self.sizes[size] += 1
+        self.batches += 1
+        self.questions += size
+        self.calls_saved += max(0, answered - 1)
+        self.tokens_saved += max(0, separate_tokens - batch_tokens)
+        self.fallbacks += size - answered
+
+    def stats(self) -> dict:
+        return {
+            'batches': self.batches,
+            'questions': self.questions,
+            'avg_size': self.questions / self.batches if self.batches else 0.0,
+            'sizes': dict(sorted(self.sizes.items())),
+            'calls_saved': self.calls_saved,
+            'tokens_saved': self.tokens_saved,
+            'fallbacks': self.fallbacks,
+        }
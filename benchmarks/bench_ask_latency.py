@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latency !ask di bawah concurrency tinggi
+
+Membandingkan jalur lama (OpenAI sync + asyncio.to_thread) dengan client
+async + shared httpx pool, terhadap mock server chat completions lokal.
+
+Usage:
+    python benchmarks/bench_ask_latency.py
+    python benchmarks/bench_ask_latency.py --levels 50 200 1000 --delay 0.05
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+
+from aiohttp import web
+from openai import OpenAI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from ai_client import create_http_client, create_llm_client  # noqa: E402
+from scheduler import UpstreamScheduler  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "Apa itu Python?"}]
+
+
+async def mock_completions(request):
+    """OpenAI-compatible chat completions handler with a fixed delay"""
+    await request.read()
+    await asyncio.sleep(request.app['delay'])
+    return web.json_response({
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "mock",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "Python adalah bahasa pemrograman."},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 8, "completion_tokens": 6, "total_tokens": 14}
+    })
+
+
+def serve_mock(port: int, delay: float):
+    """Run the mock upstream (in its own process, so it never shares our GIL)"""
+    app = web.Application()
+    app['delay'] = delay
+    app.router.add_post('/v1/chat/completions', mock_completions)
+    web.run_app(app, host='127.0.0.1', port=port, backlog=4096, access_log=None, print=None)
+
+
+def start_mock_server(delay: float) -> tuple:
+    """Start the mock upstream and wait until it accepts connections"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    process = multiprocessing.Process(target=serve_mock, args=(port, delay), daemon=True)
+    process.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("mock server did not start")
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def timed(coro) -> float:
+    """Await a coroutine and return its latency in seconds"""
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def run_threaded(base_url: str, concurrency: int) -> list:
+    """Old path: blocking client pushed through the default executor"""
+    client = OpenAI(api_key="bench", base_url=base_url, max_retries=0)
+
+    async def one():
+        return await asyncio.to_thread(
+            client.chat.completions.create,
+            model="mock", messages=MESSAGES, max_tokens=500, temperature=0.7
+        )
+
+    try:
+        return await asyncio.gather(*(timed(one()) for _ in range(concurrency)))
+    finally:
+        client.close()
+
+
+async def run_async(base_url: str, concurrency: int, max_connections: int) -> list:
+    """New path: native async client on a shared pool, gated by the upstream scheduler"""
+    http_client = create_http_client(max_connections=max_connections,
+                                     max_keepalive=max_connections, http2=False)
+    client = create_llm_client(http_client, api_key="bench", base_url=base_url, backend='openai')
+    # One guild sends every request: the queue bounds must not reject the burst
+    scheduler = UpstreamScheduler(max_concurrency=max_connections, max_retries=0,
+                                  max_queue=concurrency, max_queue_per_guild=concurrency)
+
+    async def one():
+        raw = await scheduler.run(None, "mock", 0, lambda: client.chat.completions.with_raw_response.create(
+            model="mock", messages=MESSAGES, max_tokens=500, temperature=0.7
+        ))
+        return raw.parse()
+
+    try:
+        return await asyncio.gather(*(timed(one()) for _ in range(concurrency)))
+    finally:
+        await http_client.aclose()
+
+
+def report(name: str, concurrency: int, samples: list, wall: float):
+    """Print one result row"""
+    print(f"{name:<10} {concurrency:>6} {percentile(samples, 50) * 1000:>10.1f} "
+          f"{percentile(samples, 99) * 1000:>10.1f} {statistics.mean(samples) * 1000:>10.1f} "
+          f"{concurrency / wall:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--levels', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--delay', type=float, default=0.05, help="mock upstream latency (seconds)")
+    parser.add_argument('--max-connections', type=int, default=config.HTTP_MAX_CONNECTIONS)
+    args = parser.parse_args()
+
+    process, port = start_mock_server(args.delay)
+    base_url = f"http://127.0.0.1:{port}/v1"
+
+    print(f"Mock upstream delay: {args.delay * 1000:.0f}ms | pool size: {args.max_connections}")
+    print(f"{'mode':<10} {'conc':>6} {'p50 ms':>10} {'p99 ms':>10} {'mean ms':>10} {'req/s':>10}")
+
+    for concurrency in args.levels:
+        for name, runner in (
+            ('to_thread', lambda: run_threaded(base_url, concurrency)),
+            ('async', lambda: run_async(base_url, concurrency, args.max_connections)),
+        ):
+            start = time.perf_counter()
+            samples = asyncio.run(runner())
+            report(name, concurrency, samples, time.perf_counter() - start)
+
+    process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark: biaya CPU per pesan gateway, on_message lama vs pre-filter
+
+Pesan chat biasa (99%+) dulu selalu lewat mentioned_in() dan parser
+process_commands(). Pre-filter menolaknya dengan cek prefix + scan id mention.
+Mengukur CPU per pesan, lalu menjalankan beban 5k pesan/detik dan
+melaporkan berapa persen satu core yang dipakai.
+
+Usage:
+    python benchmarks/bench_prefilter.py
+    python benchmarks/bench_prefilter.py --messages 200000 --rate 5000 --seconds 3
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import discord
+from discord.ext import commands
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prefilter import MessagePrefilter  # noqa: E402
+
+BOT_ID = 42
+WORDS = "halo apa kabar semua ini itu game lagi main yuk nanti malam siapa mau ikut gas".split()
+
+
+def user(user_id: int) -> dict:
+    return {'id': user_id, 'username': f'user{user_id}', 'discriminator': '0', 'avatar': None}
+
+
+def make_bot():
+    """A bot with the same prefix and an !ask command, never connected"""
+    bot = commands.Bot(command_prefix='!', intents=discord.Intents.default(), help_command=None)
+
+    @bot.command(name='ask')
+    async def ask(ctx, *, question: str = None):
+        pass
+
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data=user(BOT_ID))
+    channel = discord.DMChannel(me=state.user, state=state,
+                                data={'id': 9, 'type': 1, 'recipients': [user(5)]})
+    return bot, state, channel
+
+
+def make_messages(state, channel, count: int, relevant: float) -> list:
+    """Mostly chat (some mentioning other users), a few commands/mentions of the bot"""
+    rng = random.Random(1)
+    messages = []
+    for i in range(count):
+        words = rng.choices(WORDS, k=rng.randint(3, 15))
+        mentions = []
+        roll = rng.random()
+        if roll < relevant / 2:
+            words.insert(0, '!ask')
+        elif roll < relevant:
+            words.insert(0, f'<@{BOT_ID}>')
+            mentions.append(user(BOT_ID))
+        elif roll < 0.1:
+            other = rng.randint(100, 10_000)
+            words.insert(rng.randrange(len(words)), f'<@{other}>')
+            mentions.append(user(other))
+        data = {
+            'id': i + 1, 'channel_id': channel.id, 'author': user(rng.randint(100, 10_000)),
+            'content': ' '.join(words), 'timestamp': '2024-01-01T00:00:00+00:00',
+            'edited_timestamp': None, 'tts': False, 'mention_everyone': False,
+            'mentions': mentions, 'mention_roles': [], 'attachments': [], 'embeds': [],
+            'pinned': False, 'type': 0,
+        }
+        messages.append(discord.Message(state=state, channel=channel, data=data))
+    return messages
+
+
+def handlers(bot):
+    """The old on_message path and the pre-filtered one (AI work itself stubbed out)"""
+    prefilter = MessagePrefilter(bot.command_prefix)
+
+    async def legacy(message):
+        if message.author == bot.user:
+            return
+        if bot.user.mentioned_in(message) and not message.mention_everyone:
+            pass
+        await bot.process_commands(message)
+
+    async def filtered(message):
+        if not prefilter.relevant(message.content, message.mentions, bot.user.id):
+            return
+        if message.author == bot.user:
+            return
+        ctx = await bot.get_context(message)
+        if ctx.valid:
+            if not message.author.bot:
+                await bot.invoke(ctx)
+            return
+        if bot.user.mentioned_in(message) and not message.mention_everyone:
+            pass
+
+    return {'legacy': legacy, 'prefilter': filtered}, prefilter
+
+
+async def tight(handler, messages: list) -> float:
+    """CPU seconds per message, back to back"""
+    start = time.process_time()
+    for message in messages:
+        await handler(message)
+    return (time.process_time() - start) / len(messages)
+
+
+async def paced(handler, messages: list, rate: int, seconds: float) -> float:
+    """Share of one core used while handling `rate` messages per second"""
+    tick = 0.01
+    per_tick = max(1, int(rate * tick))
+    index = 0
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    next_tick = start
+    while time.perf_counter() - start < seconds:
+        for _ in range(per_tick):
+            await handler(messages[index % len(messages)])
+            index += 1
+        next_tick += tick
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    wall = time.perf_counter() - start
+    return (time.process_time() - start_cpu) / wall
+
+
+async def main_async(args):
+    bot, state, channel = make_bot()
+    messages = make_messages(state, channel, args.messages, args.relevant)
+
+    # Building the Message itself happens in discord.py before on_message runs
+    build_start = time.process_time()
+    make_messages(state, channel, 10_000, args.relevant)
+    build_cost = (time.process_time() - build_start) / 10_000
+
+    paths, prefilter = handlers(bot)
+    print(f"{args.messages} messages, {args.relevant * 100:.1f}% addressed to the bot")
+    print(f"(discord.py Message construction, not avoidable here: {build_cost * 1e6:.1f} µs/msg)")
+    print(f"{'path':<10} {'µs/msg':>8} {'core @ ' + str(args.rate) + '/s':>14}")
+    for name, handler in paths.items():
+        await tight(handler, messages[:1000])  # warm up
+        per_message = await tight(handler, messages)
+        core = await paced(handler, messages, args.rate, args.seconds)
+        print(f"{name:<10} {per_message * 1e6:>8.2f} {core * 100:>13.1f}%")
+
+    stats = prefilter.stats()
+    print(f"pre-filter passed {stats['passed']} of {stats['seen']} messages")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--relevant', type=float, default=0.01, help="fraction of commands + mentions")
+    parser.add_argument('--rate', type=int, default=5000, help="messages per second for the paced run")
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark: rate limiter lama (list timestamp) vs GCRA
+
+Simulasi 100k user berbeda yang masing-masing request beberapa kali,
+lalu ukur waktu per check dan memori yang tersisa setelah user idle.
+
+Usage:
+    python benchmarks/bench_rate_limit.py
+    python benchmarks/bench_rate_limit.py --users 100000 --rounds 3
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import RateLimiter  # noqa: E402
+
+MAX_REQUESTS_PER_MINUTE = 10
+
+
+class LegacyLimiter:
+    """The previous check_rate_limit, with an injectable clock"""
+
+    def __init__(self):
+        self.user_cooldowns = {}
+
+    def check(self, user_id: int, now: float) -> bool:
+        if user_id not in self.user_cooldowns:
+            self.user_cooldowns[user_id] = []
+        self.user_cooldowns[user_id] = [
+            req_time for req_time in self.user_cooldowns[user_id]
+            if now - req_time < 60
+        ]
+        if len(self.user_cooldowns[user_id]) >= MAX_REQUESTS_PER_MINUTE:
+            return False
+        self.user_cooldowns[user_id].append(now)
+        return True
+
+
+def drive(check, users: int, rounds: int) -> int:
+    """Make `rounds` requests for each of `users` users, 4s apart per user"""
+    calls = 0
+    for r in range(rounds):
+        now = 1000.0 + r * 4.0
+        for user_id in range(users):
+            check(user_id, now)
+            calls += 1
+    return calls
+
+
+def run(name: str, factory, users: int, rounds: int):
+    """Time one implementation, then measure memory held before/after users go idle"""
+    check, after_idle = factory()
+    start = time.perf_counter()
+    calls = drive(check, users, rounds)
+    elapsed = time.perf_counter() - start
+
+    # Memory is measured on a fresh instance: tracemalloc would skew the timing
+    tracemalloc.start()
+    check, after_idle = factory()
+    drive(check, users, rounds)
+    held, _ = tracemalloc.get_traced_memory()
+    # Everyone goes idle for 10 minutes, then housekeeping runs
+    after_idle(1000.0 + rounds * 4.0 + 600)
+    idle_held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<8} {elapsed / calls * 1e9:>10.0f} {held / 1024 / 1024:>12.1f} "
+          f"{idle_held / 1024 / 1024:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.users} users x {args.rounds} requests")
+    print(f"{'impl':<8} {'ns/check':>10} {'MiB active':>12} {'MiB after idle':>14}")
+
+    def legacy():
+        # The old code never forgets a user; the best it can do is one more check
+        limiter = LegacyLimiter()
+        return limiter.check, lambda now: limiter.check(0, now)
+
+    def gcra_user():
+        # Same per-user limit as legacy, nothing else
+        limiter = RateLimiter(user_per_minute=MAX_REQUESTS_PER_MINUTE, cooldown=0,
+                              channel_per_minute=30, guild_per_minute=60)
+        return (lambda user_id, now: limiter.hit(user_id, now=now)), limiter.sweep
+
+    def gcra_full():
+        # Cooldown + user + channel + guild: 1000 channels across 100 guilds
+        limiter = RateLimiter(user_per_minute=MAX_REQUESTS_PER_MINUTE, cooldown=3,
+                              channel_per_minute=10_000, guild_per_minute=100_000)
+        return (lambda user_id, now: limiter.hit(user_id, user_id % 1000, user_id % 100, now=now)), \
+            limiter.sweep
+
+    run('legacy', legacy, args.users, args.rounds)
+    run('gcra', gcra_user, args.users, args.rounds)
+    run('gcra+4', gcra_full, args.users, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark: rate limit bersama untuk beberapa proses di satu host
+
+8 proses (default) memanggil hit() bersamaan, untuk tiap backend:
+  memory   RateLimiter biasa per proses (limit efektif jadi N kali lipat)
+  shm      SharedRateLimiter, slot di shared memory dengan lock per stripe
+  shm-1    SharedRateLimiter dengan satu stripe (satu lock global)
+  socket   state server cluster.py lewat Unix socket (satu round trip per hit)
+
+Fase "throughput" mengukur hits/s, p50 dan p99 saat semua request lolos (setiap hit
+menulis state), fase "limit" mengecek berapa request yang lolos untuk 100 user
+yang di-spam semua proses (seharusnya ~100 x limit, bukan N kali lipat).
+
+Usage:
+    python benchmarks/bench_shared_rate_limit.py
+    python benchmarks/bench_shared_rate_limit.py --processes 8 --hits 20000
+"""
+
+import argparse
+import asyncio
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import RateLimiter  # noqa: E402
+from shared_state import LocalState, SocketState, StateServer  # noqa: E402
+from shm_store import SharedRateLimiter  # noqa: E402
+
+LIMIT_USERS = 100
+LIMIT_PER_MINUTE = 10
+
+
+def limits(phase: str) -> dict:
+    if phase == 'limit':
+        return dict(user_per_minute=LIMIT_PER_MINUTE, cooldown=0,
+                    channel_per_minute=10 ** 9, guild_per_minute=10 ** 9)
+    # Nothing is rejected: every hit writes cooldown, user, channel and guild state
+    return dict(user_per_minute=10 ** 9, cooldown=1e-9,
+                channel_per_minute=10 ** 9, guild_per_minute=10 ** 9)
+
+
+def workload(phase: str, seed: int, hits: int) -> list:
+    rng = random.Random(seed)
+    if phase == 'limit':
+        return [(rng.randrange(LIMIT_USERS), None, None) for _ in range(hits)]
+    # 10k users over 1000 channels in 100 guilds
+    calls = []
+    for _ in range(hits):
+        user_id = rng.randrange(10_000)
+        channel_id = 1_000_000 + rng.randrange(1000)
+        calls.append((user_id, channel_id, 2_000_000 + channel_id % 100))
+    return calls
+
+
+def make_hit(mode: str, phase: str, path: str):
+    """hit(user, channel, guild) for this process, plus a cleanup"""
+    if mode == 'memory':
+        limiter = RateLimiter(**limits(phase))
+        return limiter.hit, None
+    if mode in ('shm', 'shm-1'):
+        limiter = SharedRateLimiter(path, slots=65536, stripes=1 if mode == 'shm-1' else 256,
+                                    **limits(phase))
+        return limiter.hit, None
+    loop = asyncio.new_event_loop()
+    state = SocketState(path, timeout=5.0)
+    return (lambda *keys: loop.run_until_complete(state.hit(*keys))), \
+        (lambda: loop.run_until_complete(state.close()))
+
+
+def worker(mode: str, phase: str, path: str, index: int, hits: int, barrier, results):
+    hit, cleanup = make_hit(mode, phase, path)
+    calls = workload(phase, index, hits)
+    timings = []
+    allowed = 0
+    barrier.wait()
+    start = time.perf_counter()
+    for keys in calls:
+        before = time.perf_counter_ns()
+        retry_after, _ = hit(*keys)
+        timings.append(time.perf_counter_ns() - before)
+        allowed += not retry_after
+    elapsed = time.perf_counter() - start
+    if cleanup is not None:
+        cleanup()
+    timings.sort()
+    results.put((elapsed, allowed, timings[len(timings) // 2], timings[int(len(timings) * 0.99)]))
+
+
+def serve(path: str, phase: str, ready):
+    """State server process for the socket mode"""
+    async def main():
+        server = StateServer(LocalState(RateLimiter(**limits(phase))), path)
+        await server.start()
+        ready.set()
+        await asyncio.Event().wait()
+    asyncio.run(main())
+
+
+def run(mode: str, phase: str, processes: int, hits: int) -> tuple:
+    directory = tempfile.mkdtemp(dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    path = os.path.join(directory, 'state.sock' if mode == 'socket' else 'ratelimit.shm')
+    server = None
+    try:
+        if mode == 'socket':
+            ready = multiprocessing.Event()
+            server = multiprocessing.Process(target=serve, args=(path, phase, ready), daemon=True)
+            server.start()
+            ready.wait(10)
+        barrier = multiprocessing.Barrier(processes)
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=worker,
+                                           args=(mode, phase, path, index, hits, barrier, results))
+                   for index in range(processes)]
+        for process in workers:
+            process.start()
+        outcome = [results.get() for _ in workers]
+        for process in workers:
+            process.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    wall = max(elapsed for elapsed, *_ in outcome)
+    total = processes * hits
+    return (total / wall, max(p50 for *_, p50, _ in outcome), max(p99 for *_, p99 in outcome),
+            sum(allowed for _, allowed, *_ in outcome), wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--hits', type=int, default=20_000, help="hits per process")
+    parser.add_argument('--modes', default='memory,shm,shm-1,socket')
+    args = parser.parse_args()
+    modes = args.modes.split(',')
+
+    # With fewer CPUs than processes, p99 mostly shows a lock holder being preempted
+    print(f"throughput: {args.processes} processes x {args.hits} hits on {os.cpu_count()} CPUs, "
+          f"everything allowed")
+    print(f"{'backend':<8} {'hits/s':>10} {'p50 us':>8} {'p99 us':>8}")
+    for mode in modes:
+        rate, p50, p99, _, _ = run(mode, 'throughput', args.processes, args.hits)
+        print(f"{mode:<8} {rate:>10.0f} {p50 / 1000:>8.1f} {p99 / 1000:>8.1f}")
+
+    print()
+    print(f"limit: {args.processes} processes spam {LIMIT_USERS} users, "
+          f"{LIMIT_PER_MINUTE}/minute each")
+    print(f"{'backend':<8} {'allowed':>8} {'expected':>9}")
+    for mode in modes:
+        *_, allowed, wall = run(mode, 'limit', args.processes, args.hits)
+        # Burst of LIMIT_PER_MINUTE, plus what refills while the phase runs
+        expected = LIMIT_USERS * (LIMIT_PER_MINUTE + math.ceil(wall * LIMIT_PER_MINUTE / 60))
+        print(f"{mode:<8} {allowed:>8} {'<= ' + str(expected):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,96 @@
 import os
 import discord
+from discord import app_commands
 from discord.ext import commands
-from openai import OpenAI
-from dotenv import load_dotenv
 import asyncio
 from datetime import datetime
 import logging
+import math
+import time
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('data/logs/bot.log'),
-        logging.StreamHandler()
-    ]
-)
+import config
+from ai_client import get_llm_client, close_clients
+from streaming import StreamingReply
+from memory import ConversationMemory, estimate_tokens
+from history_store import create_history_backend
+from response_cache import create_response_cache
+from singleflight import SingleFlight, request_key
+from shared_state import create_shared_state
+from cluster import parse_shard_ids
+from scheduler import (UpstreamScheduler, QueueFullError,
+                       PRIORITY_ADMIN, PRIORITY_SHORT, PRIORITY_NORMAL)
+from model_router import ModelRouter
+from hedging import Hedger
+from deadline import DeadlineExceeded, current_deadline, start_deadline, upstream_timeout
+from request_tracker import RequestTracker
+from pipeline import AIRequest, Pipeline, StageStats, STAGES
+from prefilter import MessagePrefilter
+from channel_actor import ChannelActors
+from interactions import InteractionServer, SignatureVerifier
+from batching import (BatchAbandoned, BatchStats, QuestionBatch,
+                      build_batch_messages, split_batch_answer)
+from metrics import MetricsRegistry, MetricsServer, RateLimitLogCounter
+from loop_monitor import LoopLagMonitor
+from tracing import Tracer, leaf_span, span
+from log_pipeline import setup_logging
+
+# Setup logging: records go through a queue, a background thread writes them
+log_queue = setup_logging()
 logger = logging.getLogger('DiscordAI')
 
-# Load environment variables
-load_dotenv()
-
-# Initialize Groq client
-groq_client = OpenAI(
-    api_key=os.getenv("GROQ_API_KEY"),
-    base_url="https://api.groq.com/openai/v1"
-)
+# Initialize Groq client (async, shared connection pool)
+groq_client = get_llm_client()
 
 # Bot configuration
 intents = discord.Intents.default()
-intents.message_content = True  # WAJIB untuk membaca pesan
+# Without it prefix commands only work in DMs and messages that mention the bot
+intents.message_content = config.MESSAGE_CONTENT_INTENT
 intents.messages = True
 intents.guilds = True
 
-bot = commands.Bot(command_prefix='!', intents=intents, help_command=None)
+# Shards are identified automatically; under cluster.py each process runs a range
+bot = commands.AutoShardedBot(
+    command_prefix='!', intents=intents, help_command=None,
+    shard_count=config.SHARD_COUNT or None, shard_ids=parse_shard_ids(config.SHARD_IDS)
+)
+
+# Rejects chat not addressed to the bot before any command parsing
+message_prefilter = MessagePrefilter(bot.command_prefix)
+
+# Conversation history storage (per channel, bounded by LRU/TTL and tokens)
+history_backend = create_history_backend()
+conversation_history = ConversationMemory(backend=history_backend)
+
+# Cache of answers to repeated questions (None when disabled)
+response_cache = create_response_cache()
+
+# Rate limiting (GCRA per user, channel and guild)
+COOLDOWN_SECONDS = config.COOLDOWN_SECONDS
+MAX_REQUESTS_PER_MINUTE = config.MAX_REQUESTS_PER_MINUTE
+
+# Rate limits and pinned models, shared by every worker of a cluster (STATE_BACKEND)
+shared_state = create_shared_state()
 
-# Conversation history storage (per channel)
-conversation_history = {}
+# Identical in-flight requests share one upstream call
+inflight_requests = SingleFlight()
 
-# Rate limiting storage
-user_cooldowns = {}
-COOLDOWN_SECONDS = 3
-MAX_REQUESTS_PER_MINUTE = 10
+# Questions being answered, by message id (cancelled/restarted on delete/edit)
+request_tracker = RequestTracker()
+
+# Every AI question (mention, !ask, ...) goes through one staged pipeline
+ai_pipeline = Pipeline()
+stage_stats = StageStats()
+ai_pipeline.add_hook(stage_stats.record)
+
+# One question at a time per channel, in order, so history stays consistent
+channel_actors = ChannelActors()
+
+# Opt-in: questions waiting in a channel are answered together in one call
+batch_stats = BatchStats()
+
+# Upstream concurrency, Groq quota tracking and retries
+upstream_scheduler = UpstreamScheduler()
+MAX_TOKENS = 500
 
 # Model configuration
 MODELS = {
@@ -49,61 +98,281 @@ MODELS = {
     'whisper': 'whisper-large-v3-turbo',
     'openai': 'openai/gpt-oss-safeguard-20b'
 }
-current_model = MODELS['groq']
 
+# Per-request model choice: fastest healthy model in MODEL_TIER, or a guild/channel override
+model_router = ModelRouter(MODELS)
 
-def check_rate_limit(user_id: int) -> bool:
-    """Check if user is rate limited"""
-    now = datetime.now().timestamp()
-    
-    if user_id not in user_cooldowns:
-        user_cooldowns[user_id] = []
-    
-    # Remove old requests (older than 1 minute)
-    user_cooldowns[user_id] = [
-        req_time for req_time in user_cooldowns[user_id] 
-        if now - req_time < 60
-    ]
-    
-    # Check if exceeded limit
-    if len(user_cooldowns[user_id]) >= MAX_REQUESTS_PER_MINUTE:
-        return False
-    
-    user_cooldowns[user_id].append(now)
-    return True
+# Opt-in backup calls for requests slower than the recent tail latency
+hedger = Hedger()
+
+# Sampled span trees of AI requests (TRACE_SAMPLE_RATE), exported in the background
+tracer = Tracer()
+
+# How late the event loop runs its callbacks (sampled in the background)
+loop_monitor = LoopLagMonitor()
+
+# Prometheus metrics (METRICS_PORT): hooks record what happens on the request
+# path, everything the components already count is read when scraped
+metrics = MetricsRegistry()
+request_outcomes = metrics.counter(
+    'requests_total', "AI requests by entry point and outcome", ('source', 'outcome'))
+stage_seconds = metrics.histogram('stage_seconds', "Time spent in each pipeline stage", ('stage',))
+upstream_seconds = metrics.histogram(
+    'upstream_seconds', "Upstream call latency per model (time to first token when streaming)",
+    ('model', 'result'))
+rate_limit_rejections = metrics.counter(
+    'rate_limited_total', "Requests rejected by the rate limiter", ('scope',))
+loop_lag_seconds = metrics.histogram(
+    'event_loop_lag_seconds', "How late the event loop woke up a timer",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+discord_rate_limits = RateLimitLogCounter().install()
+ai_pipeline.add_hook(lambda request, stage, seconds: stage_seconds.observe(seconds, stage))
+model_router.add_hook(
+    lambda model, latency, ok: upstream_seconds.observe(latency, model, 'ok' if ok else 'error'))
+loop_monitor.add_hook(loop_lag_seconds.observe)
+metrics.counter('discord_429_total', "429 responses from the Discord API", ('scope',),
+                collect=lambda: {(scope,): count for scope, count in discord_rate_limits.counts.items()})
+metrics.gauge('gateway_latency_seconds', "Heartbeat latency per shard", ('shard',),
+              collect=lambda: {(shard_id,): latency for shard_id, latency in bot.latencies
+                               if not math.isnan(latency)})
+metrics.counter('event_loop_stalls_total', "Event loop lag samples above LOOP_STALL_THRESHOLD",
+                collect=lambda: loop_monitor.stall_count)
+metrics.gauge('event_loop_lag_max_seconds', "Largest event loop lag seen",
+              collect=lambda: loop_monitor.max_lag)
+metrics.gauge('queue_depth', "Requests waiting for their turn", ('queue',),
+              collect=lambda: {('upstream',): upstream_scheduler.queued,
+                               ('channels',): channel_actors.stats()['queued']})
+metrics.gauge('upstream_in_flight', "Upstream calls in progress",
+              collect=lambda: upstream_scheduler.in_flight)
+metrics.counter('upstream_retries_total', "Upstream calls retried after an error",
+                collect=lambda: upstream_scheduler.retries)
+metrics.counter('cache_lookups_total', "Response cache lookups by result", ('result',),
+                collect=lambda: {} if response_cache is None else {
+                    ('hit_memory',): response_cache.hits_memory,
+                    ('hit_disk',): response_cache.hits_disk,
+                    ('hit_semantic',): response_cache.hits_semantic,
+                    ('miss',): response_cache.misses,
+                })
+metrics.counter('traces_total', "Request traces by what became of them", ('result',),
+                collect=lambda: {(result,): tracer.stats()[result]
+                                 for result in ('exported', 'discarded', 'dropped')})
+metrics.gauge('history_memory', "Conversation history held in this process", ('measure',),
+              collect=lambda: {(measure,): value for measure, value in conversation_history.stats().items()
+                               if measure in ('channels', 'messages', 'tokens', 'bytes')})
+metrics.counter('log_records_lost_total', "Log records not written because logging was overloaded", ('reason',),
+                collect=lambda: {(reason,): log_queue.stats()[reason] for reason in ('dropped', 'sampled_out')})
+metrics.gauge('log_queue_depth', "Log records waiting for the writer thread",
+              collect=lambda: log_queue.stats()['queued'])
+
+
+async def check_rate_limit(user_id: int, channel_id: int = None, guild_id: int = None) -> tuple:
+    """Check if user is rate limited: returns (retry_after, scope), (0, None) if allowed"""
+    return await shared_state.hit(user_id, channel_id, guild_id)
+
+
+async def refresh_overrides(guild_id: int = None, channel_id: int = None):
+    """Copy the models pinned for this guild/channel from the shared state into the router"""
+    guild_model, channel_model = await shared_state.overrides(guild_id, channel_id)
+    if guild_id is not None:
+        model_router.set_override(guild_model, guild_id)
+    model_router.set_override(channel_model, guild_id, channel_id)
+
+
+def create_busy_embed(author) -> discord.Embed:
+    """Create the embed shown when the AI queue is full"""
+    return create_embed(
+        "🚦 Bot Sedang Sibuk",
+        "Terlalu banyak pertanyaan yang sedang antri. Coba lagi sebentar lagi!",
+        discord.Color.orange(),
+        author=author
+    )
+
+
+def create_timeout_embed(author) -> discord.Embed:
+    """Create the embed shown when a request ran out of time"""
+    return create_embed(
+        "⏱️ Waktu Habis",
+        "AI terlalu lama menjawab, permintaan dibatalkan. Coba lagi sebentar lagi!",
+        discord.Color.orange(),
+        author=author
+    )
+
+
+def create_rate_limit_embed(retry_after: float, scope: str, author) -> discord.Embed:
+    """Create the embed explaining which rate limit was hit"""
+    reasons = {
+        'cooldown': f"Tunggu {COOLDOWN_SECONDS:g} detik antar request.",
+        'user': f"Anda terlalu banyak request! Tunggu sebentar.\nMax {MAX_REQUESTS_PER_MINUTE} requests per menit.",
+        'channel': "Channel ini sedang ramai, tunggu sebentar.",
+        'guild': "Server ini sedang ramai, tunggu sebentar.",
+    }
+    return create_embed(
+        "⏳ Rate Limit",
+        f"{reasons[scope]}\nCoba lagi dalam **{math.ceil(retry_after)} detik**.",
+        discord.Color.red(),
+        author=author
+    )
+
+
+def estimate_prompt_tokens(messages: list) -> int:
+    """Estimate the prompt tokens of a completion request"""
+    return sum(estimate_tokens(m["content"]) for m in messages)
+
+
+def estimate_request_tokens(messages: list, max_tokens: int = None) -> int:
+    """Estimate the quota tokens a completion request will use"""
+    return estimate_prompt_tokens(messages) + (max_tokens or MAX_TOKENS)
 
 
-async def get_ai_response(messages: list, model: str = None) -> str:
+def request_priority(author, question: str) -> int:
+    """Pick the AI queue priority: admins first, then short prompts"""
+    permissions = getattr(author, 'guild_permissions', None)
+    if permissions is not None and permissions.administrator:
+        return PRIORITY_ADMIN
+    if estimate_tokens(question) <= config.SHORT_PROMPT_TOKENS:
+        return PRIORITY_SHORT
+    return PRIORITY_NORMAL
+
+
+def can_hedge(model: str, tokens: int) -> bool:
+    """Hedge only with spare capacity: the backup call must not queue or wait for quota"""
+    return (upstream_scheduler.queued == 0 and
+            upstream_scheduler.in_flight < upstream_scheduler.max_concurrency and
+            upstream_scheduler.quota(model).delay(tokens, time.monotonic()) == 0)
+
+
+async def get_ai_response(messages: list, model: str = None, guild_id: int = None,
+                          priority: int = PRIORITY_NORMAL, retries: int = None,
+                          max_tokens: int = None) -> str:
     """Get response from Groq API"""
-    try:
-        response = await asyncio.to_thread(
-            groq_client.chat.completions.create,
-            model=model or current_model,
-            messages=messages,
-            max_tokens=500,
-            temperature=0.7
+    model = model or model_router.default_model
+    max_tokens = max_tokens or MAX_TOKENS
+    tokens = estimate_request_tokens(messages, max_tokens)
+    
+    async def call(model):
+        with leaf_span('upstream', model=model, stream=False) as upstream:
+            def create():
+                if upstream is not None:
+                    # Out of the scheduler queue (again on every retry)
+                    upstream.event('dispatched')
+                return asyncio.wait_for(
+                    groq_client.chat.completions.with_raw_response.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=0.7,
+                        timeout=upstream_timeout()
+                    ),
+                    config.MODEL_TIMEOUT
+                )
+            
+            raw = await upstream_scheduler.run(guild_id, model, tokens, create,
+                                               priority=priority, max_retries=retries)
+            return raw.parse().choices[0].message.content
+    
+    async def fetch():
+        return await hedger.run(
+            model, call,
+            alternate=model_router.alternate(model) if config.HEDGE_ALTERNATE else None,
+            tokens=tokens,
+            allow=lambda backup_model: can_hedge(backup_model, tokens)
         )
-        return response.choices[0].message.content
+    
+    try:
+        return await inflight_requests.do(request_key(model, messages), fetch)
     except Exception as e:
         logger.error(f"Error getting AI response: {e}")
         raise
 
 
-def get_channel_history(channel_id: int) -> list:
-    """Get conversation history for a channel"""
-    if channel_id not in conversation_history:
-        conversation_history[channel_id] = []
-    return conversation_history[channel_id]
+async def stream_ai_response(messages: list, model: str = None, guild_id: int = None,
+                             priority: int = PRIORITY_NORMAL, retries: int = None):
+    """Stream response tokens from Groq API"""
+    model = model or model_router.default_model
+    tokens = estimate_request_tokens(messages)
+    
+    async def open_stream(model):
+        with leaf_span('upstream', model=model, stream=True) as upstream:
+            def create():
+                if upstream is not None:
+                    # Out of the scheduler queue (again on every retry)
+                    upstream.event('dispatched')
+                return asyncio.wait_for(
+                    groq_client.chat.completions.with_raw_response.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=MAX_TOKENS,
+                        temperature=0.7,
+                        stream=True,
+                        timeout=upstream_timeout()
+                    ),
+                    config.MODEL_TIMEOUT
+                )
+            
+            # The slot stays held until the stream has been read to the end
+            raw = await upstream_scheduler.run(guild_id, model, tokens, create, hold=True,
+                                               priority=priority, max_retries=retries)
+            chunks = 0
+            try:
+                stream = raw.parse()
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if upstream is not None and not chunks:
+                                upstream.event('first_token')
+                                upstream.set(ttft_ms=round(upstream.duration * 1000, 1))
+                            chunks += 1
+                            yield chunk.choices[0].delta.content
+            finally:
+                upstream_scheduler.release()
+                if upstream is not None:
+                    upstream.set(chunks=chunks)
+    
+    def fetch():
+        return hedger.stream(
+            model, open_stream,
+            alternate=model_router.alternate(model) if config.HEDGE_ALTERNATE else None,
+            tokens=tokens,
+            allow=lambda backup_model: can_hedge(backup_model, tokens)
+        )
+    
+    async for token in inflight_requests.stream(request_key(model, messages), fetch):
+        yield token
+
+
+def failover_retries(last: bool) -> int:
+    """Retry budget on one model: fewer while another model can take over"""
+    return None if last else config.FAILOVER_RETRIES
+
+
+async def get_channel_history(channel_id: int) -> list:
+    """Get conversation history for a channel (stored channels load off the event loop)"""
+    return await conversation_history.get(channel_id)
 
 
 def add_to_history(channel_id: int, role: str, content: str):
     """Add message to conversation history"""
-    history = get_channel_history(channel_id)
-    history.append({"role": role, "content": content})
-    
-    # Keep only last 10 messages for context
-    if len(history) > 10:
-        conversation_history[channel_id] = history[-10:]
+    # Trims to the last MAX_HISTORY messages and the channel's token budget
+    conversation_history.append(channel_id, role, content)
+
+
+def parse_mention_question(content: str) -> str:
+    """Strip the bot mention from a message (None if nothing is left)"""
+    for mention in (f'<@{bot.user.id}>', f'<@!{bot.user.id}>'):
+        content = content.replace(mention, '')
+    content = content.strip()
+    # "@bot !ask foo" asks "foo", once
+    ask = f"{bot.command_prefix}ask"
+    if content.split(maxsplit=1)[:1] == [ask]:
+        return parse_command_question(content, ask)
+    return content or None
+
+
+def parse_command_question(content: str, invoked: str) -> str:
+    """Get the argument of a command like '!ask ...' (None if it is no longer one)"""
+    if content.split(maxsplit=1)[:1] != [invoked]:
+        return None
+    return content[len(invoked):].strip() or None
 
 
 def create_embed(title: str, description: str, color: discord.Color, 
@@ -128,6 +397,333 @@ def create_embed(title: str, description: str, color: discord.Color,
     return embed
 
 
+def create_answer_embed(question: str, answer: str, author, done: bool = True,
+                        model: str = None, timed_out: bool = False) -> discord.Embed:
+    """Create the AI answer embed (done=False shows a typing cursor)"""
+    if not done:
+        answer = answer[:1022] + " ▌"
+    elif timed_out:
+        answer = answer[:980] + "\n\n⏱️ *Jawaban terpotong: batas waktu habis.*"
+    
+    embed = discord.Embed(
+        title="💬 Balasan AI",
+        color=discord.Color.blue(),
+        timestamp=datetime.now()
+    )
+    embed.add_field(name="📝 Pertanyaan", value=question[:1024], inline=False)
+    embed.add_field(name="🤖 Jawaban", value=answer[:1024] or "…", inline=False)
+    embed.set_footer(
+        text=f"Requested by {author.name} | Model: {model or 'auto'}",
+        icon_url=author.avatar.url if author.avatar else None
+    )
+    return embed
+
+
+async def answer_in_order(request: AIRequest, question: str) -> str:
+    """Wait for the channel's earlier questions, then answer with their history"""
+    request.question = question
+    with ai_pipeline.stage(request, 'queue'):
+        batch = await channel_actors.acquire(request.channel_id, request.deadline, request)
+    if batch is not None:
+        # Taken into the batch of the question ahead of us, which sends our reply
+        try:
+            with ai_pipeline.stage(request, 'generate'):
+                return await batch.wait(request)
+        except BatchAbandoned:
+            return await answer_in_order(request, question)
+    try:
+        # A re-asked (edited) question keeps the context of its first turn
+        if request.context is None:
+            with span('history') as history:
+                request.context = await get_channel_history(request.channel_id)
+                if history is not None:
+                    history.set(messages=len(request.context))
+        return await answer_question(request, question)
+    finally:
+        channel_actors.release(request.channel_id)
+
+
+async def answer_question(request: AIRequest, question: str) -> str:
+    """Cache, route, generate, render and send the answer to one question"""
+    deadline = request.deadline
+    current_deadline.set(deadline)
+    author = request.author
+    # The question joins the history only once answered, so a cancelled
+    # request leaves no trace and a restarted one reuses the same context
+    history = request.context + [{"role": "user", "content": question}]
+    request.priority = request_priority(author, question)
+    
+    with ai_pipeline.stage(request, 'cache'):
+        # Answers are cached per pinned model, or shared by the whole auto tier
+        await refresh_overrides(request.guild_id, request.channel_id)
+        request.cache_model = model_router.preference(request.guild_id, request.channel_id) or 'auto'
+        cached = None
+        if response_cache is not None:
+            cached = await response_cache.get(question, request.cache_model, request.context)
+    
+    batch = None
+    if cached is not None:
+        request.cached = True
+        request.model = f"{request.cache_model} (cache)"
+        ai_response = cached
+        with ai_pipeline.stage(request, 'render'):
+            embed = create_answer_embed(question, cached, author, model=request.model)
+        with ai_pipeline.stage(request, 'send'):
+            await deadline.run(request.reply(embed=embed))
+    else:
+        if config.BATCH_QUESTIONS:
+            batch = QuestionBatch()
+            batch.add(channel_actors.take_waiting(request.channel_id, config.BATCH_MAX_QUESTIONS - 1, batch))
+        ai_response = await answer_batch(request, question, batch) if batch else None
+        if ai_response is None:
+            ai_response = await generate_answer(request, question, history)
+    
+    add_to_history(request.channel_id, "user", question)
+    add_to_history(request.channel_id, "assistant", ai_response)
+    # Batched questions were asked after this one and follow it in the history
+    for follower in (batch.requests if batch else ()):
+        if follower.answer is not None:
+            add_to_history(request.channel_id, "user", follower.question)
+            add_to_history(request.channel_id, "assistant", follower.answer)
+    request.answer = ai_response
+    return ai_response
+
+
+async def generate_answer(request: AIRequest, question: str, history: list) -> str:
+    """Route to a model, generate (streamed when enabled), render and send"""
+    deadline = request.deadline
+    author = request.author
+    guild_id = request.guild_id
+    priority = request.priority
+    
+    with ai_pipeline.stage(request, 'route'):
+        candidates = request.candidates = model_router.candidates(guild_id, request.channel_id)
+    
+    started = time.perf_counter()
+    # Generation stops early enough to leave time for delivering the reply
+    reserve = config.DEADLINE_SEND_RESERVE
+    request.timed_out = False
+    if not config.STREAM_RESPONSES:
+        with ai_pipeline.stage(request, 'generate'):
+            request.model, ai_response = await deadline.run(
+                model_router.run(
+                    candidates,
+                    lambda model, last: get_ai_response(history, model, guild_id, priority,
+                                                        failover_retries(last))
+                ),
+                reserve
+            )
+        with ai_pipeline.stage(request, 'render'):
+            embed = create_answer_embed(question, ai_response, author, model=request.model)
+        with ai_pipeline.stage(request, 'send'):
+            await deadline.run(request.reply(embed=embed))
+    else:
+        request.model = candidates[0]
+        streamer = StreamingReply(
+            request.reply,
+            lambda text, done: create_answer_embed(question, text, author, done,
+                                                   request.model, request.timed_out),
+            request.channel_id
+        )
+        
+        async def generate():
+            async for model, token in model_router.stream(
+                candidates,
+                lambda model, last: stream_ai_response(history, model, guild_id, priority,
+                                                       failover_retries(last))
+            ):
+                request.model = model
+                await streamer.feed(token)
+        
+        # Partial answers are rendered and sent while generating; the final
+        # edit is the send stage
+        try:
+            with ai_pipeline.stage(request, 'generate'):
+                await deadline.run(generate(), reserve)
+        except DeadlineExceeded:
+            # Keep whatever was streamed; with nothing to show, report the timeout
+            if not streamer.text:
+                raise
+            request.timed_out = True
+            logger.warning(f"⏱️ Deadline hit after {deadline.elapsed:.1f}s, sending partial answer")
+        except asyncio.CancelledError:
+            # Question deleted or edited: the partial reply is stale
+            if streamer.message is not None:
+                await streamer.close()
+                try:
+                    await streamer.message.delete()
+                except discord.HTTPException:
+                    pass
+            raise
+        finally:
+            await streamer.close()
+        with ai_pipeline.stage(request, 'send'):
+            ai_response = await deadline.run(streamer.finish())
+    
+    if response_cache is not None and not request.timed_out:
+        await response_cache.put(question, request.cache_model, request.context, ai_response,
+                                 time.perf_counter() - started)
+    return ai_response
+
+
+async def answer_batch(request: AIRequest, question: str, batch: QuestionBatch) -> str:
+    """
+    Answer this question and the ones taken from the channel's mailbox in one call.
+
+    Sends every reply; returns None when the answer could not be split, in
+    which case each question is asked on its own.
+    """
+    deadline = request.deadline
+    questions = [question] + [follower.question for follower in batch.requests]
+    messages = build_batch_messages(request.context, questions)
+    try:
+        with ai_pipeline.stage(request, 'route'):
+            candidates = request.candidates = model_router.candidates(request.guild_id, request.channel_id)
+        with ai_pipeline.stage(request, 'generate'):
+            request.model, text = await deadline.run(
+                model_router.run(
+                    candidates,
+                    lambda model, last: get_ai_response(messages, model, request.guild_id, request.priority,
+                                                        failover_retries(last),
+                                                        max_tokens=MAX_TOKENS * len(questions))
+                ),
+                config.DEADLINE_SEND_RESERVE
+            )
+        answers = split_batch_answer(text, len(questions))
+    except BaseException:
+        batch.fail_all()
+        raise
+    if answers[0] is None:
+        # Not in the expected format: everyone asks on their own
+        logger.warning(f"⚠️ Batched answer for {len(questions)} questions could not be split")
+        batch.fail_all()
+        batch_stats.record(len(questions), 0, 0, 0)
+        return None
+    
+    batch_stats.record(
+        len(questions), sum(answer is not None for answer in answers),
+        sum(estimate_prompt_tokens(request.context + [{"role": "user", "content": q}])
+            for q, answer in zip(questions, answers) if answer is not None),
+        estimate_prompt_tokens(messages)
+    )
+    logger.info(f"📦 Answered {len(questions)} questions in channel {request.channel_id} with one call")
+    
+    with ai_pipeline.stage(request, 'render'):
+        embed = create_answer_embed(question, answers[0], request.author, model=request.model)
+    try:
+        with ai_pipeline.stage(request, 'send'):
+            await deadline.run(request.reply(embed=embed))
+    except BaseException:
+        batch.fail_all()
+        raise
+    
+    for follower, answer in zip(batch.requests, answers[1:]):
+        if answer is None or not batch.active(follower):
+            batch.fail(follower)
+            continue
+        follower.model = request.model
+        try:
+            await follower.deadline.run(follower.reply(
+                embed=create_answer_embed(follower.question, answer, follower.author, model=request.model)
+            ))
+        except Exception as e:
+            batch.fail(follower, e)
+            continue
+        follower.answer = answer
+        batch.resolve(follower, answer)
+    return answers[0]
+
+
+def create_usage_embed(source: str, author) -> discord.Embed:
+    """Create the embed shown when a request carries no question"""
+    if source == 'mention':
+        return create_embed(
+            "❓ Pertanyaan Kosong",
+            "Silakan mention saya dengan pertanyaan Anda!\nContoh: `@bot Apa itu Python?`",
+            discord.Color.orange(),
+            author=author
+        )
+    return create_embed(
+        "❓ Format Salah",
+        "**Usage:** `!ask [pertanyaan]`\n**Contoh:** `!ask Apa itu Discord bot?`",
+        discord.Color.orange(),
+        author=author
+    )
+
+
+def record_outcome(request: AIRequest, outcome: str):
+    """Count how a request ended, and note it on its trace"""
+    request_outcomes.inc(request.source, outcome)
+    if request.trace is not None:
+        request.trace.root.set(outcome=outcome)
+
+
+async def run_ai_pipeline(request: AIRequest):
+    """Take one AI request from parsing to the sent reply (at most once per message)"""
+    if not ai_pipeline.claim(request.message_id):
+        return
+    with tracer.trace('ai_request', source=request.source, message_id=request.message_id,
+                      channel_id=request.channel_id, guild_id=request.guild_id) as root:
+        request.trace = root.trace if root is not None else None
+        await handle_ai_request(request)
+        if root is not None:
+            root.set(model=request.model, cached=request.cached)
+
+
+async def handle_ai_request(request: AIRequest):
+    """Parse, rate-limit and answer a claimed request; every outcome gets a reply"""
+    request.deadline = current_deadline.get() or start_deadline()
+    
+    with ai_pipeline.stage(request, 'parse'):
+        request.question = request.parse(request.content)
+    if not request.question:
+        record_outcome(request, 'no_question')
+        await request.reply(embed=create_usage_embed(request.source, request.author))
+        return
+    
+    with ai_pipeline.stage(request, 'rate_limit'):
+        retry_after, scope = await check_rate_limit(request.author.id, request.channel_id, request.guild_id)
+    if retry_after:
+        record_outcome(request, 'rate_limited')
+        rate_limit_rejections.inc(scope)
+        await request.reply(embed=create_rate_limit_embed(retry_after, scope, request.author))
+        return
+    
+    # Show typing indicator
+    async with request.channel.typing():
+        try:
+            # An edit of the message re-asks, a deletion cancels (also while
+            # still waiting for the channel's turn)
+            answer = await request_tracker.run(
+                request.message_id, request.question, request.parse,
+                lambda question: answer_in_order(request, question)
+            )
+            record_outcome(request, 'cancelled' if answer is None else 'answered')
+            if answer is not None:
+                logger.info(f"✅ AI response ({request.source}) sent to {request.author} "
+                            f"in {request.channel.guild.name if request.guild_id else 'DM'} | " +
+                            " ".join(f"{stage} {request.timings[stage] * 1000:.0f}ms"
+                                     for stage in STAGES if stage in request.timings))
+            
+        except QueueFullError:
+            record_outcome(request, 'busy')
+            await request.reply(embed=create_busy_embed(request.author))
+        except DeadlineExceeded:
+            record_outcome(request, 'timeout')
+            logger.warning(f"⏱️ AI request ({request.source}) from {request.author} timed out")
+            await request.reply(embed=create_timeout_embed(request.author))
+        except Exception as e:
+            record_outcome(request, 'error')
+            logger.error(f"❌ Error in {request.source} request: {e}")
+            embed = create_embed(
+                "❌ Error",
+                f"Maaf, terjadi kesalahan:\n```{str(e)[:200]}```",
+                discord.Color.red(),
+                author=request.author
+            )
+            await request.reply(embed=embed)
+
+
 @bot.event
 async def on_ready():
     """Bot startup event"""
@@ -156,143 +752,97 @@ async def on_ready():
 @bot.event
 async def on_message(message):
     """Handle all incoming messages"""
+    # Fast path: almost every message is neither a command nor a mention
+    if not message_prefilter.relevant(message.content, message.mentions, bot.user.id):
+        return
+    
     # Ignore bot's own messages
     if message.author == bot.user:
         return
     
+    # Every request started by this message shares one deadline from here on
+    start_deadline()
+    
+    # Commands (including !ask) win over mentions: one message, one request
+    ctx = await bot.get_context(message)
+    if ctx.valid:
+        if not message.author.bot:
+            await bot.invoke(ctx)
+        return
+    
     # Handle mentions
     if bot.user.mentioned_in(message) and not message.mention_everyone:
-        # Remove the mention from content
-        question = message.content.replace(f'<@{bot.user.id}>', '').strip()
-        
-        if not question:
-            embed = create_embed(
-                "❓ Pertanyaan Kosong",
-                "Silakan mention saya dengan pertanyaan Anda!\nContoh: `@bot Apa itu Python?`",
-                discord.Color.orange(),
-                author=message.author
-            )
-            await message.reply(embed=embed)
-            return
-        
-        # Check rate limit
-        if not check_rate_limit(message.author.id):
-            embed = create_embed(
-                "⏳ Rate Limit",
-                f"Anda terlalu banyak request! Tunggu sebentar.\nMax {MAX_REQUESTS_PER_MINUTE} requests per menit.",
-                discord.Color.red(),
-                author=message.author
-            )
-            await message.reply(embed=embed)
-            return
-        
-        # Show typing indicator
-        async with message.channel.typing():
-            try:
-                # Get conversation history
-                add_to_history(message.channel.id, "user", question)
-                history = get_channel_history(message.channel.id)
-                
-                # Get AI response
-                ai_response = await get_ai_response(history)
-                add_to_history(message.channel.id, "assistant", ai_response)
-                
-                # Create response embed
-                embed = discord.Embed(
-                    title="💬 Balasan AI",
-                    color=discord.Color.blue(),
-                    timestamp=datetime.now()
-                )
-                embed.add_field(name="📝 Pertanyaan", value=question[:1024], inline=False)
-                embed.add_field(name="🤖 Jawaban", value=ai_response[:1024], inline=False)
-                embed.set_footer(
-                    text=f"Requested by {message.author.name} | Model: {current_model}",
-                    icon_url=message.author.avatar.url if message.author.avatar else None
-                )
-                
-                await message.reply(embed=embed)
-                logger.info(f"✅ Mention response sent to {message.author} in {message.guild.name}")
-                
-            except Exception as e:
-                logger.error(f"❌ Error in mention handler: {e}")
-                embed = create_embed(
-                    "❌ Error",
-                    f"Maaf, terjadi kesalahan:\n```{str(e)[:200]}```",
-                    discord.Color.red(),
-                    author=message.author
-                )
-                await message.reply(embed=embed)
-    
-    # Process commands
-    await bot.process_commands(message)
+        await run_ai_pipeline(AIRequest(
+            message.id, message.channel, message.author,
+            message.guild.id if message.guild else None,
+            message.content, 'mention', message.reply, parse_mention_question
+        ))
+
+
+@bot.event
+async def on_message_delete(message):
+    """Stop answering a question that was deleted"""
+    request_tracker.cancel(message.id)
+
+
+@bot.event
+async def on_raw_message_delete(payload):
+    """Same as on_message_delete, also for messages not in the cache"""
+    request_tracker.cancel(payload.message_id)
+
+
+@bot.event
+async def on_raw_bulk_message_delete(payload):
+    """Stop answering questions removed by a purge"""
+    for message_id in payload.message_ids:
+        request_tracker.cancel(message_id)
+
+
+@bot.event
+async def on_message_edit(before, after):
+    """Re-ask a question that was edited while being answered"""
+    request_tracker.edit(after.id, after.content)
 
 
-@bot.command(name='ask')
+@bot.event
+async def on_raw_message_edit(payload):
+    """Same as on_message_edit, also for messages not in the cache"""
+    request_tracker.edit(payload.message_id, payload.data.get('content'))
+
+
+@bot.hybrid_command(name='ask', description="Tanya apapun ke AI")
+@app_commands.describe(question="Pertanyaan")
 async def ask(ctx, *, question: str = None):
     """Ask AI a question: !ask [pertanyaan]"""
-    if not question:
-        embed = create_embed(
-            "❓ Format Salah",
-            "**Usage:** `!ask [pertanyaan]`\n**Contoh:** `!ask Apa itu Discord bot?`",
-            discord.Color.orange(),
-            author=ctx.author
-        )
-        await ctx.reply(embed=embed)
+    await ctx.defer()
+    guild_id = ctx.guild.id if ctx.guild else None
+    if ctx.interaction is not None:
+        # Slash command: the question is an option, there is no message text
+        await run_ai_pipeline(AIRequest(
+            ctx.interaction.id, ctx.channel, ctx.author, guild_id,
+            question or "", 'slash', ctx.reply,
+            lambda content: content.strip() or None
+        ))
         return
-    
-    # Check rate limit
-    if not check_rate_limit(ctx.author.id):
-        embed = create_embed(
-            "⏳ Rate Limit",
-            f"Anda terlalu banyak request! Tunggu sebentar.\nMax {MAX_REQUESTS_PER_MINUTE} requests per menit.",
-            discord.Color.red(),
-            author=ctx.author
-        )
-        await ctx.reply(embed=embed)
-        return
-    
-    async with ctx.typing():
-        try:
-            # Get conversation history
-            add_to_history(ctx.channel.id, "user", question)
-            history = get_channel_history(ctx.channel.id)
-            
-            # Get AI response
-            ai_response = await get_ai_response(history)
-            add_to_history(ctx.channel.id, "assistant", ai_response)
-            
-            # Create response embed
-            embed = discord.Embed(
-                title="💬 Balasan AI",
-                color=discord.Color.blue(),
-                timestamp=datetime.now()
-            )
-            embed.add_field(name="📝 Pertanyaan", value=question[:1024], inline=False)
-            embed.add_field(name="🤖 Jawaban", value=ai_response[:1024], inline=False)
-            embed.set_footer(
-                text=f"Requested by {ctx.author.name} | Model: {current_model}",
-                icon_url=ctx.author.avatar.url if ctx.author.avatar else None
-            )
-            
-            await ctx.reply(embed=embed)
-            logger.info(f"✅ Ask command used by {ctx.author} in {ctx.guild.name}")
-            
-        except Exception as e:
-            logger.error(f"❌ Error in ask command: {e}")
-            embed = create_embed(
-                "❌ Error",
-                f"Maaf, terjadi kesalahan:\n```{str(e)[:200]}```",
-                discord.Color.red(),
-                author=ctx.author
-            )
-            await ctx.reply(embed=embed)
+    invoked = f"{ctx.prefix}{ctx.invoked_with}"
+    await run_ai_pipeline(AIRequest(
+        ctx.message.id, ctx.channel, ctx.author, guild_id,
+        ctx.message.content, 'ask', ctx.reply,
+        lambda content: parse_command_question(content, invoked)
+    ))
 
 
-@bot.command(name='ping')
+@bot.hybrid_command(name='ping', description="Cek latency bot")
 async def ping(ctx):
     """Check bot latency: !ping"""
+    await ctx.defer()
     latency = round(bot.latency * 1000)
-    
+    await ctx.reply(embed=create_ping_embed(latency, ctx.author))
+    logger.info(f"📊 Ping: {latency}ms")
+
+
+def create_ping_embed(latency: int, author) -> discord.Embed:
+    """Create the latency embed of !ping"""
     # Color based on latency
     if latency < 100:
         color = discord.Color.green()
@@ -304,21 +854,22 @@ async def ping(ctx):
         color = discord.Color.red()
         status = "Lambat"
     
-    embed = create_embed(
+    return create_embed(
         "🏓 Pong!",
         f"**Latency:** {latency}ms\n**Status:** {status}",
         color,
-        author=ctx.author
+        author=author
     )
-    
-    await ctx.reply(embed=embed)
-    logger.info(f"📊 Ping: {latency}ms")
 
 
-@bot.command(name='clear')
+@bot.hybrid_command(name='clear', description="Hapus pesan di channel ini (max 20)")
 @commands.has_permissions(manage_messages=True)
+@app_commands.default_permissions(manage_messages=True)
+@app_commands.describe(amount="Jumlah pesan (1-20)")
 async def clear(ctx, amount: int = 5):
     """Clear messages: !clear [jumlah] (max: 20)"""
+    # Ephemeral: a visible "thinking" response would be a channel message the purge can delete
+    await ctx.defer(ephemeral=True)
     if amount < 1 or amount > 20:
         embed = create_embed(
             "⚠️ Invalid Amount",
@@ -329,11 +880,13 @@ async def clear(ctx, amount: int = 5):
         await ctx.reply(embed=embed)
         return
     
-    deleted = await ctx.channel.purge(limit=amount + 1)
+    # A prefix command also removes its own message
+    extra = 0 if ctx.interaction is not None else 1
+    deleted = await ctx.channel.purge(limit=amount + extra)
     
     embed = create_embed(
         "🗑️ Messages Cleared",
-        f"Berhasil menghapus {len(deleted) - 1} pesan",
+        f"Berhasil menghapus {len(deleted) - extra} pesan",
         discord.Color.green(),
         author=ctx.author
     )
@@ -342,12 +895,14 @@ async def clear(ctx, amount: int = 5):
     await asyncio.sleep(5)
     await msg.delete()
     
-    logger.info(f"🗑️ {len(deleted) - 1} messages cleared by {ctx.author} in {ctx.guild.name}")
+    logger.info(f"🗑️ {len(deleted) - extra} messages cleared by {ctx.author} in {ctx.guild.name}")
 
 
-@bot.command(name='help')
+@bot.hybrid_command(name='help', description="Menu bantuan")
 async def help_command(ctx):
     """Show help menu: !help"""
+    await ctx.defer()
+    await refresh_overrides(ctx.guild.id if ctx.guild else None, ctx.channel.id)
     embed = discord.Embed(
         title="📚 Discord AI Chatbot - Help Menu",
         description="Bot AI dengan Groq API Integration",
@@ -360,7 +915,7 @@ async def help_command(ctx):
         value=(
             "`!ask [pertanyaan]` - Tanya apapun ke AI\n"
             "`@mention [pertanyaan]` - Chat via mention\n"
-            "`!model [nama]` - Ganti AI model"
+            "`!model [nama|auto]` - Ganti AI model (per server/channel)"
         ),
         inline=False
     )
@@ -370,7 +925,8 @@ async def help_command(ctx):
         value=(
             "`!ping` - Cek bot latency\n"
             "`!status` - System status\n"
-            "`!help` - Menu ini"
+            "`!help` - Menu ini\n"
+            "Semua command juga bisa dipakai sebagai slash command: `/ask`, `/model`, ..."
         ),
         inline=False
     )
@@ -379,7 +935,8 @@ async def help_command(ctx):
         name="🛡️ Admin Commands",
         value=(
             "`!clear [jumlah]` - Hapus pesan (max 20)\n"
-            "`!reset` - Reset conversation history"
+            "`!reset` - Reset conversation history\n"
+            "`!loop [nomor]` - Lag event loop dan kode yang memblokirnya"
         ),
         inline=False
     )
@@ -387,7 +944,7 @@ async def help_command(ctx):
     embed.add_field(
         name="📊 Info",
         value=(
-            f"**Model:** {current_model}\n"
+            f"**Model:** {model_router.preference(ctx.guild.id if ctx.guild else None, ctx.channel.id) or 'auto'}\n"
             f"**Prefix:** !\n"
             f"**Servers:** {len(bot.guilds)}\n"
             f"**Latency:** {round(bot.latency * 1000)}ms"
@@ -403,9 +960,10 @@ async def help_command(ctx):
     await ctx.reply(embed=embed)
 
 
-@bot.command(name='status')
+@bot.hybrid_command(name='status', description="Status bot, model dan antrian AI")
 async def status(ctx):
     """Check bot status: !status"""
+    await ctx.defer()
     embed = discord.Embed(
         title="📊 Bot Status",
         color=discord.Color.blue(),
@@ -417,7 +975,8 @@ async def status(ctx):
         value=(
             f"**Name:** {bot.user.name}\n"
             f"**ID:** {bot.user.id}\n"
-            f"**Latency:** {round(bot.latency * 1000)}ms"
+            f"**Latency:** {round(bot.latency * 1000)}ms\n"
+            f"**Shards:** {len(bot.shards)}/{bot.shard_count} (cluster {config.CLUSTER_ID})"
         ),
         inline=False
     )
@@ -432,16 +991,142 @@ async def status(ctx):
         inline=False
     )
     
+    guild_id = ctx.guild.id if ctx.guild else None
+    await refresh_overrides(guild_id, ctx.channel.id)
+    pinned = model_router.preference(guild_id, ctx.channel.id)
     embed.add_field(
         name="🧠 AI Model",
         value=(
-            f"**Current:** {current_model}\n"
+            f"**Mode:** {f'pinned ({pinned})' if pinned else 'auto'}\n"
+            f"**Next Request:** {model_router.candidates(guild_id, ctx.channel.id)[0]}\n"
             f"**Provider:** Groq\n"
-            f"**Status:** ✅ Online"
+            f"**Upstream Calls:** {inflight_requests.calls} "
+            f"({inflight_requests.collapsed} coalesced, {upstream_scheduler.retries} retried, "
+            f"{model_router.failovers} failed over)"
+        ),
+        inline=False
+    )
+    
+    if hedger.enabled:
+        hedge_stats = hedger.stats()
+        embed.add_field(
+            name="🪁 Hedging",
+            value=(
+                f"**Hedged:** {hedge_stats['hedged']} ({hedge_stats['hedge_rate'] * 100:.1f}% of requests)\n"
+                f"**Backup Won:** {hedge_stats['hedge_wins']}, {hedge_stats['cancelled']} calls cancelled\n"
+                f"**Extra Quota:** {hedge_stats['hedged']} req, ~{hedge_stats['extra_tokens']} tokens"
+            ),
+            inline=False
+        )
+    
+    model_lines = []
+    for model, stats in model_router.snapshot().items():
+        quota = upstream_scheduler.quota(model)
+        latency = f"{stats['latency'] * 1000:.0f}ms" if stats['latency'] is not None else "-"
+        model_lines.append(
+            f"{'✅' if stats['healthy'] else '⛔'} `{model}`: {latency}, "
+            f"{stats['error_rate'] * 100:.0f}% error, "
+            f"quota {quota.remaining_requests if quota.remaining_requests is not None else '?'} req"
+        )
+    embed.add_field(name="🩺 Model Health", value="\n".join(model_lines)[:1024], inline=False)
+    
+    queue_stats = upstream_scheduler.stats()
+    embed.add_field(
+        name="📥 AI Queue",
+        value=(
+            f"**Depth:** {queue_stats['queued']}/{queue_stats['max_queue']} "
+            f"({queue_stats['guilds_waiting']} servers waiting)\n"
+            f"**In Flight:** {queue_stats['in_flight']}/{upstream_scheduler.max_concurrency}\n"
+            f"**Wait:** avg {queue_stats['wait_avg'] * 1000:.0f}ms, p95 {queue_stats['wait_p95'] * 1000:.0f}ms\n"
+            f"**Rejected (busy):** {queue_stats['rejected']}\n"
+            f"**Question Deleted/Edited:** {request_tracker.cancelled} cancelled, "
+            f"{request_tracker.restarted} re-asked"
         ),
         inline=False
     )
     
+    state_stats = await shared_state.stats()
+    rate_stats = state_stats['rate_limit']
+    backend = state_stats['backend']
+    if state_stats.get('fallbacks'):
+        backend += f" ({state_stats['fallbacks']} local fallbacks)"
+    admissions = f"{rate_stats['allowed']} allowed, {sum(rate_stats['rejected'].values())} rejected"
+    if 'processes' in rate_stats:
+        admissions += f" ({rate_stats['processes']} processes on this host)"
+    embed.add_field(
+        name="🗄️ Shared State",
+        value=(
+            f"**Backend:** {backend}\n"
+            f"**Rate Limit:** {admissions}\n"
+            f"**Pinned Models:** {state_stats['overrides']}"
+        ),
+        inline=False
+    )
+    
+    mailbox_stats = channel_actors.stats()
+    embed.add_field(
+        name="📬 Channel Mailboxes",
+        value=(
+            f"**This Channel:** {channel_actors.depth(ctx.channel.id)} "
+            f"(max {channel_actors.max_depth})\n"
+            f"**Active Channels:** {mailbox_stats['channels']}, {mailbox_stats['queued']} waiting\n"
+            f"**Deepest:** " +
+            (", ".join(f"<#{channel_id}> {depth}" for channel_id, depth in mailbox_stats['deepest']) or "-") +
+            f"\n**Peak Depth:** {mailbox_stats['max_seen_depth']}, {mailbox_stats['rejected']} rejected"
+        ),
+        inline=False
+    )
+    
+    if config.BATCH_QUESTIONS:
+        batching = batch_stats.stats()
+        embed.add_field(
+            name="📦 Batching",
+            value=(
+                f"**Batches:** {batching['batches']} ({batching['questions']} questions, "
+                f"avg {batching['avg_size']:.1f}, max {max(batching['sizes'], default=0)})\n"
+                f"**Saved:** {batching['calls_saved']} calls, ~{batching['tokens_saved']} prompt tokens\n"
+                f"**Asked Separately:** {batching['fallbacks']}"
+            ),
+            inline=False
+        )
+    
+    stage_averages = stage_stats.averages()
+    if stage_averages:
+        embed.add_field(
+            name="⏱️ Pipeline",
+            value=(
+                " → ".join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in stage_averages.items()) +
+                f"\n**Requests:** {ai_pipeline.requests} ({ai_pipeline.duplicates} duplicate events dropped)"
+            ),
+            inline=False
+        )
+    
+    memory_stats = conversation_history.stats()
+    embed.add_field(
+        name="💾 Memory",
+        value=(
+            f"**Channels:** {memory_stats['channels']}/{conversation_history.max_channels}\n"
+            f"**Messages:** {memory_stats['messages']} (~{memory_stats['tokens']} tokens)\n"
+            f"**Size:** {memory_stats['bytes'] / 1024:.1f} KB\n"
+            f"**Evictions:** {memory_stats['evictions']} LRU, {memory_stats['expirations']} TTL"
+        ),
+        inline=False
+    )
+    
+    if response_cache is not None:
+        cache_stats = response_cache.stats()
+        embed.add_field(
+            name="⚡ Response Cache",
+            value=(
+                f"**Hit Rate:** {cache_stats['hit_rate'] * 100:.1f}% "
+                f"({cache_stats['hits']} hit / {cache_stats['misses']} miss)\n"
+                f"**Tiers:** {cache_stats['hits_memory']} memory, {cache_stats['hits_disk']} disk, "
+                f"{cache_stats['hits_semantic']} semantic\n"
+                f"**Saved:** {cache_stats['saved_seconds']:.1f}s API time, ~{cache_stats['saved_tokens']} tokens"
+            ),
+            inline=False
+        )
+    
     embed.set_footer(
         text=f"Requested by {ctx.author.name}",
         icon_url=ctx.author.avatar.url if ctx.author.avatar else None
@@ -450,12 +1135,63 @@ async def status(ctx):
     await ctx.reply(embed=embed)
 
 
-@bot.command(name='reset')
+@bot.hybrid_command(name='loop', description="Lag event loop dan kode yang memblokirnya (admin)")
+@commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(number="Nomor stall untuk melihat stack lengkapnya")
+async def loop_status(ctx, number: int = 0):
+    """Event loop lag and blocking calls: !loop [nomor]"""
+    await ctx.defer()
+    stalls = list(loop_monitor.stalls)
+    if number:
+        if not 1 <= number <= len(stalls):
+            await ctx.reply(embed=create_embed(
+                "⚠️ Invalid Number",
+                f"Pilih stall 1-{len(stalls)}" if stalls else "Belum ada stall yang tercatat",
+                discord.Color.orange(),
+                author=ctx.author
+            ))
+            return
+        stall = stalls[number - 1]
+        # Innermost frames are the interesting ones: cut from the top to fit the embed
+        stack = ''.join(stall['stack']).replace('```', '`\u200b``')[-3900:]
+        await ctx.reply(embed=create_embed(
+            f"🐢 Stall #{number}: {stall['blocked'] * 1000:.0f}ms",
+            f"<t:{int(stall['at'])}:R> di `{stall['where']}`\n```py\n{stack}```",
+            discord.Color.orange(),
+            author=ctx.author
+        ))
+        return
+    
+    lag = loop_monitor.stats()
+    description = (
+        f"**Lag:** {lag['lag'] * 1000:.1f}ms (max {lag['max_lag'] * 1000:.1f}ms)\n"
+        f"**Stalls:** {lag['stalls']} di atas {loop_monitor.threshold * 1000:.0f}ms "
+        f"dari {lag['samples']} sampel"
+    )
+    if stalls:
+        lines = [f"`{index}` <t:{int(stall['at'])}:R> {stall['blocked'] * 1000:.0f}ms `{stall['where']}`"
+                 for index, stall in enumerate(stalls[:10], 1)]
+        description += "\n\n" + "\n".join(lines) + "\n\n`!loop [nomor]` untuk stack lengkap"
+    elif not loop_monitor.threshold:
+        description += "\n\nWatchdog mati (LOOP_STALL_THRESHOLD=0)"
+    await ctx.reply(embed=create_embed(
+        "🐢 Event Loop",
+        description,
+        discord.Color.red() if stalls else discord.Color.green(),
+        author=ctx.author
+    ))
+
+
+@bot.hybrid_command(name='reset', description="Reset conversation history channel ini")
 @commands.has_permissions(manage_messages=True)
+@app_commands.default_permissions(manage_messages=True)
 async def reset(ctx):
     """Reset conversation history: !reset"""
-    if ctx.channel.id in conversation_history:
-        del conversation_history[ctx.channel.id]
+    await ctx.defer()
+    # After the questions already waiting, so none of them writes into the new history
+    async with channel_actors.turn(ctx.channel.id):
+        conversation_history.reset(ctx.channel.id)
     
     embed = create_embed(
         "🔄 History Reset",
@@ -465,13 +1201,24 @@ async def reset(ctx):
     )
     
     await ctx.reply(embed=embed)
-    logger.info(f"🔄 History reset by {ctx.author} in {ctx.guild.name}")
+    logger.info(f"🔄 History reset by {ctx.author} in {ctx.guild.name if ctx.guild else 'DM'}")
 
 
-@bot.command(name='model')
-async def change_model(ctx, model_name: str = None):
-    """Change AI model: !model [llama|compound|gemma|mixtral]"""
-    global current_model
+@bot.hybrid_command(name='model', description="Ganti model AI untuk server atau channel ini")
+@app_commands.rename(model_name='name')
+@app_commands.describe(model_name="Nama model, atau auto", scope="server atau channel")
+@app_commands.choices(
+    model_name=[app_commands.Choice(name=name, value=name) for name in [*MODELS, 'auto']],
+    scope=[app_commands.Choice(name=scope, value=scope) for scope in ('server', 'channel')]
+)
+async def change_model(ctx, model_name: str = None, scope: str = 'server'):
+    """Change AI model: !model [nama|auto] [server|channel]"""
+    await ctx.defer()
+    guild_id = ctx.guild.id if ctx.guild else None
+    # DMs have no server, so the override always applies to the channel
+    channel_id = ctx.channel.id if scope.lower() == 'channel' or guild_id is None else None
+    await refresh_overrides(guild_id, ctx.channel.id)
+    pinned = model_router.preference(guild_id, ctx.channel.id)
     
     if not model_name:
         embed = discord.Embed(
@@ -487,37 +1234,57 @@ async def change_model(ctx, model_name: str = None):
                 inline=False
             )
         
+        embed.add_field(
+            name="**auto**",
+            value=f"Model tercepat yang sehat dari: `{', '.join(model_router.tier)}`",
+            inline=False
+        )
+        
         embed.add_field(
             name="📝 Usage",
-            value="`!model [nama]`\nContoh: `!model llama`",
+            value="`!model [nama] [server|channel]`\nContoh: `!model openai`, `!model groq channel`, `!model auto`",
             inline=False
         )
         
-        embed.set_footer(text=f"Current: {current_model}")
+        embed.set_footer(text=f"Current: {pinned or 'auto'}")
         await ctx.reply(embed=embed)
         return
     
     model_name = model_name.lower()
-    if model_name not in MODELS:
+    if model_name != 'auto' and model_name not in MODELS:
         embed = create_embed(
             "❌ Invalid Model",
-            f"Model tidak ditemukan. Gunakan: {', '.join(MODELS.keys())}",
+            f"Model tidak ditemukan. Gunakan: {', '.join(MODELS.keys())}, auto",
             discord.Color.red(),
             author=ctx.author
         )
         await ctx.reply(embed=embed)
         return
     
-    current_model = MODELS[model_name]
+    model = None if model_name == 'auto' else MODELS[model_name]
+    await shared_state.set_override(model, guild_id, channel_id)
+    model_router.set_override(model, guild_id, channel_id)
+    target = "channel ini" if channel_id is not None else "server ini"
     embed = create_embed(
         "✅ Model Changed",
-        f"Model berhasil diganti ke: **{current_model}**",
+        f"Model untuk {target} berhasil diganti ke: **{model or 'auto'}**",
         discord.Color.green(),
         author=ctx.author
     )
     
     await ctx.reply(embed=embed)
-    logger.info(f"🔄 Model changed to {current_model} by {ctx.author}")
+    logger.info(f"🔄 Model for {'channel' if channel_id is not None else 'guild'} "
+                f"{channel_id if channel_id is not None else guild_id} changed to {model or 'auto'} by {ctx.author}")
+
+
+def create_missing_permissions_embed(author) -> discord.Embed:
+    """Create the embed shown when a command needs permissions the user lacks"""
+    return create_embed(
+        "🔒 Missing Permissions",
+        "Anda tidak memiliki permission untuk command ini.",
+        discord.Color.red(),
+        author=author
+    )
 
 
 @bot.event
@@ -527,13 +1294,7 @@ async def on_command_error(ctx, error):
         return
     
     if isinstance(error, commands.MissingPermissions):
-        embed = create_embed(
-            "🔒 Missing Permissions",
-            "Anda tidak memiliki permission untuk command ini.",
-            discord.Color.red(),
-            author=ctx.author
-        )
-        await ctx.reply(embed=embed)
+        await ctx.reply(embed=create_missing_permissions_embed(ctx.author))
     
     elif isinstance(error, commands.MissingRequiredArgument):
         embed = create_embed(
@@ -555,12 +1316,122 @@ async def on_command_error(ctx, error):
         await ctx.reply(embed=embed)
 
 
+def slash_command_payloads(names) -> list:
+    """Slash command definitions of the hybrid commands, for registering over HTTP"""
+    return [bot.tree.get_command(name).to_dict(bot.tree) for name in names]
+
+
+def create_interaction_server() -> InteractionServer:
+    """Serve the bot's commands as slash commands over HTTP"""
+    server = InteractionServer(SignatureVerifier(config.DISCORD_PUBLIC_KEY), config.DISCORD_APPLICATION_ID)
+    
+    @server.command('ask')
+    async def ask_interaction(ctx, question: str = None):
+        await run_ai_pipeline(AIRequest(
+            ctx.id, ctx.channel, ctx.author, ctx.guild_id,
+            question or "", 'slash', ctx.reply,
+            lambda content: content.strip() or None
+        ))
+    
+    @server.command('model')
+    async def model_interaction(ctx, name: str = None, scope: str = 'server'):
+        await change_model.callback(ctx, name, scope)
+    
+    @server.command('reset')
+    async def reset_interaction(ctx):
+        # Like the gateway command (has_permissions): server channels only
+        if ctx.guild is None:
+            await ctx.reply(embed=create_embed(
+                "⚠️ Server Only",
+                "Command ini hanya bisa dipakai di server.",
+                discord.Color.orange(),
+                author=ctx.author
+            ))
+            return
+        permissions = ctx.author.guild_permissions
+        if not permissions.manage_messages:
+            await ctx.reply(embed=create_missing_permissions_embed(ctx.author))
+            return
+        await reset.callback(ctx)
+    
+    @server.command('ping')
+    async def ping_interaction(ctx):
+        # No gateway heartbeat here: time from the interaction's creation until it reached us
+        delay = discord.utils.utcnow() - discord.utils.snowflake_time(ctx.id)
+        await ctx.reply(embed=create_ping_embed(round(delay.total_seconds() * 1000), ctx.author))
+    
+    return server
+
+
+async def start_resources() -> MetricsServer:
+    """Start background work; returns the metrics server if METRICS_PORT is set"""
+    history_backend.start()
+    shared_state.start()
+    loop_monitor.start()
+    tracer.start()
+    if not config.METRICS_PORT:
+        return None
+    metrics_server = MetricsServer(metrics)
+    await metrics_server.start()
+    return metrics_server
+
+
+async def close_resources(metrics_server: MetricsServer = None):
+    """Release storage, background tasks and the shared HTTP pool"""
+    if metrics_server is not None:
+        await metrics_server.close()
+    await loop_monitor.close()
+    await tracer.close()
+    await shared_state.close()
+    await history_backend.close()
+    if response_cache is not None:
+        response_cache.close()
+    await close_clients()
+
+
+async def main(token: str):
+    """Run the bot and release the shared HTTP pool on shutdown"""
+    metrics_server = await start_resources()
+    async with bot:
+        try:
+            await bot.login(token)
+            if config.SYNC_SLASH_COMMANDS:
+                synced = await bot.tree.sync()
+                logger.info(f"📝 Synced {len(synced)} slash commands")
+            await bot.connect()
+        finally:
+            await close_resources(metrics_server)
+
+
+async def serve_interactions(token: str = None):
+    """Run as a stateless HTTP interactions endpoint instead of a gateway session"""
+    server = create_interaction_server()
+    metrics.counter('interactions_total', "Slash command interactions by result", ('result',),
+                    collect=lambda: {(result,): server.stats()[result]
+                                     for result in ('received', 'rejected', 'failed', 'rate_limited')})
+    metrics_server = await start_resources()
+    try:
+        await server.start()
+        if config.REGISTER_COMMANDS and token:
+            await server.register(slash_command_payloads(server.commands), token)
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+        await close_resources(metrics_server)
+
+
 # Run bot
 if __name__ == "__main__":
     token = os.getenv("DISCORD_TOKEN")
-    api = os.getenv("GROQ_API_KEY")
+    api = config.GROQ_API_KEY
+    
+    interactions_mode = config.RUN_MODE == 'interactions'
     
-    if not token:
+    if interactions_mode:
+        if not config.DISCORD_PUBLIC_KEY or not config.DISCORD_APPLICATION_ID:
+            logger.error("❌ DISCORD_PUBLIC_KEY and DISCORD_APPLICATION_ID are required for RUN_MODE=interactions!")
+            exit(1)
+    elif not token:
         logger.error("❌ DISCORD_TOKEN not found in .env file!")
         exit(1)
     
@@ -569,6 +1440,8 @@ if __name__ == "__main__":
         exit(1)
     
     try:
-        bot.run(token)
+        asyncio.run(serve_interactions(token) if interactions_mode else main(token))
+    except KeyboardInterrupt:
+        pass
     except Exception as e:
         logger.error(f"❌ Failed to start bot: {e}")
\ No newline at end of file
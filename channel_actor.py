@@ -0,0 +1,141 @@
+"""
+Channel actors - pertanyaan di satu channel diproses berurutan, antar channel paralel
+"""
+
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+
+import config
+from scheduler import QueueFullError
+
+logger = logging.getLogger('DiscordAI')
+
+
+class _Mailbox:
+    """Pending turns of one channel; exists only while the channel has work"""
+
+    __slots__ = ('waiting', 'busy')
+
+    def __init__(self):
+        self.waiting = deque()  # (future, item), in arrival order
+        self.busy = False
+
+
+class ChannelActors:
+    """One request at a time per channel, in arrival order; channels run in parallel"""
+
+    def __init__(self, max_depth: int = None):
+        self.max_depth = max_depth or config.MAILBOX_MAX_DEPTH
+        self._boxes = {}  # channel_id -> _Mailbox
+        self.processed = 0
+        self.rejected = 0
+        self.max_seen_depth = 0
+
+    def depth(self, channel_id: int) -> int:
+        """Requests running or waiting in a channel"""
+        box = self._boxes.get(channel_id)
+        if box is None:
+            return 0
+        return len(box.waiting) + box.busy
+
+    async def acquire(self, channel_id: int, deadline=None, item=None):
+        """
+        Wait for this channel's earlier requests, then hold the channel.
+
+        Returns None once it is our turn, or the handoff given to take_waiting()
+        when the holder took over this request (`item`) instead.
+        """
+        box = self._boxes.get(channel_id)
+        if box is None:
+            box = self._boxes[channel_id] = _Mailbox()
+        if not box.busy:
+            box.busy = True
+            return None
+
+        if len(box.waiting) + 1 >= self.max_depth:
+            self.rejected += 1
+            logger.warning(f"📪 Mailbox of channel {channel_id} full ({self.max_depth}), request rejected")
+            raise QueueFullError(f"channel {channel_id} mailbox is full")
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, item)
+        box.waiting.append(entry)
+        self.max_seen_depth = max(self.max_seen_depth, len(box.waiting) + 1)
+        try:
+            return await (future if deadline is None else deadline.run(future))
+        except BaseException:
+            if future.done() and not future.cancelled():
+                handoff = future.result()
+                # Handed the turn (or taken over) just as we gave up
+                if handoff is None:
+                    self.release(channel_id)
+                else:
+                    handoff.abandon(item)
+            else:
+                future.cancel()
+                try:
+                    box.waiting.remove(entry)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self, channel_id: int):
+        """Hand the channel to its next waiting request"""
+        box = self._boxes.get(channel_id)
+        if box is None:
+            return
+        self.processed += 1
+        while box.waiting:
+            future, _ = box.waiting.popleft()
+            if not future.done():
+                future.set_result(None)  # busy stays set: the turn moves on
+                return
+        box.busy = False
+        del self._boxes[channel_id]
+
+    def take_waiting(self, channel_id: int, limit: int, handoff) -> list:
+        """
+        Take over up to `limit` waiting requests, in order, while holding the channel.
+
+        Their acquire() returns `handoff`, which must provide abandon(item) for
+        requests that give up at that very moment. Waiters without an item are
+        left in place.
+        """
+        box = self._boxes.get(channel_id)
+        if box is None or limit <= 0:
+            return []
+        taken = []
+        kept = deque()
+        while box.waiting:
+            future, item = box.waiting.popleft()
+            if future.done():
+                continue
+            if item is None or len(taken) >= limit:
+                kept.append((future, item))
+                continue
+            future.set_result(handoff)
+            taken.append(item)
+        box.waiting = kept
+        return taken
+
+    @asynccontextmanager
+    async def turn(self, channel_id: int, deadline=None):
+        """Hold the channel for the duration of the block"""
+        await self.acquire(channel_id, deadline)
+        try:
+            yield
+        finally:
+            self.release(channel_id)
+
+    def stats(self, top: int = 5) -> dict:
+        """Active channels, queued requests and the deepest mailboxes"""
+        depths = {channel_id: len(box.waiting) + box.busy for channel_id, box in self._boxes.items()}
+        return {
+            'channels': len(depths),
+            'queued': sum(len(box.waiting) for box in self._boxes.values()),
+            'deepest': sorted(depths.items(), key=lambda item: item[1], reverse=True)[:top],
+            'max_seen_depth': self.max_seen_depth,
+            'processed': self.processed,
+            'rejected': self.rejected,
+        }
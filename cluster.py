@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Cluster launcher - bagi shard Discord ke beberapa proses worker bot.py,
+dengan satu state server bersama (rate limit, pilihan model)
+
+Usage:
+    python cluster.py
+    python cluster.py --workers 4 --shards 16
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import os
+import signal
+import sys
+import time
+
+import aiohttp
+
+import config
+from shared_state import LocalState, StateServer
+
+logger = logging.getLogger('DiscordAI')
+
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')
+IDENTIFY_INTERVAL = 5.0  # Discord allows max_concurrency identifies per 5 seconds
+STABLE_AFTER = 60.0      # a worker running this long resets its crash backoff
+
+
+def parse_shard_ids(value: str) -> list:
+    """Parse "0-3,6" into [0, 1, 2, 3, 6]; empty means every shard (None)"""
+    shard_ids = []
+    for part in value.replace(' ', '').split(','):
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            shard_ids.extend(range(int(first), int(last) + 1))
+        else:
+            shard_ids.append(int(part))
+    return sorted(set(shard_ids)) or None
+
+
+def split_shards(shard_count: int, workers: int) -> list:
+    """Contiguous, evenly sized shard ranges, one per worker"""
+    workers = max(1, min(workers, shard_count))
+    size, extra = divmod(shard_count, workers)
+    ranges = []
+    start = 0
+    for index in range(workers):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+async def gateway_info(token: str) -> dict:
+    """Recommended shard count and identify concurrency from /gateway/bot"""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{config.DISCORD_API_BASE}/gateway/bot",
+                               headers={'Authorization': f"Bot {token}"}) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return {
+        'shards': data['shards'],
+        'max_concurrency': data.get('session_start_limit', {}).get('max_concurrency', 1),
+    }
+
+
+class Worker:
+    """One bot.py process running a range of shards, restarted when it dies"""
+
+    def __init__(self, cluster_id: int, shard_ids: list, shard_count: int):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.process = None
+        self.restarts = 0
+
+    def environment(self) -> dict:
+        env = dict(os.environ)
+        env.update({
+            'SHARD_COUNT': str(self.shard_count),
+            'SHARD_IDS': ','.join(map(str, self.shard_ids)),
+            'CLUSTER_ID': str(self.cluster_id),
+            'STATE_BACKEND': 'unix',
+            'STATE_SOCKET': config.STATE_SOCKET,
+            'RUN_MODE': 'gateway',
+        })
+        if config.METRICS_PORT:
+            # One metrics endpoint per worker: METRICS_PORT, METRICS_PORT + 1, ...
+            env['METRICS_PORT'] = str(config.METRICS_PORT + self.cluster_id)
+        if config.LOG_FILE:
+            # One log file per worker: rotation is not safe with several writers
+            base, ext = os.path.splitext(config.LOG_FILE)
+            env['LOG_FILE'] = f"{base}-{self.cluster_id}{ext}"
+        return env
+
+    async def run(self, stopping: asyncio.Event, delay: float):
+        """Keep the worker running until the cluster stops"""
+        try:
+            await asyncio.wait_for(stopping.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        backoff = config.CLUSTER_RESTART_DELAY
+        while not stopping.is_set():
+            started = time.monotonic()
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, BOT_SCRIPT, env=self.environment()
+            )
+            logger.info(f"🚀 Worker {self.cluster_id} (pid {self.process.pid}) "
+                        f"started with shards {self.shard_ids[0]}-{self.shard_ids[-1]}")
+            code = await self.process.wait()
+            if stopping.is_set():
+                break
+            if time.monotonic() - started > STABLE_AFTER:
+                backoff = config.CLUSTER_RESTART_DELAY
+            self.restarts += 1
+            logger.warning(f"⚠️ Worker {self.cluster_id} exited with code {code}, "
+                           f"restarting in {backoff:.0f}s")
+            try:
+                await asyncio.wait_for(stopping.wait(), backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, 300.0)
+
+    def stop(self):
+        if self.process is not None and self.process.returncode is None:
+            # bot.py shuts down cleanly on KeyboardInterrupt
+            self.process.send_signal(signal.SIGINT)
+
+
+async def main_async(args):
+    token = os.getenv("DISCORD_TOKEN")
+    if not token:
+        logger.error("❌ DISCORD_TOKEN not found in .env file!")
+        return 1
+
+    shard_count = args.shards or config.SHARD_COUNT
+    max_concurrency = 1
+    try:
+        info = await gateway_info(token)
+        shard_count = shard_count or info['shards']
+        max_concurrency = info['max_concurrency']
+    except aiohttp.ClientError as e:
+        if not shard_count:
+            logger.error(f"❌ Could not get the recommended shard count: {e}")
+            return 1
+        logger.warning(f"⚠️ /gateway/bot unavailable ({e}), identifying one shard at a time")
+
+    server = StateServer(LocalState())
+    await server.start()
+
+    workers = [Worker(index, shard_ids, shard_count)
+               for index, shard_ids in enumerate(split_shards(shard_count, args.workers))]
+    logger.info(f"🧩 {shard_count} shards over {len(workers)} workers")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    # Stagger the workers so their identifies stay within Discord's start limit
+    delays = []
+    delay = 0.0
+    for worker in workers:
+        delays.append(delay)
+        delay += math.ceil(len(worker.shard_ids) / max_concurrency) * IDENTIFY_INTERVAL
+
+    runs = [asyncio.ensure_future(worker.run(stopping, delay)) for worker, delay in zip(workers, delays)]
+    try:
+        await stopping.wait()
+        logger.info("🛑 Stopping cluster")
+        for worker in workers:
+            worker.stop()
+        await asyncio.wait(runs, timeout=30)
+    finally:
+        for worker in workers:
+            if worker.process is not None and worker.process.returncode is None:
+                worker.process.kill()
+        await server.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=config.CLUSTER_WORKERS, help="worker processes")
+    parser.add_argument('--shards', type=int, default=0, help="total shards (0 = SHARD_COUNT or Discord's recommendation)")
+    args = parser.parse_args()
+    # Here and not at import: bot.py imports parse_shard_ids and sets up its own logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
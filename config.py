@@ -0,0 +1,172 @@
+"""
+Runtime configuration - semua nilai bisa di-override lewat .env
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Load environment variables before anything reads them
+load_dotenv()
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer environment variable"""
+    return int(os.getenv(name, default))
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float environment variable"""
+    return float(os.getenv(name, default))
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """Read a boolean environment variable (1/true/yes/on)"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# LLM backend
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").lower()  # openai | groq
+
+# Shared HTTP connection pool
+HTTP_MAX_CONNECTIONS = env_int("HTTP_MAX_CONNECTIONS", 16)
+HTTP_MAX_KEEPALIVE = env_int("HTTP_MAX_KEEPALIVE", 16)
+HTTP_KEEPALIVE_EXPIRY = env_float("HTTP_KEEPALIVE_EXPIRY", 30.0)
+HTTP_HTTP2 = env_bool("HTTP_HTTP2", True)
+HTTP_CONNECT_TIMEOUT = env_float("HTTP_CONNECT_TIMEOUT", 5.0)
+HTTP_TIMEOUT = env_float("HTTP_TIMEOUT", 30.0)  # per operasi HTTP, dibatasi lagi oleh REQUEST_DEADLINE
+
+# Streaming replies
+STREAM_RESPONSES = env_bool("STREAM_RESPONSES", True)
+STREAM_EDIT_INTERVAL = env_float("STREAM_EDIT_INTERVAL", 1.2)  # detik antar edit per channel
+STREAM_MIN_CHARS = env_int("STREAM_MIN_CHARS", 20)  # placeholder muncul setelah N karakter
+
+# Conversation memory
+MAX_HISTORY = env_int("MAX_HISTORY", 10)  # pesan per channel
+HISTORY_TOKEN_BUDGET = env_int("HISTORY_TOKEN_BUDGET", 3000)  # estimasi token per channel
+HISTORY_MAX_CHANNELS = env_int("HISTORY_MAX_CHANNELS", 5000)
+HISTORY_TTL = env_float("HISTORY_TTL", 6 * 3600)  # detik; 0 = tanpa TTL
+
+# Persistent history (write-behind)
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "sqlite").lower()  # sqlite | memory
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "data/cache/history.sqlite3")
+HISTORY_FLUSH_INTERVAL = env_float("HISTORY_FLUSH_INTERVAL", 2.0)
+HISTORY_FLUSH_BATCH = env_int("HISTORY_FLUSH_BATCH", 500)
+
+# Response cache
+RESPONSE_CACHE = env_bool("RESPONSE_CACHE", True)
+CACHE_MAX_ENTRIES = env_int("CACHE_MAX_ENTRIES", 2000)  # memory tier (LRU)
+CACHE_TTL = env_float("CACHE_TTL", 24 * 3600)  # detik; 0 = tanpa TTL
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "data/cache/responses.sqlite3")  # kosong = tanpa disk tier
+CACHE_CONTEXT_MESSAGES = env_int("CACHE_CONTEXT_MESSAGES", MAX_HISTORY)  # pesan sebelumnya yang ikut jadi key, 0 = abaikan context
+CACHE_MIN_CHARS = env_int("CACHE_MIN_CHARS", 8)  # pertanyaan pendek ("kenapa?") tergantung context
+CACHE_SEMANTIC = env_bool("CACHE_SEMANTIC", False)  # near-duplicate matching
+CACHE_SEMANTIC_THRESHOLD = env_float("CACHE_SEMANTIC_THRESHOLD", 0.9)
+
+# Rate limiting
+COOLDOWN_SECONDS = env_float("COOLDOWN_SECONDS", 3)  # jarak minimum antar request per user
+MAX_REQUESTS_PER_MINUTE = env_int("MAX_REQUESTS_PER_MINUTE", 10)  # per user
+CHANNEL_REQUESTS_PER_MINUTE = env_int("CHANNEL_REQUESTS_PER_MINUTE", 30)
+GUILD_REQUESTS_PER_MINUTE = env_int("GUILD_REQUESTS_PER_MINUTE", 60)
+RATE_LIMIT_SWEEP_INTERVAL = env_float("RATE_LIMIT_SWEEP_INTERVAL", 60)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()  # memory | shm (satu limit untuk semua proses di host ini)
+RATE_LIMIT_SHM_PATH = os.getenv(
+    "RATE_LIMIT_SHM_PATH",
+    "/dev/shm/discord-ai-ratelimit" if os.path.isdir("/dev/shm") else "data/cache/ratelimit.shm",
+)
+RATE_LIMIT_SHM_SLOTS = env_int("RATE_LIMIT_SHM_SLOTS", 65536)  # key (user/channel/guild) yang bisa dilacak bersamaan
+
+# Upstream scheduler (retry + kuota Groq)
+UPSTREAM_MAX_RETRIES = env_int("UPSTREAM_MAX_RETRIES", 4)
+UPSTREAM_BACKOFF_BASE = env_float("UPSTREAM_BACKOFF_BASE", 0.5)  # detik
+UPSTREAM_BACKOFF_MAX = env_float("UPSTREAM_BACKOFF_MAX", 20.0)
+
+# AI request queue (weighted fair queuing per guild)
+AI_QUEUE_MAX = env_int("AI_QUEUE_MAX", 200)  # lebih dari ini langsung ditolak ("sibuk")
+AI_QUEUE_MAX_PER_GUILD = env_int("AI_QUEUE_MAX_PER_GUILD", 30)
+GUILD_WEIGHTS = os.getenv("GUILD_WEIGHTS", "")  # contoh: "123456789:2,987654321:0.5"
+SHORT_PROMPT_TOKENS = env_int("SHORT_PROMPT_TOKENS", 64)  # pertanyaan pendek didahulukan
+MAILBOX_MAX_DEPTH = env_int("MAILBOX_MAX_DEPTH", 10)  # pertanyaan per channel yang boleh menunggu giliran
+
+# Micro-batching (opt-in: pertanyaan yang menunggu di satu channel dijawab dengan satu call)
+BATCH_QUESTIONS = env_bool("BATCH_QUESTIONS", False)
+BATCH_MAX_QUESTIONS = env_int("BATCH_MAX_QUESTIONS", 5)  # termasuk pertanyaan yang sedang dijawab
+
+# Runtime mode: gateway (bot biasa) | interactions (slash command lewat HTTP, tanpa gateway)
+RUN_MODE = os.getenv("RUN_MODE", "gateway").lower()
+DISCORD_APPLICATION_ID = os.getenv("DISCORD_APPLICATION_ID")
+DISCORD_PUBLIC_KEY = os.getenv("DISCORD_PUBLIC_KEY")  # hex, dari Developer Portal
+DISCORD_API_BASE = os.getenv("DISCORD_API_BASE", "https://discord.com/api/v10")
+INTERACTIONS_HOST = os.getenv("INTERACTIONS_HOST", "0.0.0.0")
+INTERACTIONS_PORT = env_int("INTERACTIONS_PORT", 8080)
+INTERACTIONS_MAX_AGE = env_float("INTERACTIONS_MAX_AGE", 300.0)  # detik; request lebih lama = replay, ditolak
+REGISTER_COMMANDS = env_bool("REGISTER_COMMANDS", False)  # daftarkan slash command saat start (butuh DISCORD_TOKEN)
+
+# Sharding & cluster (lihat cluster.py)
+SHARD_COUNT = env_int("SHARD_COUNT", 0)  # 0 = jumlah yang direkomendasikan Discord
+SHARD_IDS = os.getenv("SHARD_IDS", "")  # shard yang dijalankan proses ini, contoh: "0-3" atau "0,2"; kosong = semua
+CLUSTER_ID = env_int("CLUSTER_ID", 0)  # diisi launcher untuk tiap worker
+CLUSTER_WORKERS = env_int("CLUSTER_WORKERS", 2)  # jumlah proses worker launcher
+CLUSTER_RESTART_DELAY = env_float("CLUSTER_RESTART_DELAY", 5.0)  # detik; digandakan tiap crash beruntun
+
+# Shared state (rate limit & pilihan model lintas worker)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "local").lower()  # local | unix (state server dari cluster.py)
+STATE_SOCKET = os.getenv("STATE_SOCKET", "data/state.sock")
+STATE_TIMEOUT = env_float("STATE_TIMEOUT", 1.0)  # detik; lebih lama = pakai state lokal sementara
+
+# Slash command (gateway mode): semua command juga tersedia sebagai /command
+SYNC_SLASH_COMMANDS = env_bool("SYNC_SLASH_COMMANDS", False)  # sync ke Discord saat start (dibatasi, jangan tiap restart)
+MESSAGE_CONTENT_INTENT = env_bool("MESSAGE_CONTENT_INTENT", True)  # 0 = command prefix hanya di DM/mention, pakai slash command
+
+# Logging (ditulis thread terpisah; file dirotasi dan dikompres gzip)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "data/logs/bot.log")  # kosong = hanya console
+LOG_MAX_BYTES = env_int("LOG_MAX_BYTES", 10 * 1024 * 1024)  # rotasi saat file sebesar ini, 0 = tanpa batas ukuran
+LOG_ROTATE_INTERVAL = env_float("LOG_ROTATE_INTERVAL", 86400)  # detik, rotasi juga tiap interval ini, 0 = mati
+LOG_BACKUP_COUNT = env_int("LOG_BACKUP_COUNT", 7)  # segmen lama yang disimpan (bot.log.1.gz, ...)
+LOG_COMPRESS = env_bool("LOG_COMPRESS", True)
+LOG_QUEUE_SIZE = env_int("LOG_QUEUE_SIZE", 10000)  # record yang menunggu ditulis sebelum INFO/DEBUG dibuang
+LOG_SAMPLE_UNDER_LOAD = env_int("LOG_SAMPLE_UNDER_LOAD", 10)  # queue > separuh penuh: simpan 1 dari N record INFO/DEBUG
+
+# Metrics (Prometheus text format di http://METRICS_HOST:METRICS_PORT/metrics)
+METRICS_PORT = env_int("METRICS_PORT", 0)  # 0 = mati
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+LOOP_LAG_INTERVAL = env_float("LOOP_LAG_INTERVAL", 0.5)  # detik antar sampel lag event loop
+LOOP_STALL_THRESHOLD = env_float("LOOP_STALL_THRESHOLD", 0.25)  # detik; loop terblokir lebih lama = stack dicatat, 0 = mati
+LOOP_STALL_HISTORY = env_int("LOOP_STALL_HISTORY", 20)  # stall terakhir yang disimpan untuk !loop
+
+# Tracing (span per tahap request AI, lihat: python tracing.py show)
+TRACE_SAMPLE_RATE = env_float("TRACE_SAMPLE_RATE", 0.0)  # 0 = mati, 0.01 = 1% request, 1 = semua
+TRACE_KEEP_SLOW = env_float("TRACE_KEEP_SLOW", 0.0)  # detik; request lebih lama selalu disimpan (semua request direkam)
+TRACE_PATH = os.getenv("TRACE_PATH", "data/logs/traces.jsonl")  # kosong = tidak ditulis ke file
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")  # contoh: http://localhost:4318
+TRACE_FLUSH_INTERVAL = env_float("TRACE_FLUSH_INTERVAL", 2.0)
+TRACE_MAX_PENDING = env_int("TRACE_MAX_PENDING", 1000)  # trace yang menunggu export, lebih = dibuang
+
+# Model routing (model tercepat yang sehat, fail over ke berikutnya)
+MODEL_TIER = os.getenv("MODEL_TIER", "groq")  # model chat saja (alias di MODELS atau model id), urutan = prioritas awal
+MODEL_TIMEOUT = env_float("MODEL_TIMEOUT", 20.0)  # detik sampai response pertama sebelum pindah model
+FAILOVER_RETRIES = env_int("FAILOVER_RETRIES", 1)  # retry di model yang sama kalau masih ada cadangan
+ROUTER_WINDOW = env_int("ROUTER_WINDOW", 50)  # jumlah request terakhir untuk statistik latency/error
+ROUTER_FAILURE_THRESHOLD = env_int("ROUTER_FAILURE_THRESHOLD", 3)  # gagal berturut-turut = tidak sehat
+ROUTER_COOLDOWN = env_float("ROUTER_COOLDOWN", 30.0)  # detik model tidak sehat dilewati
+
+# Hedged requests (opt-in: call kedua kalau call pertama lambat, yang kalah dibatalkan)
+HEDGE_REQUESTS = env_bool("HEDGE_REQUESTS", False)
+HEDGE_PERCENTILE = env_float("HEDGE_PERCENTILE", 95)  # hedge setelah latency pXX terakhir
+HEDGE_MIN_DELAY = env_float("HEDGE_MIN_DELAY", 0.5)  # detik
+HEDGE_DEFAULT_DELAY = env_float("HEDGE_DEFAULT_DELAY", 3.0)  # sebelum ada cukup sampel
+HEDGE_BUDGET = env_float("HEDGE_BUDGET", 0.1)  # maksimal ~10% request boleh di-hedge
+HEDGE_ALTERNATE = env_bool("HEDGE_ALTERNATE", True)  # call kedua ke model lain di MODEL_TIER
+
+# Deadline per request (antri + call upstream + kirim balasan)
+REQUEST_DEADLINE = env_float("REQUEST_DEADLINE", 45.0)  # detik sejak pesan diterima
+DEADLINE_SEND_RESERVE = env_float("DEADLINE_SEND_RESERVE", 3.0)  # sisa waktu untuk kirim jawaban parsial
+if not 0 <= DEADLINE_SEND_RESERVE < REQUEST_DEADLINE:
+    # Nothing left to generate with: every request would time out at once
+    raise ValueError(f"DEADLINE_SEND_RESERVE ({DEADLINE_SEND_RESERVE}) must be at least 0 and "
+                     f"less than REQUEST_DEADLINE ({REQUEST_DEADLINE})")
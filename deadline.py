@@ -0,0 +1,67 @@
+"""
+Request deadlines - satu budget waktu untuk antri, call upstream dan kirim balasan
+"""
+
+import asyncio
+import contextvars
+import time
+
+import config
+
+# Deadline of the request being handled; tasks started for it inherit it
+current_deadline = contextvars.ContextVar('current_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs out of its time budget"""
+
+
+class Deadline:
+    """Absolute expiry time shared by every stage of one request"""
+
+    __slots__ = ('started', 'expires_at')
+
+    def __init__(self, budget: float = None, started: float = None):
+        self.started = time.monotonic() if started is None else started
+        self.expires_at = self.started + (budget or config.REQUEST_DEADLINE)
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def expired(self, reserve: float = 0.0) -> bool:
+        return self.remaining <= reserve
+
+    async def run(self, awaitable, reserve: float = 0.0):
+        """Await within the budget, keeping `reserve` seconds for later stages"""
+        timeout = self.remaining - reserve
+        if timeout <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(f"deadline exceeded after {self.elapsed:.1f}s")
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            if not self.expired(reserve):
+                # A shorter timeout inside (e.g. MODEL_TIMEOUT), not ours
+                raise
+            raise DeadlineExceeded(f"deadline exceeded after {self.elapsed:.1f}s") from None
+
+
+def start_deadline(budget: float = None) -> Deadline:
+    """Start the deadline of a newly received request"""
+    deadline = Deadline(budget)
+    current_deadline.set(deadline)
+    return deadline
+
+
+def upstream_timeout() -> float:
+    """HTTP timeout for an upstream call: the client default, capped by the deadline"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return config.HTTP_TIMEOUT
+    return max(0.1, min(config.HTTP_TIMEOUT, deadline.remaining))
@@ -0,0 +1,195 @@
+"""
+Hedged requests - kirim call kedua kalau call pertama lebih lambat dari biasanya
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+import config
+
+logger = logging.getLogger('DiscordAI')
+
+
+class Hedger:
+    """Fire a backup call once the first one is slower than the recent pXX latency"""
+
+    def __init__(self, enabled: bool = None, percentile: float = None, min_delay: float = None,
+                 default_delay: float = None, budget: float = None, window: int = None,
+                 min_samples: int = 20):
+        self.enabled = config.HEDGE_REQUESTS if enabled is None else enabled
+        self.percentile = percentile or config.HEDGE_PERCENTILE
+        self.min_delay = config.HEDGE_MIN_DELAY if min_delay is None else min_delay
+        self.default_delay = default_delay or config.HEDGE_DEFAULT_DELAY
+        self.budget = config.HEDGE_BUDGET if budget is None else budget
+        self.window = window or config.ROUTER_WINDOW
+        self.min_samples = min_samples
+
+        self._latencies = {}  # model -> deque of recent successful call latencies
+        # Hedging credit: each request earns `budget`, each hedge spends 1
+        self._credit = 1.0
+
+        self.requests = 0
+        self.hedged = 0       # backup calls fired
+        self.hedge_wins = 0   # backup answered first
+        self.cancelled = 0    # losing calls cancelled
+        self.extra_tokens = 0  # quota tokens reserved by backup calls
+
+    def observe(self, model: str, latency: float):
+        latencies = self._latencies.get(model)
+        if latencies is None:
+            latencies = self._latencies[model] = deque(maxlen=self.window)
+        latencies.append(latency)
+
+    def delay(self, model: str) -> float:
+        """How long to wait for the first call before hedging"""
+        latencies = self._latencies.get(model)
+        if latencies is None or len(latencies) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[index])
+
+    async def _timed(self, model: str, call):
+        started = time.monotonic()
+        result = await call(model)
+        self.observe(model, time.monotonic() - started)
+        return result
+
+    def _begin(self):
+        self.requests += 1
+        self._credit = min(10.0, self._credit + self.budget)
+
+    def _should_hedge(self, backup_model: str, allow) -> bool:
+        if allow is not None and not allow(backup_model):
+            return False
+        if self._credit < 1.0:
+            return False
+        self._credit -= 1.0
+        return True
+
+    def _hedged(self, model: str, backup_model: str, tokens: int):
+        self.hedged += 1
+        self.extra_tokens += tokens
+        logger.info(f"🪁 Hedging slow {model} call with {backup_model}")
+
+    async def run(self, model: str, call, alternate: str = None, tokens: int = 0,
+                  allow=None):
+        """
+        Await call(model), hedging with call(alternate or model) if it is slow.
+
+        allow(backup_model) is checked right before hedging (e.g. skip when the
+        queue is saturated). The loser is cancelled, which also closes its HTTP
+        request.
+        """
+        if not self.enabled:
+            return await call(model)
+
+        self._begin()
+        backup_model = alternate or model
+        primary = asyncio.create_task(self._timed(model, call))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.delay(model))
+            if done or not self._should_hedge(backup_model, allow):
+                return await primary
+        except BaseException:
+            primary.cancel()
+            raise
+
+        self._hedged(model, backup_model, tokens)
+        backup = asyncio.create_task(self._timed(backup_model, call))
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # A failed call does not win while the other may still answer
+                    if task.exception() is None:
+                        if task is backup:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Both failed: report the first call's error
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+                self.cancelled += 1
+
+    async def stream(self, model: str, open_stream, alternate: str = None, tokens: int = 0,
+                     allow=None):
+        """Like run() for token streams: the race is to the first token"""
+        if not self.enabled:
+            async for token in open_stream(model):
+                yield token
+            return
+
+        self._begin()
+        backup_model = alternate or model
+        started = time.monotonic()
+        racers = {}  # first-token task -> (model, stream)
+
+        def start(racer_model: str):
+            stream = open_stream(racer_model)
+            racers[asyncio.ensure_future(stream.__anext__())] = (racer_model, stream)
+
+        async def drop(task):
+            # The stream must stop running before it can be closed
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+            await racers[task][1].aclose()
+
+        start(model)
+        winner = None
+        try:
+            primary = next(iter(racers))
+            done, _ = await asyncio.wait({primary}, timeout=self.delay(model))
+            if not done and self._should_hedge(backup_model, allow):
+                self._hedged(model, backup_model, tokens)
+                start(backup_model)
+
+            pending = set(racers)
+            while winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    # An empty stream is a (silent) answer too
+                    if error is None or isinstance(error, StopAsyncIteration) or not pending:
+                        winner = task
+                        break
+        finally:
+            for task in racers:
+                if task is not winner and not task.done():
+                    self.cancelled += 1
+                if task is not winner:
+                    await drop(task)
+
+        winner_model, stream = racers[winner]
+        if winner is not primary:
+            self.hedge_wins += 1
+        try:
+            error = winner.exception()
+            if isinstance(error, StopAsyncIteration):
+                return
+            first = winner.result()  # raises when every racer failed
+            self.observe(winner_model, time.monotonic() - started)
+            yield first
+            async for token in stream:
+                yield token
+        finally:
+            await stream.aclose()
+
+    def stats(self) -> dict:
+        """Hedge counters and what they cost"""
+        return {
+            'enabled': self.enabled,
+            'requests': self.requests,
+            'hedged': self.hedged,
+            'hedge_rate': self.hedged / self.requests if self.requests else 0.0,
+            'hedge_wins': self.hedge_wins,
+            'cancelled': self.cancelled,
+            'extra_tokens': self.extra_tokens,
+        }
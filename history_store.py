@@ -0,0 +1,196 @@
+"""
+History backends - simpan conversation history agar selamat dari restart
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import config
+
+logger = logging.getLogger('DiscordAI')
+
+
+class HistoryBackend:
+    """In-memory only backend (nothing survives a restart)"""
+
+    persistent = False  # load() can return something
+
+    def load(self, channel_id: int) -> list:
+        """Load a channel's stored messages, oldest first"""
+        return []
+
+    def append(self, channel_id: int, role: str, content: str):
+        """Record a new message"""
+
+    def reset(self, channel_id: int):
+        """Forget a channel"""
+
+    def start(self):
+        """Start background work (called from the running event loop)"""
+
+    async def close(self):
+        """Flush and release resources"""
+
+
+class SQLiteHistoryBackend(HistoryBackend):
+    """SQLite (WAL) backend with batched write-behind flushing"""
+
+    persistent = True
+
+    def __init__(self, path: str = None, flush_interval: float = None,
+                 batch_size: int = None, keep_messages: int = None):
+        self.path = path or config.HISTORY_DB_PATH
+        self.flush_interval = flush_interval or config.HISTORY_FLUSH_INTERVAL
+        self.batch_size = batch_size or config.HISTORY_FLUSH_BATCH
+        self.keep_messages = keep_messages or config.MAX_HISTORY
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # One connection shared by the load and flush worker threads
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " channel_id INTEGER NOT NULL,"
+                " role TEXT NOT NULL,"
+                " content TEXT NOT NULL,"
+                " created REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_messages_channel ON messages (channel_id, id)"
+            )
+            self._db.commit()
+
+        self._pending = []  # ('append', channel_id, role, content, created) | ('reset', channel_id)
+        self._inflight = []  # batch handed to the flush thread, cleared once committed
+        self._wake = None
+        self._task = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def load(self, channel_id: int) -> list:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT role, content FROM ("
+                " SELECT id, role, content FROM messages WHERE channel_id = ?"
+                " ORDER BY id DESC LIMIT ?) ORDER BY id",
+                (channel_id, self.keep_messages)
+            ).fetchall()
+            unflushed = self._inflight + self._pending
+        messages = [{"role": role, "content": content} for role, content in rows]
+
+        # Apply writes that have not reached the database yet
+        for op in unflushed:
+            if op[1] != channel_id:
+                continue
+            if op[0] == 'reset':
+                messages = []
+            else:
+                messages.append({"role": op[2], "content": op[3]})
+        return messages[-self.keep_messages:]
+
+    def append(self, channel_id: int, role: str, content: str):
+        self._pending.append(('append', channel_id, role, content, time.time()))
+        self._maybe_wake()
+
+    def reset(self, channel_id: int):
+        self._pending.append(('reset', channel_id))
+        self._maybe_wake()
+
+    def _maybe_wake(self):
+        if self._wake is not None and len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        """Flush pending writes every interval (or early when a batch fills)"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ History flush failed: {e}")
+
+    async def flush(self):
+        """Write all pending operations in one transaction off the event loop"""
+        if not self._pending:
+            return
+        # Under the lock: load() in a worker thread must see the batch in one of the two lists
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._inflight = batch
+        try:
+            await asyncio.to_thread(self._write_batch, batch)
+        except Exception:
+            # Keep the batch so the next flush retries it
+            with self._lock:
+                self._inflight = []
+                self._pending = batch + self._pending
+            raise
+
+    def _write_batch(self, batch: list):
+        touched = set()
+        with self._lock:
+            with self._db:
+                for op in batch:
+                    if op[0] == 'reset':
+                        self._db.execute("DELETE FROM messages WHERE channel_id = ?", (op[1],))
+                        touched.discard(op[1])
+                    else:
+                        self._db.execute(
+                            "INSERT INTO messages (channel_id, role, content, created) VALUES (?, ?, ?, ?)",
+                            op[1:]
+                        )
+                        touched.add(op[1])
+
+                # Only the newest keep_messages rows per channel are ever loaded
+                for channel_id in touched:
+                    self._db.execute(
+                        "DELETE FROM messages WHERE channel_id = ? AND id NOT IN ("
+                        " SELECT id FROM messages WHERE channel_id = ? ORDER BY id DESC LIMIT ?)",
+                        (channel_id, channel_id, self.keep_messages)
+                    )
+            self._inflight = []
+        self.flushes += 1
+        self.rows_written += len(batch)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        with self._lock:
+            self._db.close()
+        logger.info(f"💾 History store closed ({self.rows_written} rows written in {self.flushes} flushes)")
+
+
+def create_history_backend(name: str = None) -> HistoryBackend:
+    """Create the configured history backend (sqlite | memory)"""
+    name = (name or config.HISTORY_BACKEND).lower()
+    if name == 'sqlite':
+        return SQLiteHistoryBackend()
+    if name == 'memory':
+        return HistoryBackend()
+    raise ValueError(f"Unknown HISTORY_BACKEND: {name}")
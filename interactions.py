@@ -0,0 +1,331 @@
+"""
+Interactions endpoint - slash command lewat HTTP tanpa koneksi gateway,
+jadi bot bisa jalan sebagai beberapa replika di belakang load balancer
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import aiohttp
+import discord
+from aiohttp import web
+
+import config
+
+logger = logging.getLogger('DiscordAI')
+
+# Interaction and response types of the Discord API
+PING = 1
+APPLICATION_COMMAND = 2
+RESPONSE_PONG = 1
+RESPONSE_MESSAGE = 4
+RESPONSE_DEFERRED = 5
+EPHEMERAL = 1 << 6
+
+
+def _signing():
+    """The optional PyNaCl signing module"""
+    try:
+        import nacl.signing
+        import nacl.exceptions
+    except ImportError:
+        raise RuntimeError("Interactions mode needs PyNaCl: pip install PyNaCl") from None
+    return nacl
+
+
+class SignatureVerifier:
+    """Checks the Ed25519 signature Discord puts on every interaction request"""
+
+    def __init__(self, public_key: str, max_age: float = None):
+        nacl = _signing()
+        self._bad_signature = nacl.exceptions.BadSignatureError
+        self._key = nacl.signing.VerifyKey(bytes.fromhex(public_key))
+        # Old timestamps are replays: a valid request sent again later
+        self.max_age = config.INTERACTIONS_MAX_AGE if max_age is None else max_age
+
+    def verify(self, signature: str, timestamp: str, body: bytes) -> bool:
+        try:
+            if self.max_age and abs(time.time() - int(timestamp)) > self.max_age:
+                return False
+            self._key.verify(timestamp.encode() + body, bytes.fromhex(signature))
+        except (ValueError, TypeError, self._bad_signature):
+            return False
+        return True
+
+
+class StubSigner:
+    """Signs requests the way Discord does, for testing replicas locally"""
+
+    def __init__(self, seed: str = None):
+        nacl = _signing()
+        if seed is None:
+            self._key = nacl.signing.SigningKey.generate()
+        else:
+            self._key = nacl.signing.SigningKey(seed.encode().ljust(32, b'\0')[:32])
+
+    @property
+    def public_key(self) -> str:
+        return self._key.verify_key.encode().hex()
+
+    def headers(self, body: bytes, timestamp: str = None) -> dict:
+        timestamp = timestamp or str(int(time.time()))
+        signature = self._key.sign(timestamp.encode() + body).signature
+        return {
+            'X-Signature-Ed25519': signature.hex(),
+            'X-Signature-Timestamp': timestamp,
+            'Content-Type': 'application/json',
+        }
+
+
+class InteractionGuild:
+    __slots__ = ('id', 'name')
+
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = str(guild_id)  # names need the gateway (or an extra API call)
+
+
+class InteractionChannel:
+    """The channel of an interaction, as far as the payload tells"""
+
+    __slots__ = ('id', 'guild')
+
+    def __init__(self, channel_id: int, guild: InteractionGuild = None):
+        self.id = channel_id
+        self.guild = guild
+
+    @asynccontextmanager
+    async def typing(self):
+        # The deferred response already shows "... is thinking"
+        yield
+
+
+class InteractionAvatar:
+    __slots__ = ('url',)
+
+    def __init__(self, url: str):
+        self.url = url
+
+
+class InteractionUser:
+    """The invoking user, with the server permissions Discord resolved for them"""
+
+    __slots__ = ('id', 'name', 'display_name', 'bot', 'avatar', 'guild_permissions')
+
+    def __init__(self, interaction: dict):
+        member = interaction.get('member')
+        user = member['user'] if member else interaction['user']
+        self.id = int(user['id'])
+        self.name = user.get('username', str(self.id))
+        self.display_name = (member or {}).get('nick') or user.get('global_name') or self.name
+        self.bot = user.get('bot', False)
+        avatar = user.get('avatar')
+        self.avatar = (InteractionAvatar(f"https://cdn.discordapp.com/avatars/{self.id}/{avatar}.png")
+                       if avatar else None)
+        self.guild_permissions = discord.Permissions(int(member['permissions'])) if member else None
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class FollowupMessage:
+    """A message sent through the interaction webhook (edit/delete like discord.Message)"""
+
+    def __init__(self, responder, message_id: str):
+        self._responder = responder
+        self.id = message_id
+
+    async def edit(self, content: str = None, embed: discord.Embed = None):
+        await self._responder.request('PATCH', f"messages/{self.id}", content, embed)
+
+    async def delete(self):
+        await self._responder.request('DELETE', f"messages/{self.id}")
+
+
+class InteractionContext:
+    """What a command handler gets: who asked where, and a reply() like ctx.reply"""
+
+    def __init__(self, server, interaction: dict):
+        self._server = server
+        self.interaction = interaction
+        self.id = int(interaction['id'])
+        self.token = interaction['token']
+        self.command = interaction['data']['name']
+        self.guild_id = int(interaction['guild_id']) if interaction.get('guild_id') else None
+        self.guild = InteractionGuild(self.guild_id) if self.guild_id else None
+        self.channel = InteractionChannel(int(interaction['channel_id']), self.guild)
+        self.author = InteractionUser(interaction)
+        self._replied = False
+
+    async def defer(self, ephemeral: bool = False):
+        """Already deferred before the handler runs"""
+
+    def options(self) -> dict:
+        return {option['name']: option.get('value')
+                for option in self.interaction['data'].get('options', ())}
+
+    async def reply(self, content: str = None, embed: discord.Embed = None) -> FollowupMessage:
+        """First reply fills the deferred response, later ones are follow-ups"""
+        if not self._replied:
+            self._replied = True
+            await self.request('PATCH', "messages/@original", content, embed)
+            return FollowupMessage(self, '@original')
+        data = await self.request('POST', "", content, embed, wait=True)
+        return FollowupMessage(self, data['id'])
+
+    async def request(self, method: str, path: str, content: str = None,
+                      embed: discord.Embed = None, wait: bool = False):
+        url = f"{self._server.api_base}/webhooks/{self._server.application_id}/{self.token}"
+        if path:
+            url = f"{url}/{path}"
+        payload = None
+        if method != 'DELETE':
+            payload = {'content': content, 'embeds': [embed.to_dict()] if embed else []}
+        return await self._server.webhook(method, url, payload, {'wait': 'true'} if wait else None)
+
+
+class InteractionServer:
+    """Stateless aiohttp endpoint: verify, defer at once, answer via follow-up webhook"""
+
+    def __init__(self, verifier: SignatureVerifier, application_id: str, api_base: str = None):
+        self.verifier = verifier
+        self.application_id = application_id
+        self.api_base = (api_base or config.DISCORD_API_BASE).rstrip('/')
+        self.commands = {}
+        self.app = web.Application()
+        self.app.router.add_post('/interactions', self.handle)
+        self.app.router.add_get('/health', self.health)
+        self._session = None
+        self._runner = None
+        self._tasks = set()
+        self.received = 0
+        self.rejected = 0
+        self.failed = 0
+        self.rate_limited = 0
+
+    def command(self, name: str):
+        """Register handler(ctx, **options) for a slash command"""
+        def decorator(handler):
+            self.commands[name] = handler
+            return handler
+        return decorator
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        body = await request.read()
+        if not self.verifier.verify(request.headers.get('X-Signature-Ed25519', ''),
+                                    request.headers.get('X-Signature-Timestamp', ''), body):
+            self.rejected += 1
+            return web.Response(status=401, text="invalid request signature")
+        try:
+            interaction = json.loads(body)
+        except ValueError:
+            return web.Response(status=400, text="invalid json")
+
+        kind = interaction.get('type')
+        if kind == PING:
+            return web.json_response({'type': RESPONSE_PONG})
+        if kind != APPLICATION_COMMAND:
+            return web.Response(status=400, text="unsupported interaction type")
+
+        self.received += 1
+        ctx = InteractionContext(self, interaction)
+        handler = self.commands.get(ctx.command)
+        if handler is None:
+            return web.json_response({'type': RESPONSE_MESSAGE, 'data': {
+                'content': f"Unknown command: {ctx.command}", 'flags': EPHEMERAL}})
+
+        # Defer first (Discord allows 3 seconds), then run the command: its
+        # reply edits the deferred response, which must exist by then
+        response = web.json_response({'type': RESPONSE_DEFERRED})
+        await response.prepare(request)
+        await response.write_eof()
+        task = asyncio.ensure_future(self._run(handler, ctx))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return response
+
+    async def _run(self, handler, ctx: InteractionContext):
+        try:
+            await handler(ctx, **ctx.options())
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"❌ Error in /{ctx.command} interaction: {e}")
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({'status': 'ok', 'in_flight': len(self._tasks)})
+
+    async def webhook(self, method: str, url: str, payload: dict = None, params: dict = None):
+        """Call the interaction webhook, waiting out rate limits"""
+        for _ in range(5):
+            async with self._session.request(method, url, json=payload, params=params) as response:
+                if response.status == 429:
+                    self.rate_limited += 1
+                    data = await response.json()
+                    await asyncio.sleep(float(data.get('retry_after', 1.0)))
+                    continue
+                if response.status >= 400:
+                    raise discord.HTTPException(response, await response.text())
+                if response.status == 204:
+                    return None
+                return await response.json()
+        raise discord.HTTPException(response, "rate limited")
+
+    async def register(self, commands: list, token: str):
+        """Overwrite the application's global slash commands"""
+        url = f"{self.api_base}/applications/{self.application_id}/commands"
+        async with self._session.put(url, json=commands,
+                                     headers={'Authorization': f"Bot {token}"}) as response:
+            if response.status >= 400:
+                raise discord.HTTPException(response, await response.text())
+        logger.info(f"📝 Registered {len(commands)} slash commands")
+
+    async def start(self, host: str = None, port: int = None):
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=config.HTTP_TIMEOUT))
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        host = host or config.INTERACTIONS_HOST
+        port = port or config.INTERACTIONS_PORT
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"🌐 Interactions endpoint listening on http://{host}:{port}/interactions")
+
+    async def close(self, timeout: float = 30.0):
+        """Stop accepting interactions and let the deferred ones finish"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=timeout)
+        if self._session is not None:
+            await self._session.close()
+
+    def stats(self) -> dict:
+        return {
+            'received': self.received,
+            'rejected': self.rejected,
+            'in_flight': len(self._tasks),
+            'failed': self.failed,
+            'rate_limited': self.rate_limited,
+        }
+
+
+async def _send(url: str, seed: str, payload: str):
+    """Post one stub-signed interaction and print the response"""
+    body = payload.encode()
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, data=body, headers=StubSigner(seed).headers(body)) as response:
+            print(response.status, await response.text())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub signer for testing the interactions endpoint locally")
+    parser.add_argument('seed', help="any string; use the same seed for key and requests")
+    parser.add_argument('--url', help="post a signed interaction to this endpoint")
+    parser.add_argument('--payload', default='{"type": 1}', help="interaction JSON")
+    args = parser.parse_args()
+    if args.url:
+        asyncio.run(_send(args.url, args.seed, args.payload))
+    else:
+        print(f"DISCORD_PUBLIC_KEY={StubSigner(args.seed).public_key}")
@@ -0,0 +1,145 @@
+"""
+Logging pipeline - log ditulis thread terpisah lewat queue, dengan rotasi dan kompresi
+"""
+
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import time
+
+import config
+
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# At most one "records lost" warning per this many seconds
+REPORT_INTERVAL = 10.0
+
+
+def _gzip_rotate(source: str, dest: str):
+    with open(source, 'rb') as plain, gzip.open(dest, 'wb') as packed:
+        shutil.copyfileobj(plain, packed)
+    os.remove(source)
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotates at max_bytes or every interval seconds, whichever comes first; old segments gzipped"""
+
+    def __init__(self, filename: str, max_bytes: int = 0, interval: float = 0,
+                 backup_count: int = 0, compress: bool = True):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+        if compress:
+            # bot.log.1.gz, bot.log.2.gz, ...: the stdlib shifts and prunes them
+            self.namer = lambda name: name + '.gz'
+            self.rotator = _gzip_rotate
+
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        if self.interval and time.time() >= self.rollover_at:
+            return 1
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class OverloadQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread without blocking.
+
+    Past half the capacity only one in sample_every DEBUG/INFO records is
+    kept; at capacity they are dropped. Warnings and errors may use as much
+    again on top before they are dropped too. What was lost is reported in
+    a warning (at most every REPORT_INTERVAL) while the queue is below half.
+    """
+
+    def __init__(self, capacity: int = None, sample_every: int = None):
+        super().__init__(queue.Queue())
+        self.capacity = capacity or config.LOG_QUEUE_SIZE
+        self.sample_every = sample_every or config.LOG_SAMPLE_UNDER_LOAD
+        self.dropped = 0
+        self.sampled_out = 0
+        self._seen = 0
+        self._unreported = 0
+        self._reported_at = 0.0
+
+    def _admit(self, record: logging.LogRecord, size: int) -> bool:
+        if record.levelno >= logging.WARNING:
+            if size < self.capacity * 2:
+                return True
+        elif size < self.capacity // 2:
+            return True
+        elif size < self.capacity:
+            self._seen += 1
+            if self._seen % self.sample_every == 0:
+                return True
+            self.sampled_out += 1
+            self._unreported += 1
+            return False
+        self.dropped += 1
+        self._unreported += 1
+        return False
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            size = self.queue.qsize()
+            # Decide before prepare(): a dropped record is never formatted
+            if not self._admit(record, size):
+                return
+            if self._unreported and size < self.capacity // 2 \
+                    and time.monotonic() - self._reported_at >= REPORT_INTERVAL:
+                lost, self._unreported = self._unreported, 0
+                self._reported_at = time.monotonic()
+                self.queue.put_nowait(logging.LogRecord(
+                    'DiscordAI', logging.WARNING, __file__, 0,
+                    f"⚠️ Logging overloaded: {lost} records dropped or sampled out", None, None
+                ))
+            self.queue.put_nowait(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def stats(self) -> dict:
+        return {
+            'queued': self.queue.qsize(),
+            'dropped': self.dropped,
+            'sampled_out': self.sampled_out,
+        }
+
+
+def setup_logging() -> OverloadQueueHandler:
+    """Send every record through a queue to a writer thread (console + rotating file)"""
+    formatter = logging.Formatter(FORMAT)
+    handlers = [logging.StreamHandler()]
+    if config.LOG_FILE:
+        # Created here: the first record must not fail because data/logs is missing
+        directory = os.path.dirname(config.LOG_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handlers.append(CompressingRotatingFileHandler(
+            config.LOG_FILE, config.LOG_MAX_BYTES, config.LOG_ROTATE_INTERVAL,
+            config.LOG_BACKUP_COUNT, config.LOG_COMPRESS
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = OverloadQueueHandler()
+    # On the handler too: loggers may be set lower than root to feed counters (metrics)
+    queue_handler.setLevel(config.LOG_LEVEL)
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers)
+    listener.start()
+    # Written out on exit, including what was logged during shutdown
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(config.LOG_LEVEL)
+    # Replaces whatever was installed before (basicConfig): its handlers write on the caller's thread
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    return queue_handler
@@ -0,0 +1,121 @@
+"""
+Loop monitor - ukur seberapa telat event loop menjalankan callback (lag), dan tangkap
+stack kode yang memblokir loop lewat watchdog thread
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+import config
+
+logger = logging.getLogger('DiscordAI')
+
+# Innermost frames kept per captured stack
+STACK_LIMIT = 20
+
+
+class LoopLagMonitor:
+    """
+    Sleeps a fixed interval and measures how late it wakes up.
+
+    With a stall threshold, a watchdog thread checks that the sampler keeps
+    waking up. When it is late by more than the threshold, something on the
+    loop is blocking, and the watchdog captures the loop thread's stack while
+    it still is.
+    """
+
+    def __init__(self, interval: float = None, threshold: float = None, history: int = None):
+        self.interval = interval or config.LOOP_LAG_INTERVAL
+        self.threshold = config.LOOP_STALL_THRESHOLD if threshold is None else threshold
+        self.lag = 0.0       # last sample, seconds
+        self.max_lag = 0.0
+        self.samples = 0
+        self.stall_count = 0
+        # Most recent first: {'at': epoch, 'blocked': seconds, 'where': innermost frame, 'stack': [lines]}
+        self.stalls = deque(maxlen=history or config.LOOP_STALL_HISTORY)
+        self.hooks = []      # hook(lag) after every sample
+        self._task = None
+        self._watchdog = None
+        self._stopping = threading.Event()
+        self._loop_thread = None
+        self._due = 0.0      # when the sampler should wake up next (monotonic)
+        self._stall = None   # (due, stall) captured while the loop was blocked
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def start(self):
+        """Start sampling (called from the running event loop)"""
+        if self._task is None:
+            self._loop_thread = threading.get_ident()
+            self._due = time.monotonic() + self.interval
+            self._task = asyncio.ensure_future(self._run())
+        if self.threshold and self._watchdog is None:
+            self._stopping.clear()
+            self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+            self._watchdog.start()
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            due = self._due = started + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - started - self.interval)
+            self.lag = lag
+            self.samples += 1
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if self.threshold and lag >= self.threshold:
+                self.stall_count += 1
+            pending = self._stall
+            if pending is not None and pending[0] == due:
+                # The watchdog saw it while blocked; now the whole stall is known
+                pending[1]['blocked'] = lag
+                self._stall = None
+            for hook in self.hooks:
+                hook(lag)
+
+    def _watch(self):
+        poll = max(0.01, self.threshold / 2)
+        while not self._stopping.wait(poll):
+            due = self._due
+            blocked = time.monotonic() - due
+            if blocked < self.threshold or (self._stall is not None and self._stall[0] == due):
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            frames = traceback.extract_stack(frame, limit=STACK_LIMIT)
+            del frame
+            if due != self._due:
+                # Woke up while the stack was taken: it shows whatever runs now
+                continue
+            innermost = frames[-1]
+            stack = frames.format()
+            stall = {'at': time.time(), 'blocked': blocked, 'stack': stack,
+                     'where': f"{os.path.basename(innermost.filename)}:{innermost.lineno} in {innermost.name}"}
+            self._stall = (due, stall)
+            self.stalls.appendleft(stall)
+            logger.warning(f"🐢 Event loop blocked for {blocked:.3f}s+, running:\n{''.join(stack).rstrip()}")
+
+    async def close(self):
+        if self._watchdog is not None:
+            self._stopping.set()
+            self._watchdog = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {'lag': self.lag, 'max_lag': self.max_lag, 'samples': self.samples,
+                'stalls': self.stall_count}
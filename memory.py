@@ -0,0 +1,207 @@
+"""
+Conversation memory - history per channel dengan batas LRU/TTL dan token
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+
+import config
+from history_store import HistoryBackend
+
+# Rough per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast token estimate (~4 characters per token)"""
+    return (len(text) + 3) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+class ChannelHistory:
+    """Messages of one channel with running token/byte totals"""
+
+    __slots__ = ('entries', 'tokens', 'bytes', 'last_access')
+
+    def __init__(self):
+        self.entries = deque()  # (message, tokens, bytes)
+        self.tokens = 0
+        self.bytes = 0
+        self.last_access = time.monotonic()
+
+    def append(self, message: dict, tokens: int, size: int):
+        self.entries.append((message, tokens, size))
+        self.tokens += tokens
+        self.bytes += size
+
+    def popleft(self):
+        _, tokens, size = self.entries.popleft()
+        self.tokens -= tokens
+        self.bytes -= size
+
+
+class ConversationMemory:
+    """Bounded store of conversation history, keyed by channel id"""
+
+    def __init__(self, max_channels: int = None, ttl: float = None,
+                 max_messages: int = None, token_budget: int = None,
+                 backend: HistoryBackend = None):
+        self.backend = backend or HistoryBackend()
+        self.max_channels = max_channels or config.HISTORY_MAX_CHANNELS
+        self.ttl = config.HISTORY_TTL if ttl is None else ttl
+        self.max_messages = max_messages or config.MAX_HISTORY
+        self.token_budget = token_budget or config.HISTORY_TOKEN_BUDGET
+
+        self._channels = OrderedDict()
+        # Channels with nothing stored (LRU, bounded like the resident ones): never re-queried
+        self._empty = OrderedDict()
+        self._loads = {}        # channel_id -> load in progress, shared by concurrent get()s
+        self._changed = set()   # written to while loading: the load is repeated
+        self.loads = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.trimmed = 0
+
+    def _expire(self, now: float):
+        """Drop channels idle for longer than the TTL (oldest first)"""
+        if not self.ttl:
+            return
+        while self._channels:
+            channel_id, history = next(iter(self._channels.items()))
+            if now - history.last_access < self.ttl:
+                break
+            del self._channels[channel_id]
+            self.expirations += 1
+
+    def _touch(self, channel_id: int) -> ChannelHistory:
+        """Look up a resident channel and mark it most recently used"""
+        now = time.monotonic()
+        self._expire(now)
+
+        history = self._channels.get(channel_id)
+        if history is not None:
+            self._channels.move_to_end(channel_id)
+            history.last_access = now
+        return history
+
+    def _install(self, channel_id: int, stored: list) -> ChannelHistory:
+        """Make a channel resident with its stored messages"""
+        history = ChannelHistory()
+        for message in stored:
+            self._add(history, message["role"], message["content"])
+        self._channels[channel_id] = history
+        self._empty.pop(channel_id, None)
+        while len(self._channels) > self.max_channels:
+            self._channels.popitem(last=False)
+            self.evictions += 1
+        return history
+
+    def _known_empty(self, channel_id: int) -> bool:
+        if not self.backend.persistent:
+            return True
+        if channel_id in self._empty:
+            self._empty.move_to_end(channel_id)
+            return True
+        return False
+
+    def _mark_empty(self, channel_id: int):
+        self._empty[channel_id] = True
+        self._empty.move_to_end(channel_id)
+        while len(self._empty) > self.max_channels:
+            self._empty.popitem(last=False)
+
+    def _written(self, channel_id: int):
+        if channel_id in self._loads:
+            self._changed.add(channel_id)
+
+    async def _load(self, channel_id: int):
+        """Read a cold channel (e.g. after a restart) in a worker thread, off the event loop"""
+        try:
+            while True:
+                self._changed.discard(channel_id)
+                stored = await asyncio.to_thread(self.backend.load, channel_id)
+                if channel_id not in self._changed:
+                    break
+        finally:
+            self._loads.pop(channel_id, None)
+        if channel_id in self._channels:
+            return
+        if stored:
+            self._install(channel_id, stored)
+            self.loads += 1
+        else:
+            self._mark_empty(channel_id)
+
+    async def get(self, channel_id: int) -> list:
+        """Get a copy of the channel's messages, oldest first"""
+        history = self._touch(channel_id)
+        if history is None and not self._known_empty(channel_id):
+            load = self._loads.get(channel_id)
+            if load is None:
+                load = self._loads[channel_id] = asyncio.ensure_future(self._load(channel_id))
+            # Shared with other readers: a cancelled get() must not cancel it
+            await asyncio.shield(load)
+            history = self._touch(channel_id)
+        if history is None:
+            return []
+        return [message for message, _, _ in history.entries]
+
+    def _clip(self, content: str) -> str:
+        # A single message may never exceed the whole budget on its own
+        max_chars = (self.token_budget - MESSAGE_OVERHEAD_TOKENS) * 4
+        return content[:max_chars]
+
+    def _add(self, history: ChannelHistory, role: str, content: str) -> str:
+        """Append to a resident channel and trim it back under its budgets"""
+        content = self._clip(content)
+
+        history.append(
+            {"role": role, "content": content},
+            estimate_tokens(content),
+            len(content.encode('utf-8'))
+        )
+
+        while len(history.entries) > self.max_messages or history.tokens > self.token_budget:
+            history.popleft()
+            self.trimmed += 1
+        return content
+
+    def append(self, channel_id: int, role: str, content: str):
+        """Add a message to a channel (persisted by the backend in the background)"""
+        history = self._touch(channel_id)
+        if history is None and self._known_empty(channel_id):
+            history = self._install(channel_id, [])
+        if history is not None:
+            content = self._add(history, role, content)
+        else:
+            # Not resident: stored by the backend only, the next get() loads it with the rest
+            content = self._clip(content)
+            self._written(channel_id)
+        self.backend.append(channel_id, role, content)
+
+    def reset(self, channel_id: int):
+        """Forget a channel's history"""
+        self._channels.pop(channel_id, None)
+        self._mark_empty(channel_id)
+        self._written(channel_id)
+        self.backend.reset(channel_id)
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self._channels
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def stats(self) -> dict:
+        """Memory usage and eviction counters"""
+        self._expire(time.monotonic())
+        return {
+            'channels': len(self._channels),
+            'loads': self.loads,
+            'messages': sum(len(h.entries) for h in self._channels.values()),
+            'tokens': sum(h.tokens for h in self._channels.values()),
+            'bytes': sum(h.bytes for h in self._channels.values()),
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'trimmed': self.trimmed,
+        }
@@ -0,0 +1,193 @@
+"""
+Metrics - counter, gauge dan histogram dalam format teks Prometheus, lewat endpoint aiohttp
+"""
+
+import logging
+from bisect import bisect_left
+
+from aiohttp import web
+
+import config
+
+logger = logging.getLogger('DiscordAI')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds: from a cache hit (~1ms) to a slow completion (~30s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _value(value) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """One metric family; values keyed by a tuple of label values"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: tuple = (), collect=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        # collect() -> {label values: value} (or a bare value without labels), read on scrape
+        self.collect = collect
+        self._values = {}
+
+    def samples(self) -> dict:
+        if self.collect is None:
+            return self._values
+        values = self.collect()
+        return values if isinstance(values, dict) else {(): values}
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for label_values, value in self.samples().items():
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, *label_values):
+        self._values[label_values] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values):
+        series = self._values.get(label_values)
+        if series is None:
+            # Per-bucket counts (made cumulative on scrape), sum, count
+            series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for label_values, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket
+                le = f'le="{_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Every metric of the process, rendered in the Prometheus text format"""
+
+    def __init__(self, prefix: str = 'discord_ai_'):
+        self.prefix = prefix
+        self.metrics = []
+
+    def _add(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = (), collect=None) -> Counter:
+        return self._add(Counter(self.prefix + name, help, labels, collect))
+
+    def gauge(self, name: str, help: str, labels: tuple = (), collect=None) -> Gauge:
+        return self._add(Gauge(self.prefix + name, help, labels, collect))
+
+    def histogram(self, name: str, help: str, labels: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(self.prefix + name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # One broken collector must not hide every other metric
+                logger.warning(f"⚠️ Metric {metric.name} failed: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+class RateLimitLogCounter(logging.Handler):
+    """Counts the 429 responses discord.py reports (it logs them, there is no event)"""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.counts = {'route': 0, 'global': 0}
+
+    def emit(self, record: logging.LogRecord):
+        message = str(record.msg)
+        if 'Global rate limit' in message:
+            # Logged right after the "responded with 429" line of the same
+            # response, which was counted as a route limit: it was global
+            self.counts['route'] -= 1
+            self.counts['global'] += 1
+        elif 'responded with 429' in message:
+            self.counts['route'] += 1
+
+    def install(self, logger_name: str = 'discord.http'):
+        source = logging.getLogger(logger_name)
+        # The 429 warnings must reach this handler whatever LOG_LEVEL is; the
+        # log output still filters them by its own handler level
+        if source.getEffectiveLevel() > logging.WARNING:
+            source.setLevel(logging.WARNING)
+        source.addHandler(self)
+        return self
+
+
+class MetricsServer:
+    """GET /metrics on a small aiohttp server running on the bot's event loop"""
+
+    def __init__(self, registry: MetricsRegistry, host: str = None, port: int = None):
+        self.registry = registry
+        self.host = host or config.METRICS_HOST
+        self.port = port or config.METRICS_PORT
+        self.app = web.Application()
+        self.app.router.add_get('/metrics', self.handle)
+        self._runner = None
+        self.scrapes = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.scrapes += 1
+        return web.Response(body=self.registry.render().encode(),
+                            headers={'Content-Type': CONTENT_TYPE})
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"📈 Metrics on http://{self.host}:{self.port}/metrics")
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,214 @@
+"""
+Model router - pilih model tercepat yang sehat, fail over ke model berikutnya
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+import config
+from scheduler import QueueFullError
+
+logger = logging.getLogger('DiscordAI')
+
+
+class ModelStats:
+    """Rolling latency/error window of one model plus a consecutive-failure breaker"""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)  # (latency, ok)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.calls = 0
+        self.failures = 0
+
+    def record(self, latency: float, ok: bool, threshold: int, cooldown: float, now: float):
+        self.samples.append((latency, ok))
+        self.calls += 1
+        if ok:
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= threshold:
+            # Stays open until the cooldown passes; one more failure re-opens it
+            self.open_until = now + cooldown
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.open_until
+
+    def latency(self) -> float:
+        """Median latency of the successful calls in the window (None if unknown)"""
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        return latencies[len(latencies) // 2] if latencies else None
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+
+def parse_tier(value: str, models: dict) -> list:
+    """Resolve 'groq,openai' (aliases or model ids) into model ids"""
+    tier = []
+    for name in filter(None, (part.strip() for part in value.split(','))):
+        model = models.get(name.lower(), name)
+        if model not in tier:
+            tier.append(model)
+    return tier
+
+
+class ModelRouter:
+    """Route each request to the fastest healthy model, with per-guild/channel overrides"""
+
+    def __init__(self, models: dict, tier: list = None, window: int = None,
+                 failure_threshold: int = None, cooldown: float = None):
+        self.models = models
+        self.tier = tier or parse_tier(config.MODEL_TIER, models)
+        self.window = window or config.ROUTER_WINDOW
+        self.failure_threshold = failure_threshold or config.ROUTER_FAILURE_THRESHOLD
+        self.cooldown = config.ROUTER_COOLDOWN if cooldown is None else cooldown
+
+        self.stats = {}
+        self.guild_overrides = {}    # guild_id -> model
+        self.channel_overrides = {}  # channel_id -> model
+        self.failovers = 0
+        self.hooks = []              # hook(model, latency, ok) after every upstream attempt
+
+    @property
+    def default_model(self) -> str:
+        return self.tier[0]
+
+    def model_stats(self, model: str) -> ModelStats:
+        stats = self.stats.get(model)
+        if stats is None:
+            stats = self.stats[model] = ModelStats(self.window)
+        return stats
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def set_override(self, model: str, guild_id: int = None, channel_id: int = None):
+        """Pin a model for a channel (or a whole guild); model=None goes back to auto"""
+        overrides, key = (self.channel_overrides, channel_id) if channel_id is not None \
+            else (self.guild_overrides, guild_id)
+        if model is None:
+            overrides.pop(key, None)
+        else:
+            overrides[key] = model
+
+    def preference(self, guild_id: int = None, channel_id: int = None) -> str:
+        """The pinned model for this channel/guild, None when routed automatically"""
+        model = self.channel_overrides.get(channel_id)
+        if model is None:
+            model = self.guild_overrides.get(guild_id)
+        return model
+
+    def _score(self, model: str, now: float) -> tuple:
+        stats = self.model_stats(model)
+        latency = stats.latency()
+        if latency is None:
+            # Never tried: go first to get a sample; only ever failed: go last
+            speed = float('inf') if stats.samples else 0.0
+        else:
+            # Errors inflate the latency of an otherwise fast model
+            speed = latency / max(0.05, 1.0 - stats.error_rate())
+        return (not stats.healthy(now), speed)
+
+    def candidates(self, guild_id: int = None, channel_id: int = None) -> list:
+        """Models to try in order: the pinned one first, then the tier by health and speed"""
+        now = time.monotonic()
+        ranked = sorted(self.tier, key=lambda model: self._score(model, now))
+        pinned = self.preference(guild_id, channel_id)
+        if pinned is None:
+            return ranked
+        return [pinned] + [model for model in ranked if model != pinned]
+
+    def alternate(self, model: str) -> str:
+        """The best healthy tier model other than model (None if there is none)"""
+        now = time.monotonic()
+        for candidate in sorted(self.tier, key=lambda m: self._score(m, now)):
+            if candidate != model and self.model_stats(candidate).healthy(now):
+                return candidate
+        return None
+
+    def record(self, model: str, latency: float, ok: bool):
+        now = time.monotonic()
+        stats = self.model_stats(model)
+        was_healthy = stats.healthy(now)
+        stats.record(latency, ok, self.failure_threshold, self.cooldown, now)
+        for hook in self.hooks:
+            hook(model, latency, ok)
+        if was_healthy and not stats.healthy(now):
+            logger.warning(f"🩺 Model {model} marked unhealthy for {self.cooldown:g}s "
+                           f"({stats.consecutive_failures} failures in a row)")
+
+    def _failover(self, model: str, error: Exception, last: bool) -> bool:
+        """Record a failed attempt; True when the next candidate should be tried"""
+        if last or isinstance(error, QueueFullError):
+            return False
+        self.failovers += 1
+        logger.warning(f"🔀 Model {model} failed ({error.__class__.__name__}), failing over")
+        return True
+
+    async def run(self, candidates: list, call) -> tuple:
+        """Await call(model, last) on each candidate until one succeeds: (model, result)"""
+        for index, model in enumerate(candidates):
+            last = index == len(candidates) - 1
+            started = time.monotonic()
+            try:
+                result = await call(model, last)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not isinstance(e, QueueFullError):
+                    self.record(model, time.monotonic() - started, ok=False)
+                if not self._failover(model, e, last):
+                    raise
+                continue
+            self.record(model, time.monotonic() - started, ok=True)
+            return model, result
+
+    async def stream(self, candidates: list, open_stream):
+        """Yield (model, token) from open_stream(model, last), failing over until the first token"""
+        for index, model in enumerate(candidates):
+            last = index == len(candidates) - 1
+            started = time.monotonic()
+            streamed = False
+            try:
+                async for token in open_stream(model, last):
+                    if not streamed:
+                        # Time to first token is what a user waits on
+                        streamed = True
+                        self.record(model, time.monotonic() - started, ok=True)
+                    yield model, token
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if streamed:
+                    raise
+                if not isinstance(e, QueueFullError):
+                    self.record(model, time.monotonic() - started, ok=False)
+                if not self._failover(model, e, last):
+                    raise
+                continue
+            if not streamed:
+                self.record(model, time.monotonic() - started, ok=True)
+            return
+
+    def snapshot(self) -> dict:
+        """Per-model health, median latency and error rate"""
+        now = time.monotonic()
+        result = {}
+        for model in dict.fromkeys(self.tier + list(self.stats)):
+            stats = self.model_stats(model)
+            result[model] = {
+                'healthy': stats.healthy(now),
+                'latency': stats.latency(),
+                'error_rate': stats.error_rate(),
+                'calls': stats.calls,
+                'failures': stats.failures,
+            }
+        return result
@@ -0,0 +1,102 @@
+"""
+Request pipeline - satu jalur untuk semua pertanyaan AI:
+parse → rate-limit → queue → cache → route → generate → render → send
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger('DiscordAI')
+
+STAGES = ('parse', 'rate_limit', 'queue', 'cache', 'route', 'generate', 'render', 'send')
+
+
+class AIRequest:
+    """One question as it moves through the pipeline"""
+
+    def __init__(self, message_id: int, channel, author, guild_id: int, content: str,
+                 source: str, reply, parse):
+        self.message_id = message_id
+        self.channel = channel
+        self.channel_id = channel.id
+        self.author = author
+        self.guild_id = guild_id
+        self.content = content
+        self.source = source      # entry point: 'mention', 'ask', ...
+        self.reply = reply        # coroutine: reply(embed=...) -> discord.Message
+        self.parse = parse        # parse(content) -> question, None if there is none
+
+        self.question = None
+        self.deadline = None
+        self.context = None       # channel history once it is this request's turn
+        self.priority = None
+        self.cache_model = None
+        self.candidates = None
+        self.model = None
+        self.answer = None
+        self.cached = False
+        self.timed_out = False
+        self.timings = {}         # stage -> seconds (summed over restarts)
+        self.trace = None         # tracing.Trace when this request is recorded
+
+
+class StageStats:
+    """Aggregate per-stage timings (a pipeline hook)"""
+
+    def __init__(self):
+        self.count = dict.fromkeys(STAGES, 0)
+        self.total = dict.fromkeys(STAGES, 0.0)
+        self.max = dict.fromkeys(STAGES, 0.0)
+
+    def record(self, request: AIRequest, stage: str, seconds: float):
+        self.count[stage] += 1
+        self.total[stage] += seconds
+        if seconds > self.max[stage]:
+            self.max[stage] = seconds
+
+    def averages(self) -> dict:
+        return {stage: self.total[stage] / self.count[stage]
+                for stage in STAGES if self.count[stage]}
+
+
+class Pipeline:
+    """Stage timing hooks plus the at-most-once guarantee per Discord message"""
+
+    def __init__(self, remember: int = 4096):
+        self.hooks = []          # hook(request, stage, seconds)
+        self.remember = remember
+        self._claimed = OrderedDict()
+        self.requests = 0
+        self.duplicates = 0
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def claim(self, message_id: int) -> bool:
+        """True the first time a message enters the pipeline, False on any repeat"""
+        if message_id in self._claimed:
+            self.duplicates += 1
+            return False
+        self._claimed[message_id] = None
+        if len(self._claimed) > self.remember:
+            self._claimed.popitem(last=False)
+        self.requests += 1
+        return True
+
+    @contextmanager
+    def stage(self, request: AIRequest, name: str):
+        """Time one stage of a request (a span when traced) and report it to every hook"""
+        started = time.perf_counter()
+        try:
+            with request.trace.span(name) if request.trace is not None else nullcontext():
+                yield
+        finally:
+            seconds = time.perf_counter() - started
+            request.timings[name] = request.timings.get(name, 0.0) + seconds
+            for hook in self.hooks:
+                try:
+                    hook(request, name, seconds)
+                except Exception as e:
+                    logger.warning(f"⚠️ Pipeline hook failed: {e}")
@@ -0,0 +1,36 @@
+"""
+Message pre-filter - tolak pesan yang bukan untuk bot sebelum parsing command
+"""
+
+
+class MessagePrefilter:
+    """Cheap first look at every gateway message: is it addressed to the bot at all?"""
+
+    __slots__ = ('prefix', 'seen', 'passed')
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.seen = 0
+        self.passed = 0
+
+    def relevant(self, content: str, mentions: list, bot_id: int) -> bool:
+        """True if the message may be a command or a mention of the bot"""
+        self.seen += 1
+        # Command prefix: a single startswith on the first bytes
+        if content.startswith(self.prefix):
+            self.passed += 1
+            return True
+        # Mentions arrive as already-parsed users (this also covers reply
+        # pings, which are not in the text); nearly always an empty list
+        for user in mentions:
+            if user.id == bot_id:
+                self.passed += 1
+                return True
+        return False
+
+    def stats(self) -> dict:
+        return {
+            'seen': self.seen,
+            'passed': self.passed,
+            'dropped': self.seen - self.passed,
+        }
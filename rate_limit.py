@@ -0,0 +1,136 @@
+"""
+Rate limiting - GCRA (token bucket) per user, channel dan guild
+"""
+
+import asyncio
+import logging
+import time
+
+import config
+
+logger = logging.getLogger('DiscordAI')
+
+
+class GCRALimiter:
+    """Generic cell rate algorithm: O(1) time and one float per key"""
+
+    def __init__(self, limit: int, period: float, burst: int = None):
+        self.emission = period / limit                   # spacing between requests
+        self.tolerance = self.emission * ((burst or limit) - 1)
+        self._tat = {}                                   # key -> theoretical arrival time
+
+    def retry_after(self, key, now: float) -> float:
+        """Seconds until key may make a request (0 if allowed now)"""
+        tat = self._tat.get(key, now)
+        wait = tat - self.tolerance - now
+        return wait if wait > 0 else 0.0
+
+    def consume(self, key, now: float):
+        """Record one request for key"""
+        tat = self._tat.get(key, now)
+        self._tat[key] = (tat if tat > now else now) + self.emission
+
+    def sweep(self, now: float) -> int:
+        """Forget keys whose bucket is full again (same as never seen)"""
+        before = len(self._tat)
+        # Rebuild rather than delete in place: dicts never shrink their table
+        self._tat = {key: tat for key, tat in self._tat.items() if tat > now}
+        return before - len(self._tat)
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+
+class RateLimiter:
+    """Combined per-user, per-channel and per-guild limits"""
+
+    def __init__(self, user_per_minute: int = None, cooldown: float = None,
+                 channel_per_minute: int = None, guild_per_minute: int = None,
+                 sweep_interval: float = None):
+        user_per_minute = user_per_minute or config.MAX_REQUESTS_PER_MINUTE
+        cooldown = config.COOLDOWN_SECONDS if cooldown is None else cooldown
+        channel_per_minute = channel_per_minute or config.CHANNEL_REQUESTS_PER_MINUTE
+        guild_per_minute = guild_per_minute or config.GUILD_REQUESTS_PER_MINUTE
+        self.sweep_interval = sweep_interval or config.RATE_LIMIT_SWEEP_INTERVAL
+
+        self.scopes = {
+            'user': GCRALimiter(user_per_minute, 60),
+            'channel': GCRALimiter(channel_per_minute, 60),
+            'guild': GCRALimiter(guild_per_minute, 60),
+        }
+        if cooldown:
+            # Minimum spacing between two requests of the same user
+            self.scopes['cooldown'] = GCRALimiter(1, cooldown, burst=1)
+        # Checked cheapest-to-fail first; each entry is (scope, limiter, key index)
+        self._checks = tuple(
+            (scope, self.scopes[scope], index)
+            for scope, index in (('cooldown', 0), ('user', 0), ('channel', 1), ('guild', 2))
+            if scope in self.scopes
+        )
+
+        self.allowed = 0
+        self.rejected = {'cooldown': 0, 'user': 0, 'channel': 0, 'guild': 0}
+        self.swept = 0
+        self._task = None
+
+    def hit(self, user_id: int, channel_id: int = None, guild_id: int = None,
+            now: float = None) -> tuple:
+        """Try to admit one request; returns (retry_after, scope) - (0, None) if allowed"""
+        if now is None:
+            now = time.monotonic()
+
+        keys = (user_id, channel_id, guild_id)
+
+        # Check every scope before consuming any, so a denial costs nothing
+        for scope, limiter, index in self._checks:
+            key = keys[index]
+            if key is not None:
+                wait = limiter.retry_after(key, now)
+                if wait:
+                    self.rejected[scope] += 1
+                    return wait, scope
+
+        for _, limiter, index in self._checks:
+            key = keys[index]
+            if key is not None:
+                limiter.consume(key, now)
+        self.allowed += 1
+        return 0.0, None
+
+    def sweep(self, now: float = None) -> int:
+        """Drop idle keys from every scope"""
+        if now is None:
+            now = time.monotonic()
+        removed = sum(limiter.sweep(now) for limiter in self.scopes.values())
+        self.swept += removed
+        return removed
+
+    def start(self):
+        """Start periodic sweeping (called from the running event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            removed = self.sweep()
+            if removed:
+                logger.debug(f"🧹 Rate limiter swept {removed} idle keys")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Tracked keys and admission counters"""
+        return {
+            'keys': {scope: len(limiter) for scope, limiter in self.scopes.items()},
+            'allowed': self.allowed,
+            'rejected': dict(self.rejected),
+            'swept': self.swept,
+        }
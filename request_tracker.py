@@ -0,0 +1,97 @@
+"""
+Request tracker - batalkan/ulang jawaban AI kalau pertanyaannya dihapus atau diedit
+"""
+
+import asyncio
+import logging
+
+logger = logging.getLogger('DiscordAI')
+
+# Why a tracked task was cancelled by us (None = cancelled from outside)
+_DELETED = 'deleted'
+_EDITED = 'edited'
+
+
+class TrackedRequest:
+    """One question being answered, keyed by the Discord message that asked it"""
+
+    __slots__ = ('message_id', 'question', 'parse', 'task', 'reason')
+
+    def __init__(self, message_id: int, question: str, parse):
+        self.message_id = message_id
+        self.question = question
+        self.parse = parse    # parse(new content) -> question, None if no longer a question
+        self.task = None
+        self.reason = None
+
+
+class RequestTracker:
+    """In-flight AI requests by source message id"""
+
+    def __init__(self):
+        self._requests = {}
+        self.cancelled = 0
+        self.restarted = 0
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+    async def run(self, message_id: int, question: str, parse, start):
+        """
+        Await start(question), restarting it when the message is edited.
+
+        Returns None when the message was deleted (or edited into something
+        that is no longer a question) before the answer was ready.
+        """
+        request = TrackedRequest(message_id, question, parse)
+        self._requests[message_id] = request
+        try:
+            while True:
+                request.task = asyncio.ensure_future(start(request.question))
+                try:
+                    return await request.task
+                except asyncio.CancelledError:
+                    if request.reason is None:
+                        raise
+                    if request.reason == _DELETED:
+                        return None
+                    request.reason = None
+        finally:
+            if self._requests.get(message_id) is request:
+                del self._requests[message_id]
+
+    def cancel(self, message_id: int) -> bool:
+        """The source message was deleted: stop answering it"""
+        request = self._requests.pop(message_id, None)
+        if request is None or request.task is None or request.task.done():
+            return False
+        request.reason = _DELETED
+        request.task.cancel()
+        self.cancelled += 1
+        logger.info(f"🗑️ Question {message_id} deleted, AI request cancelled")
+        return True
+
+    def edit(self, message_id: int, content: str) -> bool:
+        """The source message was edited: re-ask with the new text if it changed"""
+        request = self._requests.get(message_id)
+        if request is None or content is None or request.task is None or request.task.done():
+            return False
+        question = request.parse(content)
+        if question == request.question:
+            # Embed unfurls and duplicate (raw + cached) events change nothing
+            return False
+        if not question:
+            return self.cancel(message_id)
+        request.question = question
+        request.reason = _EDITED
+        request.task.cancel()
+        self.restarted += 1
+        logger.info(f"✏️ Question {message_id} edited, AI request restarted")
+        return True
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': len(self._requests),
+            'cancelled': self.cancelled,
+            'restarted': self.restarted,
+        }
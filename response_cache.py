@@ -0,0 +1,253 @@
+"""
+Response cache - jawaban AI untuk pertanyaan yang sama (atau mirip) tidak perlu ke Groq lagi
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+import config
+from memory import estimate_tokens
+
+logger = logging.getLogger('DiscordAI')
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = re.compile(r'[\s?!.,;:]+$')
+
+
+def normalize_prompt(text: str) -> str:
+    """Normalize a question so trivial variations share a cache key"""
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = _WHITESPACE.sub(' ', text).strip()
+    return _TRAILING_PUNCTUATION.sub('', text)
+
+
+def context_hash(context: list) -> str:
+    """Hash the part of the conversation that may change the answer"""
+    # By default everything the model sees (MAX_HISTORY): a follow-up only
+    # matches the same question asked after the same conversation
+    relevant = context[-config.CACHE_CONTEXT_MESSAGES:] if config.CACHE_CONTEXT_MESSAGES else []
+    payload = json.dumps(relevant, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def embed_text(text: str) -> dict:
+    """Local sparse embedding: L2-normalized hashed character trigrams"""
+    padded = f" {text} "
+    vector = {}
+    for i in range(len(padded) - 2):
+        bucket = zlib.crc32(padded[i:i + 3].encode('utf-8')) & 0xFFFFF
+        vector[bucket] = vector.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {k: v / norm for k, v in vector.items()}
+
+
+def cosine(a: dict, b: dict) -> float:
+    """Cosine similarity of two normalized sparse vectors"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class CacheEntry:
+    """One cached answer"""
+
+    __slots__ = ('answer', 'created', 'latency', 'tokens', 'bucket', 'embedding')
+
+    def __init__(self, answer: str, created: float, latency: float, tokens: int,
+                 bucket: str, embedding: dict = None):
+        self.answer = answer
+        self.created = created
+        self.latency = latency      # upstream time this answer originally cost
+        self.tokens = tokens        # estimated tokens it originally cost
+        self.bucket = bucket        # model + context hash, scope of near-duplicate search
+        self.embedding = embedding
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) cache of AI answers"""
+
+    def __init__(self, max_entries: int = None, ttl: float = None, path: str = None,
+                 semantic: bool = None, threshold: float = None):
+        self.max_entries = max_entries or config.CACHE_MAX_ENTRIES
+        self.ttl = config.CACHE_TTL if ttl is None else ttl
+        self.path = config.CACHE_DB_PATH if path is None else path
+        self.semantic = config.CACHE_SEMANTIC if semantic is None else semantic
+        self.threshold = threshold or config.CACHE_SEMANTIC_THRESHOLD
+
+        self._entries = OrderedDict()  # key -> CacheEntry
+        self._db = None
+        self._lock = threading.Lock()
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            with self._lock:
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    " key TEXT PRIMARY KEY,"
+                    " bucket TEXT NOT NULL,"
+                    " prompt TEXT NOT NULL,"
+                    " answer TEXT NOT NULL,"
+                    " created REAL NOT NULL,"
+                    " latency REAL NOT NULL,"
+                    " tokens INTEGER NOT NULL)"
+                )
+                self._db.commit()
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.hits_semantic = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+        self._puts = 0
+
+    @staticmethod
+    def make_key(prompt: str, bucket: str) -> str:
+        """Cache key for a normalized prompt within a model/context bucket"""
+        return hashlib.sha256(f"{bucket}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return bool(self.ttl) and now - created > self.ttl
+
+    def _remember(self, key: str, entry: CacheEntry, prompt: str):
+        """Insert into the memory tier, evicting the least recently used"""
+        if self.semantic and entry.embedding is None:
+            entry.embedding = embed_text(prompt)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _hit(self, entry: CacheEntry) -> str:
+        self.saved_seconds += entry.latency
+        self.saved_tokens += entry.tokens
+        return entry.answer
+
+    async def get(self, question: str, model: str, context: list) -> str:
+        """Look up an answer; returns None on a miss"""
+        prompt = normalize_prompt(question)
+        if len(prompt) < config.CACHE_MIN_CHARS:
+            return None
+
+        bucket = f"{model}:{context_hash(context)}"
+        key = self.make_key(prompt, bucket)
+        now = time.time()
+
+        # Tier 1: memory
+        entry = self._entries.get(key)
+        if entry is not None:
+            if not self._expired(entry.created, now):
+                self._entries.move_to_end(key)
+                self.hits_memory += 1
+                return self._hit(entry)
+            del self._entries[key]
+
+        # Tier 2: disk
+        if self._db is not None:
+            row = await asyncio.to_thread(self._load, key)
+            if row is not None and not self._expired(row[1], now):
+                entry = CacheEntry(row[0], row[1], row[2], row[3], bucket)
+                self._remember(key, entry, prompt)
+                self.hits_disk += 1
+                return self._hit(entry)
+
+        # Tier 3: near-duplicate question in the same bucket
+        if self.semantic:
+            query = embed_text(prompt)
+            best, best_score = None, self.threshold
+            for candidate in self._entries.values():
+                if candidate.bucket != bucket or self._expired(candidate.created, now):
+                    continue
+                score = cosine(query, candidate.embedding)
+                if score >= best_score:
+                    best, best_score = candidate, score
+            if best is not None:
+                self.hits_semantic += 1
+                return self._hit(best)
+
+        self.misses += 1
+        return None
+
+    async def put(self, question: str, model: str, context: list, answer: str, latency: float):
+        """Store an answer fetched from upstream"""
+        prompt = normalize_prompt(question)
+        if len(prompt) < config.CACHE_MIN_CHARS or not answer:
+            return
+
+        bucket = f"{model}:{context_hash(context)}"
+        key = self.make_key(prompt, bucket)
+        tokens = sum(estimate_tokens(m["content"]) for m in context) + \
+            estimate_tokens(question) + estimate_tokens(answer)
+        entry = CacheEntry(answer, time.time(), latency, tokens, bucket)
+        self._remember(key, entry, prompt)
+
+        if self._db is not None:
+            self._puts += 1
+            prune = self._puts % 100 == 0
+            await asyncio.to_thread(self._store, key, prompt, entry, prune)
+
+    def _load(self, key: str):
+        with self._lock:
+            return self._db.execute(
+                "SELECT answer, created, latency, tokens FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _store(self, key: str, prompt: str, entry: CacheEntry, prune: bool):
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, entry.bucket, prompt, entry.answer, entry.created, entry.latency, entry.tokens)
+                )
+                if prune and self.ttl:
+                    self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+
+    def clear(self):
+        """Drop the memory tier (the disk tier expires by TTL)"""
+        self._entries.clear()
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+    @property
+    def hits(self) -> int:
+        return self.hits_memory + self.hits_disk + self.hits_semantic
+
+    def stats(self) -> dict:
+        """Hit/miss counters and what the hits saved"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'hits_memory': self.hits_memory,
+            'hits_disk': self.hits_disk,
+            'hits_semantic': self.hits_semantic,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'saved_seconds': self.saved_seconds,
+            'saved_tokens': self.saved_tokens,
+        }
+
+
+def create_response_cache() -> ResponseCache:
+    """Create the configured response cache (None when disabled)"""
+    if not config.RESPONSE_CACHE:
+        return None
+    return ResponseCache()
@@ -0,0 +1,349 @@
+"""
+Upstream scheduler - batasi request ke Groq sesuai kuota (x-ratelimit-*) dan adil per guild
+"""
+
+import asyncio
+import heapq
+import logging
+import random
+import re
+import time
+from collections import deque
+
+import config
+from ai_client import is_retryable_error
+
+logger = logging.getLogger('DiscordAI')
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+
+
+def parse_duration(value: str) -> float:
+    """Parse Groq reset durations like '2m59.56s', '7.66s' or '350ms' into seconds"""
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in _DURATION_PART.findall(value))
+
+
+def _header_int(headers, name: str):
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ModelQuota:
+    """Live view of one model's remaining upstream requests/tokens"""
+
+    def __init__(self):
+        self.limit_requests = None
+        self.remaining_requests = None
+        self.requests_reset_at = 0.0
+        self.limit_tokens = None
+        self.remaining_tokens = None
+        self.tokens_reset_at = 0.0
+        self.blocked_until = 0.0
+
+    def update(self, headers, now: float = None):
+        """Refresh from x-ratelimit-* response headers"""
+        now = time.monotonic() if now is None else now
+        limit = _header_int(headers, 'x-ratelimit-limit-requests')
+        remaining = _header_int(headers, 'x-ratelimit-remaining-requests')
+        if remaining is not None:
+            self.limit_requests = limit or self.limit_requests
+            self.remaining_requests = remaining
+            self.requests_reset_at = now + parse_duration(headers.get('x-ratelimit-reset-requests'))
+
+        limit = _header_int(headers, 'x-ratelimit-limit-tokens')
+        remaining = _header_int(headers, 'x-ratelimit-remaining-tokens')
+        if remaining is not None:
+            self.limit_tokens = limit or self.limit_tokens
+            self.remaining_tokens = remaining
+            self.tokens_reset_at = now + parse_duration(headers.get('x-ratelimit-reset-tokens'))
+
+    def block(self, seconds: float, now: float = None):
+        """Stop dispatching to this model for a while (after a 429)"""
+        now = time.monotonic() if now is None else now
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def delay(self, tokens: int, now: float) -> float:
+        """Seconds until a request of ~tokens may be sent (0 = now)"""
+        if now >= self.requests_reset_at and self.limit_requests is not None:
+            self.remaining_requests = self.limit_requests
+        if now >= self.tokens_reset_at and self.limit_tokens is not None:
+            self.remaining_tokens = self.limit_tokens
+
+        waits = [self.blocked_until - now]
+        if self.remaining_requests is not None and self.remaining_requests <= 0:
+            waits.append(self.requests_reset_at - now)
+        if self.remaining_tokens is not None and self.remaining_tokens < tokens:
+            waits.append(self.tokens_reset_at - now)
+        return max(0.0, *waits)
+
+    def reserve(self, tokens: int):
+        """Count a dispatched request before its response headers arrive"""
+        if self.remaining_requests is not None:
+            self.remaining_requests -= 1
+        if self.remaining_tokens is not None:
+            self.remaining_tokens -= tokens
+
+
+# Priority classes: lower is served first within a guild and costs less fairness budget
+PRIORITY_ADMIN = 0
+PRIORITY_SHORT = 1
+PRIORITY_NORMAL = 2
+PRIORITY_COST = {PRIORITY_ADMIN: 0.25, PRIORITY_SHORT: 0.5, PRIORITY_NORMAL: 1.0}
+
+
+class QueueFullError(Exception):
+    """Raised when the AI request queue is at capacity"""
+
+
+def parse_guild_weights(value: str) -> dict:
+    """Parse 'guild_id:weight,guild_id:weight' into a dict"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        guild_id, weight = item.split(':')
+        weights[int(guild_id)] = float(weight)
+    return weights
+
+
+class _Job:
+    __slots__ = ('future', 'model', 'tokens', 'cost', 'enqueued')
+
+    def __init__(self, future, model: str, tokens: int, priority: int):
+        self.future = future
+        self.model = model
+        self.tokens = tokens
+        self.cost = tokens * PRIORITY_COST[priority]
+        self.enqueued = time.monotonic()
+
+
+class _GuildQueue:
+    """One guild's pending jobs, highest priority first"""
+
+    __slots__ = ('heap', 'weight', 'finish')
+
+    def __init__(self, weight: float):
+        self.heap = []       # (priority, seq, job)
+        self.weight = weight
+        self.finish = 0.0    # virtual finish time of the guild's last dispatched job
+
+    def head(self) -> _Job:
+        # Skip jobs whose waiter already gave up
+        while self.heap and self.heap[0][2].future.done():
+            heapq.heappop(self.heap)
+        return self.heap[0][2] if self.heap else None
+
+
+class UpstreamScheduler:
+    """Global concurrency + per-model quota gate with weighted fair queuing across guilds"""
+
+    def __init__(self, max_concurrency: int = None, max_retries: int = None,
+                 backoff_base: float = None, backoff_max: float = None,
+                 max_queue: int = None, max_queue_per_guild: int = None,
+                 guild_weights: dict = None):
+        # Waiting here is cheap; letting hundreds of requests queue inside
+        # httpcore's pool instead makes every release rescan all waiters.
+        self.max_concurrency = max_concurrency or config.HTTP_MAX_CONNECTIONS
+        self.max_retries = config.UPSTREAM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base or config.UPSTREAM_BACKOFF_BASE
+        self.backoff_max = backoff_max or config.UPSTREAM_BACKOFF_MAX
+        self.max_queue = max_queue or config.AI_QUEUE_MAX
+        self.max_queue_per_guild = max_queue_per_guild or config.AI_QUEUE_MAX_PER_GUILD
+        self.guild_weights = parse_guild_weights(config.GUILD_WEIGHTS) if guild_weights is None \
+            else guild_weights
+
+        self.quotas = {}
+        self._guilds = {}       # guild_id -> _GuildQueue (only while it has jobs)
+        self._queued = 0
+        self._guild_queued = {}
+        self._vtime = 0.0       # virtual time: start tag of the last dispatched job
+        self._seq = 0
+        self._in_flight = 0
+        self._timer = None
+
+        self.dispatched = 0
+        self.rejected = 0
+        self.retries = 0
+        self.throttled = 0  # 429s received from upstream
+        self._waits = deque(maxlen=256)
+
+    def quota(self, model: str) -> ModelQuota:
+        quota = self.quotas.get(model)
+        if quota is None:
+            quota = self.quotas[model] = ModelQuota()
+        return quota
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def _dequeued(self, guild_id):
+        self._queued -= 1
+        left = self._guild_queued[guild_id] - 1
+        if left:
+            self._guild_queued[guild_id] = left
+        else:
+            del self._guild_queued[guild_id]
+
+    async def acquire(self, guild_id, model: str, tokens: int,
+                      priority: int = PRIORITY_NORMAL, bounded: bool = True):
+        """Wait for an upstream slot; the caller must release() it"""
+        if bounded and (self._queued >= self.max_queue or
+                        self._guild_queued.get(guild_id, 0) >= self.max_queue_per_guild):
+            self.rejected += 1
+            raise QueueFullError(f"AI queue is full ({self._queued} waiting)")
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._guilds.get(guild_id)
+        if queue is None:
+            queue = self._guilds[guild_id] = _GuildQueue(self.guild_weights.get(guild_id, 1.0))
+        self._seq += 1
+        heapq.heappush(queue.heap, (priority, self._seq, _Job(future, model, tokens, priority)))
+        self._queued += 1
+        self._guild_queued[guild_id] = self._guild_queued.get(guild_id, 0) + 1
+
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: hand the slot back
+                self.release()
+            else:
+                future.cancel()
+                self._dequeued(guild_id)
+            raise
+
+    def release(self):
+        """Return an upstream slot"""
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant slots while concurrency and quota allow, smallest virtual finish time first"""
+        now = time.monotonic()
+        next_delay = None
+
+        while self._in_flight < self.max_concurrency and self._guilds:
+            best_guild, best_tag = None, None
+            for guild_id, queue in list(self._guilds.items()):
+                job = queue.head()
+                if job is None:
+                    del self._guilds[guild_id]
+                    continue
+
+                delay = self.quota(job.model).delay(job.tokens, now)
+                if delay > 0:
+                    next_delay = delay if next_delay is None else min(next_delay, delay)
+                    continue
+
+                tag = max(self._vtime, queue.finish) + job.cost / queue.weight
+                if best_tag is None or tag < best_tag:
+                    best_guild, best_tag = guild_id, tag
+
+            if best_tag is None:
+                break
+
+            queue = self._guilds[best_guild]
+            _, _, job = heapq.heappop(queue.heap)
+            self._vtime = max(self._vtime, queue.finish)
+            queue.finish = best_tag
+            if not queue.heap:
+                del self._guilds[best_guild]
+
+            self._dequeued(best_guild)
+            self.quota(job.model).reserve(job.tokens)
+            self._in_flight += 1
+            self.dispatched += 1
+            self._waits.append(now - job.enqueued)
+            job.future.set_result(None)
+
+        if next_delay is not None and self._guilds:
+            loop = asyncio.get_running_loop()
+            wake_at = loop.time() + next_delay
+            if self._timer is None or self._timer.when() > wake_at:
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._timer = loop.call_at(wake_at, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def run(self, guild_id, model: str, tokens: int, call, hold: bool = False,
+                  priority: int = PRIORITY_NORMAL, max_retries: int = None):
+        """
+        Call upstream with a scheduled slot, retrying transient failures.
+
+        call() must return a raw response (with .headers). With hold=True the
+        slot stays taken after success and the caller must release() it
+        (used while a stream is being read). Raises QueueFullError right away
+        when the queue is at capacity; retries are never rejected.
+        """
+        max_retries = self.max_retries if max_retries is None else max_retries
+        quota = self.quota(model)
+        for attempt in range(max_retries + 1):
+            await self.acquire(guild_id, model, tokens, priority, bounded=attempt == 0)
+            keep_slot = False
+            try:
+                raw = await call()
+                quota.update(raw.headers)
+                keep_slot = hold
+                return raw
+            except Exception as e:
+                if not is_retryable_error(e) or attempt == max_retries:
+                    raise
+                response = getattr(e, 'response', None)
+                if response is not None:
+                    quota.update(response.headers)
+                    if getattr(e, 'status_code', None) == 429:
+                        self.throttled += 1
+                        quota.block(parse_duration(response.headers.get('retry-after')) or
+                                    self.backoff_base)
+                delay = self._backoff(attempt)
+                self.retries += 1
+                logger.warning(f"⚠️ Upstream {model} failed ({e.__class__.__name__}), "
+                               f"retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            finally:
+                if not keep_slot:
+                    self.release()
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        """Queue, concurrency and per-model quota snapshot"""
+        waits = sorted(self._waits)
+        return {
+            'in_flight': self._in_flight,
+            'queued': self._queued,
+            'max_queue': self.max_queue,
+            'guilds_waiting': len(self._guild_queued),
+            'wait_avg': sum(waits) / len(waits) if waits else 0.0,
+            'wait_p95': waits[max(0, int(len(waits) * 0.95) - 1)] if waits else 0.0,
+            'dispatched': self.dispatched,
+            'rejected': self.rejected,
+            'retries': self.retries,
+            'throttled': self.throttled,
+            'models': {
+                model: {
+                    'remaining_requests': quota.remaining_requests,
+                    'remaining_tokens': quota.remaining_tokens,
+                }
+                for model, quota in self.quotas.items()
+            },
+        }
@@ -0,0 +1,244 @@
+"""
+Shared state - rate limit dan pilihan model yang berlaku untuk semua worker cluster
+"""
+
+import asyncio
+import json
+import logging
+import os
+
+import config
+from rate_limit import RateLimiter
+
+logger = logging.getLogger('DiscordAI')
+
+
+class LocalState:
+    """Global state kept in this process: a single worker, or the cluster's state server"""
+
+    # Operations a StateServer may run for its clients
+    OPERATIONS = ('hit', 'overrides', 'set_override', 'stats')
+
+    def __init__(self, rate_limiter: RateLimiter = None):
+        self.rate_limiter = rate_limiter or create_rate_limiter()
+        self.guild_overrides = {}    # guild_id -> model
+        self.channel_overrides = {}  # channel_id -> model
+
+    async def hit(self, user_id: int, channel_id: int = None, guild_id: int = None) -> tuple:
+        """Admit one request: (retry_after, scope), (0, None) if allowed"""
+        return self.rate_limiter.hit(user_id, channel_id, guild_id)
+
+    async def overrides(self, guild_id: int = None, channel_id: int = None) -> tuple:
+        """The models pinned for (guild, channel), None where routed automatically"""
+        return self.guild_overrides.get(guild_id), self.channel_overrides.get(channel_id)
+
+    async def set_override(self, model: str, guild_id: int = None, channel_id: int = None):
+        overrides, key = (self.channel_overrides, channel_id) if channel_id is not None \
+            else (self.guild_overrides, guild_id)
+        if model is None:
+            overrides.pop(key, None)
+        else:
+            overrides[key] = model
+
+    async def stats(self) -> dict:
+        return {
+            'backend': 'local',
+            'rate_limit': self.rate_limiter.stats(),
+            'overrides': len(self.guild_overrides) + len(self.channel_overrides),
+        }
+
+    def start(self):
+        """Start background work (called from the running event loop)"""
+        self.rate_limiter.start()
+
+    async def close(self):
+        await self.rate_limiter.close()
+
+
+class StateServer:
+    """Serves a LocalState to other processes over a Unix socket (JSON lines)"""
+
+    def __init__(self, state: LocalState, path: str = None):
+        self.state = state
+        self.path = path or config.STATE_SOCKET
+        self._server = None
+        self.requests = 0
+
+    async def start(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left over from a crashed launcher
+        self.state.start()
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        logger.info(f"🗄️ Shared state served on {self.path}")
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = json.loads(line)
+                response = {'id': request['id']}
+                try:
+                    if request['op'] not in LocalState.OPERATIONS:
+                        raise ValueError(f"unknown operation {request['op']!r}")
+                    response['result'] = await getattr(self.state, request['op'])(*request['args'])
+                except Exception as e:
+                    response['error'] = str(e)
+                self.requests += 1
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.state.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class SocketState:
+    """Client of a StateServer; falls back to local state while it is unreachable"""
+
+    def __init__(self, path: str = None, timeout: float = None, rate_limiter: RateLimiter = None):
+        self.path = path or config.STATE_SOCKET
+        self.timeout = timeout or config.STATE_TIMEOUT
+        # A host-wide limiter (shared memory) is checked here, without a round trip
+        self.rate_limiter = rate_limiter
+        self.fallback = LocalState(rate_limiter)
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._connecting = None
+        self._pending = {}  # request id -> future
+        self._next_id = 0
+        self.fallbacks = 0
+
+    async def _connect(self):
+        if self._writer is not None:
+            return
+        if self._connecting is None:
+            self._connecting = asyncio.ensure_future(asyncio.open_unix_connection(self.path))
+        connecting = self._connecting
+        try:
+            # Shielded: a caller timing out must not cancel the others' connect
+            reader, writer = await asyncio.shield(connecting)
+        finally:
+            if connecting.done() and self._connecting is connecting:
+                self._connecting = None
+        # Every caller gets the same connection; the first one to resume installs it
+        if self._writer is None and not writer.is_closing():
+            self._reader, self._writer = reader, writer
+            self._reader_task = asyncio.ensure_future(self._read_loop(reader))
+
+    async def _read_loop(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._pending.pop(response['id'], None)
+                if future is None or future.done():
+                    continue
+                if 'error' in response:
+                    future.set_exception(RuntimeError(response['error']))
+                else:
+                    future.set_result(response.get('result'))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._disconnect(ConnectionError("state server connection lost"))
+
+    def _disconnect(self, error: Exception):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def _call(self, op: str, *args):
+        self._next_id += 1
+        request_id = self._next_id
+        try:
+            await asyncio.wait_for(self._connect(), self.timeout)
+            if self._writer is None:
+                raise ConnectionError("state server connection lost")
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+            self._writer.write(json.dumps({'id': request_id, 'op': op, 'args': args}).encode() + b'\n')
+            return await asyncio.wait_for(future, self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            # Keep serving: limits and overrides are per process until it is back
+            self.fallbacks += 1
+            if self.fallbacks == 1 or self.fallbacks % 100 == 0:
+                logger.warning(f"⚠️ Shared state unavailable ({e!r}), using local state")
+            return await getattr(self.fallback, op)(*args)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def hit(self, user_id: int, channel_id: int = None, guild_id: int = None) -> tuple:
+        if self.rate_limiter is not None:
+            return self.rate_limiter.hit(user_id, channel_id, guild_id)
+        return tuple(await self._call('hit', user_id, channel_id, guild_id))
+
+    async def overrides(self, guild_id: int = None, channel_id: int = None) -> tuple:
+        return tuple(await self._call('overrides', guild_id, channel_id))
+
+    async def set_override(self, model: str, guild_id: int = None, channel_id: int = None):
+        await self._call('set_override', model, guild_id, channel_id)
+
+    async def stats(self) -> dict:
+        stats = dict(await self._call('stats'))
+        stats['backend'] = f"unix:{self.path}"
+        if self.rate_limiter is not None:
+            stats['rate_limit'] = self.rate_limiter.stats()
+        stats['fallbacks'] = self.fallbacks
+        return stats
+
+    def start(self):
+        self.fallback.start()
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        self._disconnect(ConnectionError("state client closed"))
+        await self.fallback.close()
+
+
+def create_rate_limiter(name: str = None):
+    """Build the rate limiter selected by RATE_LIMIT_BACKEND"""
+    name = (name or config.RATE_LIMIT_BACKEND).lower()
+    if name == 'memory':
+        return RateLimiter()
+    if name == 'shm':
+        from shm_store import SharedRateLimiter
+        return SharedRateLimiter()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {name}")
+
+
+def create_shared_state(name: str = None):
+    """Build the state backend selected by STATE_BACKEND"""
+    name = (name or config.STATE_BACKEND).lower()
+    if name == 'local':
+        return LocalState()
+    if name == 'unix':
+        shared_memory = config.RATE_LIMIT_BACKEND == 'shm'
+        return SocketState(rate_limiter=create_rate_limiter() if shared_memory else None)
+    raise ValueError(f"Unknown STATE_BACKEND: {name}")
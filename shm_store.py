@@ -0,0 +1,266 @@
+"""
+Shared memory store - rate limit dan counter bersama untuk semua proses bot di satu host
+"""
+
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import time
+
+import config
+
+logger = logging.getLogger('DiscordAI')
+
+MAGIC = b'DAIRL002'                     # 002: wall-clock TATs, slots-in-use counters
+HEADER = struct.Struct('<8sQQQ')        # magic, slots, stripes, counter rows
+ROW = struct.Struct('<q6Q')             # pid, allowed, 4 x rejected, overflows
+USED = struct.Struct('<4Q')             # slots holding a key of each scope (updated under USED_LOCK)
+SLOT = struct.Struct('<Q7xBd')          # key, scope tag (0 = never used), theoretical arrival time
+ROWS_OFFSET = HEADER.size
+SLOTS_OFFSET = mmap.PAGESIZE
+COUNTER_ROWS = (SLOTS_OFFSET - ROWS_OFFSET - USED.size) // ROW.size
+USED_OFFSET = SLOTS_OFFSET - USED.size
+PROBE = 8                               # slots searched for a key, within its stripe
+LOCK_BASE = 1 << 40                     # byte-range locks sit past the data, one byte per stripe
+INIT_LOCK = LOCK_BASE - 1
+USED_LOCK = LOCK_BASE - 2
+
+SCOPES = ('cooldown', 'user', 'channel', 'guild')
+_MIX = 0x9E3779B97F4A7C15
+_MASK = (1 << 64) - 1
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedRateLimiter:
+    """RateLimiter whose GCRA state lives in a memory-mapped file shared by every process
+
+    The file is a fixed hash table split into stripes, each guarded by a POSIX
+    byte-range lock, so processes only contend when they touch the same stripe.
+    Counters are one row per process: a single writer needs no lock.
+    """
+
+    def __init__(self, path: str = None, slots: int = None, stripes: int = None,
+                 user_per_minute: int = None, cooldown: float = None,
+                 channel_per_minute: int = None, guild_per_minute: int = None):
+        self.path = path or config.RATE_LIMIT_SHM_PATH
+        user_per_minute = user_per_minute or config.MAX_REQUESTS_PER_MINUTE
+        cooldown = config.COOLDOWN_SECONDS if cooldown is None else cooldown
+        channel_per_minute = channel_per_minute or config.CHANNEL_REQUESTS_PER_MINUTE
+        guild_per_minute = guild_per_minute or config.GUILD_REQUESTS_PER_MINUTE
+
+        # (scope, tag, key index, emission, tolerance), cheapest-to-fail first like RateLimiter
+        limits = {'user': (user_per_minute, 60.0), 'channel': (channel_per_minute, 60.0),
+                  'guild': (guild_per_minute, 60.0)}
+        if cooldown:
+            limits['cooldown'] = (1, cooldown)
+        checks = []
+        for tag, (scope, index) in enumerate(zip(SCOPES, (0, 0, 1, 2)), 1):
+            if scope in limits:
+                limit, period = limits[scope]
+                emission = period / limit
+                checks.append((scope, tag, index, emission, emission * (limit - 1)))
+        self._checks = tuple(checks)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock(INIT_LOCK)
+        try:
+            self.slots, self.stripes = self._open_table(slots or config.RATE_LIMIT_SHM_SLOTS,
+                                                        stripes or 256)
+            self._row = self._claim_row()
+        finally:
+            self._unlock(INIT_LOCK)
+        self.per_stripe = self.slots // self.stripes
+
+        # Counts of this process when every counter row is taken
+        self._local = [0] * (ROW.size // 8 - 1)
+        if self._row is None:
+            logger.warning(f"⚠️ All {COUNTER_ROWS} counter rows of {self.path} are taken, "
+                           f"this process' counts stay local")
+        logger.info(f"🧮 Shared rate limiter on {self.path} ({self.slots} slots, {self.stripes} stripes)")
+
+    def _lock(self, offset: int):
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, offset, os.SEEK_SET)
+
+    def _unlock(self, offset: int):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, offset, os.SEEK_SET)
+
+    def _open_table(self, slots: int, stripes: int) -> tuple:
+        """Map the table, creating it if this is the first process (under INIT_LOCK)"""
+        size = os.fstat(self._fd).st_size
+        if size >= SLOTS_OFFSET:
+            magic, slots_found, stripes_found, _ = HEADER.unpack(os.pread(self._fd, HEADER.size, 0))
+            if magic == MAGIC:
+                if slots_found != slots:
+                    # The first process decides; a different size would split the table
+                    logger.warning(f"⚠️ {self.path} has {slots_found} slots, using that "
+                                   f"instead of {slots}")
+                self._map = mmap.mmap(self._fd, SLOTS_OFFSET + slots_found * SLOT.size)
+                return slots_found, stripes_found
+        stripes = max(1, min(stripes, slots // PROBE))
+        slots = slots // stripes * stripes
+        os.ftruncate(self._fd, 0)  # zero every slot and counter
+        os.ftruncate(self._fd, SLOTS_OFFSET + slots * SLOT.size)
+        self._map = mmap.mmap(self._fd, SLOTS_OFFSET + slots * SLOT.size)
+        HEADER.pack_into(self._map, 0, MAGIC, slots, stripes, COUNTER_ROWS)
+        return slots, stripes
+
+    def _claim_row(self):
+        """A counter row for this process: a free one, or one of an exited process"""
+        pid = os.getpid()
+        for row in range(COUNTER_ROWS):
+            offset = ROWS_OFFSET + row * ROW.size
+            owner = struct.unpack_from('<q', self._map, offset)[0]
+            if owner == 0 or owner == pid or not _process_alive(owner):
+                # An exited process' counts are kept: the totals stay cumulative
+                struct.pack_into('<q', self._map, offset, pid)
+                return offset
+        return None
+
+    def _count(self, field: int):
+        if self._row is None:
+            self._local[field] += 1
+            return
+        offset = self._row + 8 + field * 8
+        value = struct.unpack_from('<Q', self._map, offset)[0]
+        struct.pack_into('<Q', self._map, offset, value + 1)
+
+    def _place(self, tag: int, key: int) -> tuple:
+        """(stripe, first slot of the probe window) for a scoped key"""
+        # High bits of a multiplicative hash; the scopes of one id share a
+        # stripe, so cooldown + user cost a single lock
+        mixed = (key * _MIX) & _MASK
+        return (mixed >> 40) % self.stripes, ((mixed >> 20) + tag) % self.per_stripe
+
+    def _find(self, stripe: int, start: int, tag: int, key: int):
+        """Slot offset holding the key, or None"""
+        base = SLOTS_OFFSET + stripe * self.per_stripe * SLOT.size
+        for probe in range(PROBE):
+            offset = base + (start + probe) % self.per_stripe * SLOT.size
+            slot_key, slot_tag, _ = SLOT.unpack_from(self._map, offset)
+            if slot_tag == 0:
+                return None  # slots are never emptied, so the key is not further on
+            if slot_tag == tag and slot_key == key:
+                return offset
+        return None
+
+    def _free(self, stripe: int, start: int, now: float) -> tuple:
+        """(slot offset, its scope tag, evicted) for a new key: unused or expired, else the one expiring first"""
+        base = SLOTS_OFFSET + stripe * self.per_stripe * SLOT.size
+        oldest, oldest_tag, oldest_tat = None, None, None
+        for probe in range(PROBE):
+            offset = base + (start + probe) % self.per_stripe * SLOT.size
+            _, slot_tag, tat = SLOT.unpack_from(self._map, offset)
+            if slot_tag == 0 or tat <= now:
+                # An expired bucket is full again: same as never seen
+                return offset, slot_tag, False
+            if oldest_tat is None or tat < oldest_tat:
+                oldest, oldest_tag, oldest_tat = offset, slot_tag, tat
+        return oldest, oldest_tag, True
+
+    def _move_used(self, old_tag: int, tag: int):
+        """A slot changes scope (or is used for the first time): keep the per-scope counts"""
+        self._lock(USED_LOCK)
+        try:
+            used = list(USED.unpack_from(self._map, USED_OFFSET))
+            if old_tag:
+                used[old_tag - 1] -= 1
+            used[tag - 1] += 1
+            USED.pack_into(self._map, USED_OFFSET, *used)
+        finally:
+            self._unlock(USED_LOCK)
+
+    def hit(self, user_id: int, channel_id: int = None, guild_id: int = None,
+            now: float = None) -> tuple:
+        """Try to admit one request; returns (retry_after, scope) - (0, None) if allowed"""
+        if now is None:
+            # Wall clock, not monotonic: the file can outlive a reboot (data/cache
+            # fallback), and a TAT from the previous boot must read as long past
+            now = time.time()
+
+        keys = (user_id, channel_id, guild_id)
+        entries = []
+        for scope, tag, index, emission, tolerance in self._checks:
+            key = keys[index]
+            if key is not None:
+                key &= _MASK
+                entries.append((scope, tag, key, emission, tolerance) + self._place(tag, key))
+
+        # Lock the stripes in a fixed order so two processes never wait on each other
+        stripes = sorted({entry[5] for entry in entries})
+        for stripe in stripes:
+            self._lock(LOCK_BASE + stripe)
+        try:
+            found = []
+            for scope, tag, key, emission, tolerance, stripe, start in entries:
+                offset = self._find(stripe, start, tag, key)
+                tat = SLOT.unpack_from(self._map, offset)[2] if offset is not None else now
+                wait = tat - tolerance - now
+                if wait > 0:
+                    self._count(tag)
+                    return wait, scope
+                found.append((offset, tat))
+
+            # Known keys first: once refreshed, an insert cannot take their (expired) slot
+            pending = sorted(zip(entries, found), key=lambda pair: pair[1][0] is None)
+            for (scope, tag, key, emission, tolerance, stripe, start), (offset, tat) in pending:
+                if offset is None:
+                    offset, old_tag, evicted = self._free(stripe, start, now)
+                    if evicted:
+                        # Probe window full of live buckets: the evicted key starts over
+                        self._count(5)
+                    if old_tag != tag:
+                        self._move_used(old_tag, tag)
+                SLOT.pack_into(self._map, offset, key, tag, (tat if tat > now else now) + emission)
+        finally:
+            for stripe in reversed(stripes):
+                self._unlock(LOCK_BASE + stripe)
+        self._count(0)
+        return 0.0, None
+
+    def sweep(self, now: float = None) -> int:
+        """Nothing to do: expired slots are reused in place"""
+        return 0
+
+    def start(self):
+        """No background work (kept for the RateLimiter interface)"""
+
+    async def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            os.close(self._fd)
+
+    def stats(self) -> dict:
+        """Keys held in the table and the admission counters of every process on this host"""
+        # Counted on insert: reading the slots themselves would scan the whole table
+        used = USED.unpack_from(self._map, USED_OFFSET)
+        keys = {scope: used[tag - 1] for scope, tag, *_ in self._checks}
+        totals = list(self._local)
+        processes = 0
+        for row in range(COUNTER_ROWS):
+            pid, *counts = ROW.unpack_from(self._map, ROWS_OFFSET + row * ROW.size)
+            if pid:
+                processes += _process_alive(pid)
+                totals = [total + count for total, count in zip(totals, counts)]
+        return {
+            'keys': keys,
+            'allowed': totals[0],
+            'rejected': dict(zip(SCOPES, totals[1:5])),
+            'swept': 0,
+            'evicted': totals[5],
+            'processes': processes,
+        }
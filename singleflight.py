@@ -0,0 +1,110 @@
+"""
+Single-flight - request identik yang sedang berjalan berbagi satu upstream call
+"""
+
+import asyncio
+import hashlib
+import json
+
+from response_cache import normalize_prompt
+
+
+def request_key(model: str, messages: list) -> str:
+    """Key identifying a request by model and normalized messages"""
+    normalized = [(m["role"], normalize_prompt(m["content"])) for m in messages]
+    payload = json.dumps([model, normalized], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Flight:
+    """One shared upstream call and the callers waiting on it"""
+
+    def __init__(self):
+        self.task = None
+        self.waiters = 0
+        self.tokens = []          # streamed chunks so far (stream flights)
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Event()
+
+    def publish(self, token: str = None):
+        if token is not None:
+            self.tokens.append(token)
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one"""
+
+    def __init__(self):
+        self._flights = {}
+        self.calls = 0       # upstream calls actually made
+        self.collapsed = 0   # callers served by someone else's call
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _join(self, key: str, start) -> _Flight:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(start(flight))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.calls += 1
+        else:
+            self.collapsed += 1
+        flight.waiters += 1
+        return flight
+
+    def _leave(self, key: str, flight: _Flight):
+        # The upstream call is cancelled only once nobody is waiting for it
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            self._forget(key, flight)
+            flight.task.cancel()
+
+    async def do(self, key: str, func):
+        """Run func() once for all concurrent callers with the same key"""
+        async def start(flight):
+            return await func()
+
+        flight = self._join(key, start)
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            self._leave(key, flight)
+
+    async def stream(self, key: str, func):
+        """Share one async token stream (func() -> async iterator) between callers"""
+        async def start(flight):
+            try:
+                async for token in func():
+                    flight.publish(token)
+            except Exception as e:
+                # Handed to every subscriber instead of left on the task
+                flight.error = e
+            finally:
+                flight.done = True
+                flight.publish()
+
+        flight = self._join(key, start)
+        try:
+            index = 0
+            while True:
+                changed = flight.changed
+                while index < len(flight.tokens):
+                    yield flight.tokens[index]
+                    index += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await changed.wait()
+        finally:
+            self._leave(key, flight)
@@ -0,0 +1,112 @@
+"""
+Streaming reply - tampilkan token AI secara bertahap lewat edit pesan
+"""
+
+import asyncio
+import logging
+import time
+
+import config
+
+logger = logging.getLogger('DiscordAI')
+
+
+class ChannelEditBudget:
+    """Space out message edits per channel so all streams share one budget"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_slot = {}
+
+    async def acquire(self, channel_id: int):
+        """Wait until this channel may be edited again"""
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot.get(channel_id, 0.0))
+        self._next_slot[channel_id] = slot + self.interval
+
+        # Drop channels whose budget has fully recovered
+        if len(self._next_slot) > 1024:
+            self._next_slot = {cid: t for cid, t in self._next_slot.items() if t > now}
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+edit_budget = ChannelEditBudget(config.STREAM_EDIT_INTERVAL)
+
+
+class StreamingReply:
+    """Post a placeholder after the first tokens, then edit it in place"""
+
+    def __init__(self, send, render, channel_id: int, budget: ChannelEditBudget = None,
+                 min_chars: int = None):
+        self.send = send          # coroutine: send(embed=...) -> discord.Message
+        self.render = render      # render(text, done) -> discord.Embed
+        self.channel_id = channel_id
+        self.budget = budget or edit_budget
+        self.min_chars = config.STREAM_MIN_CHARS if min_chars is None else min_chars
+
+        self.message = None
+        self.first_visible = None
+        self.edits = 0
+        self._parts = []
+        self._length = 0
+        self._started = time.perf_counter()
+        self._wake = asyncio.Event()
+        self._flusher = None
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._parts)
+
+    async def feed(self, token: str):
+        """Add a streamed token"""
+        self._parts.append(token)
+        self._length += len(token)
+
+        if self.message is not None:
+            self._wake.set()
+        elif self._length >= self.min_chars:
+            self.message = await self.send(embed=self.render(self.text, False))
+            self.first_visible = time.perf_counter() - self._started
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        """Coalesce pending tokens into at most one edit per budget slot"""
+        while True:
+            await self._wake.wait()
+            await self.budget.acquire(self.channel_id)
+            # Everything that arrived while waiting goes out in this one edit
+            self._wake.clear()
+            try:
+                await self.message.edit(embed=self.render(self.text, False))
+                self.edits += 1
+            except Exception as e:
+                logger.warning(f"⚠️ Streaming edit failed: {e}")
+
+    async def close(self):
+        """Stop the background edit loop"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+
+    async def finish(self) -> str:
+        """Render the final answer and return the full text"""
+        await self.close()
+
+        text = self.text
+        if self.message is None:
+            self.message = await self.send(embed=self.render(text, True))
+            self.first_visible = time.perf_counter() - self._started
+        else:
+            await self.budget.acquire(self.channel_id)
+            await self.message.edit(embed=self.render(text, True))
+            self.edits += 1
+
+        logger.info(f"⚡ Stream TTFT {self.first_visible * 1000:.0f}ms, "
+                    f"total {(time.perf_counter() - self._started) * 1000:.0f}ms, {self.edits} edits")
+        return text
@@ -0,0 +1,50 @@
+"""
+Test metrics - counter 429 Discord tetap jalan walau LOG_LEVEL lebih tinggi dari WARNING
+"""
+
+import logging
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import RateLimitLogCounter  # noqa: E402
+
+ROUTE_429 = 'We are being rate limited. %s %s responded with 429. Retrying in %.2f seconds.'
+GLOBAL_429 = 'Global rate limit has been hit. Retrying in %.2f seconds.'
+
+
+class RateLimitLogCounterTest(unittest.TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.source = logging.getLogger('discord.http')
+        self.saved = (self.root.level, self.source.level)
+        # What setup_logging() does with LOG_LEVEL=ERROR
+        self.root.setLevel(logging.ERROR)
+        self.source.setLevel(logging.NOTSET)
+        self.counter = RateLimitLogCounter().install()
+
+    def tearDown(self):
+        self.source.removeHandler(self.counter)
+        self.root.setLevel(self.saved[0])
+        self.source.setLevel(self.saved[1])
+
+    def test_counts_429_when_root_level_is_error(self):
+        self.source.warning(ROUTE_429, 'GET', '/channels/1/messages', 1.0)
+        self.assertEqual(self.counter.counts, {'route': 1, 'global': 0})
+
+    def test_global_429_is_counted_once(self):
+        self.source.warning(ROUTE_429, 'POST', '/channels/1/messages', 1.0)
+        self.source.warning(GLOBAL_429, 1.0)
+        self.assertEqual(self.counter.counts, {'route': 0, 'global': 1})
+
+    def test_does_not_raise_a_lower_level(self):
+        self.source.removeHandler(self.counter)
+        self.source.setLevel(logging.DEBUG)
+        self.counter = RateLimitLogCounter().install()
+        self.assertEqual(self.source.level, logging.DEBUG)
+
+
+if __name__ == '__main__':
+    unittest.main()
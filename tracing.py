@@ -0,0 +1,428 @@
+"""
+Tracing - span tree per request AI (antri, history, upstream, render, kirim),
+diekspor ke file JSONL dan/atau collector OTLP
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+
+import aiohttp
+from aiohttp import web
+
+import config
+
+logger = logging.getLogger('DiscordAI')
+
+# Innermost open span of the request being handled; tasks started for it inherit it
+current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """One timed step of a traced request"""
+
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'start', 'end', 'attributes', 'events', 'error')
+
+    def __init__(self, trace, name: str, parent_id: str = None, attributes: dict = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes or {}
+        self.events = []      # (time_ns, name, attributes)
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def event(self, name: str, **attributes):
+        self.events.append((time.time_ns(), name, attributes))
+
+    def finish(self, error: BaseException = None):
+        if self.end is not None:
+            return
+        self.end = time.time_ns()
+        if error is not None:
+            self.error = error.__class__.__name__ if isinstance(error, asyncio.CancelledError) \
+                else f"{error.__class__.__name__}: {error}"
+
+    @property
+    def duration(self) -> float:
+        """Seconds, up to now while still open"""
+        return ((self.end or time.time_ns()) - self.start) / 1e9
+
+    def to_dict(self, origin: int) -> dict:
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'offset_ms': round((self.start - origin) / 1e6, 3),
+            'duration_ms': round(self.duration * 1000, 3),
+            'attributes': self.attributes,
+            'events': [{'name': name, 'offset_ms': round((at - origin) / 1e6, 3), **attributes}
+                       for at, name, attributes in self.events],
+            'error': self.error,
+        }
+
+
+class Trace:
+    """The spans of one request"""
+
+    def __init__(self, sampled: bool):
+        self.trace_id = os.urandom(16).hex()
+        self.sampled = sampled
+        self.spans = []
+        self.root = None
+
+    def start_span(self, name: str, parent: Span = None, **attributes) -> Span:
+        span = Span(self, name, parent.span_id if parent is not None else None, attributes)
+        self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Child of the current span (the root outside any span); current inside the block"""
+        parent = current_span.get()
+        if parent is None or parent.trace is not self:
+            parent = self.root
+        span = self.start_span(name, parent, **attributes)
+        token = current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            current_span.reset(token)
+            span.finish(error)
+
+    def to_dict(self) -> dict:
+        root = self.root
+        return {
+            'trace_id': self.trace_id,
+            'name': root.name,
+            'start': root.start / 1e9,
+            'duration_ms': round(root.duration * 1000, 3),
+            'attributes': root.attributes,
+            'spans': [span.to_dict(root.start) for span in self.spans],
+        }
+
+
+def start_span(name: str, **attributes) -> Span:
+    """A leaf span under the current one; None when the request is not traced"""
+    parent = current_span.get()
+    if parent is None:
+        return None
+    return parent.trace.start_span(name, parent, **attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the current request, or a no-op (yields None) when untraced"""
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    with parent.trace.span(name, **attributes) as child:
+        yield child
+
+
+@contextmanager
+def leaf_span(name: str, **attributes):
+    """Like span(), without becoming current: safe inside async generators"""
+    child = start_span(name, **attributes)
+    error = None
+    try:
+        yield child
+    except GeneratorExit:
+        raise  # the consumer stopped reading: not a failure
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if child is not None:
+            child.finish(error)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{'key': key, 'value': _otlp_value(value)}
+            for key, value in attributes.items() if value is not None]
+
+
+def otlp_payload(traces: list, service: str) -> dict:
+    """OTLP/HTTP JSON body (ExportTraceServiceRequest) for finished traces"""
+    spans = []
+    for trace in traces:
+        for span in trace.spans:
+            spans.append({
+                'traceId': trace.trace_id,
+                'spanId': span.span_id,
+                'parentSpanId': span.parent_id or '',
+                'name': span.name,
+                'kind': 2 if span.parent_id is None else 1,  # SERVER for the root, INTERNAL below
+                'startTimeUnixNano': str(span.start),
+                'endTimeUnixNano': str(span.end or span.start),
+                'attributes': _otlp_attributes(span.attributes),
+                'events': [{'timeUnixNano': str(at), 'name': name,
+                            'attributes': _otlp_attributes(attributes)}
+                           for at, name, attributes in span.events],
+                'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+            })
+    return {'resourceSpans': [{
+        'resource': {'attributes': _otlp_attributes({'service.name': service})},
+        'scopeSpans': [{'scope': {'name': 'discord-ai'}, 'spans': spans}],
+    }]}
+
+
+class JsonlExporter:
+    """One JSON line per trace, appended from a worker thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, lines: list):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.writelines(lines)
+
+    async def export(self, traces: list):
+        lines = [json.dumps(trace.to_dict(), ensure_ascii=False) + '\n' for trace in traces]
+        await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+
+    async def close(self):
+        pass
+
+
+class OtlpExporter:
+    """POSTs traces to an OTLP/HTTP collector (JSON encoding)"""
+
+    def __init__(self, endpoint: str, service: str = 'discord-ai'):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.service = service
+        self._session = None
+
+    async def export(self, traces: list):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=config.HTTP_TIMEOUT))
+        async with self._session.post(self.url, json=otlp_payload(traces, self.service)) as response:
+            if response.status >= 400:
+                raise RuntimeError(f"collector answered {response.status}")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class Tracer:
+    """Samples requests, records their spans and exports finished traces in batches"""
+
+    def __init__(self, sample_rate: float = None, keep_slow: float = None, exporters: list = None,
+                 flush_interval: float = None, max_pending: int = None):
+        self.sample_rate = config.TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+        # Slow requests are kept even when not sampled; that needs spans for every request
+        self.keep_slow = config.TRACE_KEEP_SLOW if keep_slow is None else keep_slow
+        self.exporters = exporters if exporters is not None else self._configured_exporters()
+        self.flush_interval = flush_interval or config.TRACE_FLUSH_INTERVAL
+        self.max_pending = max_pending or config.TRACE_MAX_PENDING
+        self._pending = []
+        self._task = None
+        self.started = 0
+        self.exported = 0
+        self.discarded = 0    # recorded, then neither sampled nor slow
+        self.dropped = 0      # exporters too slow, queue full
+        self.failures = 0
+
+    @staticmethod
+    def _configured_exporters() -> list:
+        exporters = []
+        if config.TRACE_PATH:
+            exporters.append(JsonlExporter(config.TRACE_PATH))
+        if config.TRACE_OTLP_ENDPOINT:
+            exporters.append(OtlpExporter(config.TRACE_OTLP_ENDPOINT))
+        return exporters
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters) and (self.sample_rate > 0 or self.keep_slow > 0)
+
+    def begin(self, name: str, **attributes) -> Span:
+        """Root span of a new trace, None when this request is not recorded"""
+        if not self.enabled:
+            return None
+        sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        if not sampled and not self.keep_slow:
+            return None
+        self.started += 1
+        trace = Trace(sampled)
+        trace.root = trace.start_span(name, None, **attributes)
+        return trace.root
+
+    def finish(self, root: Span, error: BaseException = None):
+        root.finish(error)
+        trace = root.trace
+        if not trace.sampled and not (self.keep_slow and root.duration >= self.keep_slow):
+            self.discarded += 1
+            return
+        if len(self._pending) >= self.max_pending:
+            self._pending.pop(0)
+            self.dropped += 1
+        self._pending.append(trace)
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """Root span around one request (None when not recorded), current inside the block"""
+        root = self.begin(name, **attributes)
+        if root is None:
+            yield None
+            return
+        token = current_span.set(root)
+        error = None
+        try:
+            yield root
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            current_span.reset(token)
+            self.finish(root, error)
+
+    async def flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        for exporter in self.exporters:
+            try:
+                await exporter.export(batch)
+            except Exception as e:
+                self.failures += 1
+                if self.failures == 1 or self.failures % 100 == 0:
+                    logger.warning(f"⚠️ Trace export to {exporter.__class__.__name__} failed: {e}")
+        self.exported += len(batch)
+
+    def start(self):
+        """Start periodic flushing (called from the running event loop)"""
+        if self._task is None and self.enabled:
+            self._task = asyncio.ensure_future(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        for exporter in self.exporters:
+            await exporter.close()
+
+    def stats(self) -> dict:
+        return {
+            'sample_rate': self.sample_rate,
+            'started': self.started,
+            'exported': self.exported,
+            'discarded': self.discarded,
+            'dropped': self.dropped,
+            'pending': len(self._pending),
+            'failures': self.failures,
+        }
+
+
+def print_trace(trace: dict):
+    """Span tree of one exported trace, children indented under their parent"""
+    print(f"trace {trace['trace_id']} at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(trace['start']))}")
+    children = {}
+    for span in trace['spans']:
+        children.setdefault(span['parent_id'], []).append(span)
+
+    def walk(parent_id, depth):
+        for span in sorted(children.get(parent_id, ()), key=lambda s: s['offset_ms']):
+            details = ' '.join(f"{key}={value}" for key, value in span['attributes'].items())
+            events = ' '.join(f"{event['name']}@{event['offset_ms'] - span['offset_ms']:.1f}ms"
+                              for event in span['events'])
+            error = f" ERROR {span['error']}" if span['error'] else ''
+            print(f"  {'  ' * depth}{span['name']:<{24 - 2 * depth}} +{span['offset_ms']:>9.1f}ms "
+                  f"{span['duration_ms']:>9.1f}ms  {details} {events}{error}".rstrip())
+            walk(span['span_id'], depth + 1)
+
+    walk(None, 0)
+
+
+def show(path: str, slowest: int):
+    with open(path, encoding='utf-8') as file:
+        traces = [json.loads(line) for line in file if line.strip()]
+    if slowest:
+        traces = sorted(traces, key=lambda trace: trace['duration_ms'], reverse=True)[:slowest]
+    for trace in traces:
+        print_trace(trace)
+
+
+async def collect(host: str, port: int, path: str):
+    """Stand-in OTLP/HTTP collector: prints and stores whatever it receives"""
+    async def receive(request: web.Request) -> web.Response:
+        payload = await request.json()
+        spans = [span for resource in payload.get('resourceSpans', ())
+                 for scope in resource.get('scopeSpans', ()) for span in scope.get('spans', ())]
+        print(f"received {len(spans)} spans in {len({span['traceId'] for span in spans})} traces")
+        if path:
+            with open(path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(payload) + '\n')
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post('/v1/traces', receive)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"OTLP collector stand-in on http://{host}:{port}/v1/traces")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect exported traces or run a local OTLP collector")
+    commands = parser.add_subparsers(dest='command', required=True)
+    show_parser = commands.add_parser('show', help="print the span trees of a JSONL trace file")
+    show_parser.add_argument('path', nargs='?', default=config.TRACE_PATH)
+    show_parser.add_argument('--slowest', type=int, default=0, help="only the N slowest requests")
+    collect_parser = commands.add_parser('collect', help="accept OTLP/HTTP JSON exports")
+    collect_parser.add_argument('--host', default='127.0.0.1')
+    collect_parser.add_argument('--port', type=int, default=4318)
+    collect_parser.add_argument('--out', default='', help="also append each export to this file")
+    args = parser.parse_args()
+    if args.command == 'show':
+        show(args.path, args.slowest)
+    else:
+        try:
+            asyncio.run(collect(args.host, args.port, args.out))
+        except KeyboardInterrupt:
+            pass